@@ -13,7 +13,9 @@ Estrutura:
     ├── 2026-03-15_novos/               # Novos batches futuros
     │   └── ...
     banco_geral_dados.json              # Banco consolidado com todas as avaliações
+    banco_geral.sqlite3                 # (opcional, --store sqlite) banco consolidado indexado
     banco_geral_ranking.csv             # CSV FINAL unificado com ranking geral
+    indice_busca.sqlite3                # Índice invertido do comando search (problemas + artigos/)
 
 Comandos:
     # Adicionar novo batch de problemas (CSV ou diretório)
@@ -24,36 +26,123 @@ Comandos:
     python bars_judge_agent.py evaluate
     python bars_judge_agent.py evaluate --batch 2026-03-01_initial
     python bars_judge_agent.py evaluate --mode api --model claude-sonnet-4-20250514
+    python bars_judge_agent.py evaluate --mode api --concurrency 8 --rpm 50 --tpm 80000
+    python bars_judge_agent.py evaluate --mode bulk            # job assíncrono (submit/poll/collect)
+    python bars_judge_agent.py evaluate --mode api --pack 0    # vários problemas por requisição
+    python bars_judge_agent.py evaluate --near-dup reuse       # copia notas de quase-duplicatas
+    python bars_judge_agent.py evaluate --mode cascade --api-top 10   # heurística + API só no topo
+    python bars_judge_agent.py evaluate --mode api --max-cost 5      # para ao gastar US$ 5 (retomável)
+    python bars_judge_agent.py evaluate --mode api --worker          # vários processos no mesmo batch
+
+    # Processo contínuo: CSVs novos em batches/ entram no ranking em segundos
+    python bars_judge_agent.py watch
+    python bars_judge_agent.py watch --interval 5 --mode api --max-cost 10
 
     # Reconstruir ranking geral a partir de todos os batches avaliados
     python bars_judge_agent.py rebuild
 
+    # Semear o cache de avaliações com o checkpoint e o banco geral existentes
+    python bars_judge_agent.py seed-cache
+
+    # Completar só os critérios ausentes nas notas (chave omitida ou critério novo)
+    python bars_judge_agent.py backfill --dry-run
+    python bars_judge_agent.py backfill --mode api --concurrency 4
+
+    # Simular o ranking com pesos alternativos (deltas vs. banco_geral_ranking.csv)
+    python bars_judge_agent.py rerank --weights pesos.json
+
+    # Banco geral em SQLite (opcional) e consultas indexadas
+    python bars_judge_agent.py --store sqlite rebuild
+    python bars_judge_agent.py query --category 3_timing --top 10
+    python bars_judge_agent.py query --batch 2026-03-01_initial --min-pct 60
+
+    # Ranking por HTTP para dashboards e scripts (top-K por categoria/batch, ETag)
+    python bars_judge_agent.py serve --port 8765
+    curl 'http://127.0.0.1:8765/ranking?categoria=3&limite=10'
+
+    # Busca textual (BM25) em problemas e artigos, com acentos e plurais normalizados
+    python bars_judge_agent.py search escassez hídrica agricultura
+    python bars_judge_agent.py search "saúde mental" --source artigos --limit 5
+
     # Ver status dos batches e ranking
     python bars_judge_agent.py status
 
+    # Perfil da execução (vale para qualquer comando)
+    python bars_judge_agent.py --profile perfil.json evaluate
+    python bars_judge_agent.py --profile perfil.json --cprofile perfil.prof rebuild
+
     # Importar CSVs legados (já existentes na raiz) como batch inicial
     python bars_judge_agent.py import-legacy
+
+Testes (incluem o orçamento de startup de benchmarks/bench_startup.py):
+    python -m pytest -q tests/
+    python benchmarks/bench_startup.py          # quebra do tempo de import por módulo
 """
 
+import base64
+import bisect
+import codecs
 import csv
+import hashlib
+import heapq
+import importlib.util
+import io
 import json
 import math
 import os
+import random
 import re
 import shutil
+import socket
+import sqlite3
 import sys
+import threading
 import time
+import unicodedata
 import argparse
 import glob as glob_module
-from datetime import date
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from functools import lru_cache, wraps
+from itertools import chain, islice, repeat
+from operator import add, mul
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import cProfile  # só para a anotação; em execução é importado sob demanda em main()
 
 try:
-    import anthropic
-    HAS_ANTHROPIC = True
-except ImportError:
-    HAS_ANTHROPIC = False
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _importar_sob_demanda(nome: str):
+    """
+    Módulo opcional que só é carregado de fato no primeiro acesso a um atributo
+    (None se não estiver instalado). O SDK da Anthropic leva segundos para
+    importar; status, add-batch, query e afins não precisam dele.
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    spec = importlib.util.find_spec(nome)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+anthropic = _importar_sob_demanda("anthropic")
+HAS_ANTHROPIC = anthropic is not None
+
+np = _importar_sob_demanda("numpy")
+HAS_NUMPY = np is not None
 
 # ============================================================================
 # CONSTANTES DE ESTRUTURA
@@ -62,7 +151,26 @@ except ImportError:
 BATCHES_DIR = "batches"
 BANCO_GERAL_JSON = "banco_geral_dados.json"
 BANCO_GERAL_CSV = "banco_geral_ranking.csv"
+BANCO_MANIFEST_FILE = "banco_geral_manifest.json"   # Estado dos batches já consolidados
 BATCH_EVAL_FILE = "avaliacao_batch.json"
+BATCH_LOG_FILE = "avaliacao_batch.log.jsonl"   # Log append-only da avaliação em andamento
+BATCH_META_FILE = "batch_meta.json"             # Contagens em cache (CSVs e resultados)
+INDICE_MINHASH_FILE = "indice_minhash.json"     # Assinaturas MinHash de todos os problemas
+QUASE_DUP_FILE = "quase_duplicatas.json"        # Problemas do batch pulados como quase-duplicatas
+LIMIAR_QUASE_DUPLICATA = 0.8
+FILA_RETRY_FILE = "fila_retry.json"             # Problemas cuja avaliação via API falhou
+PARSE_STATS_FILE = "estatisticas_parse.json"    # Falhas de parse das respostas por modelo
+LEASES_DIR = "leases"                           # Leases de shards do modo --worker (batches/<batch>/leases/)
+RESULTADO_WORKER_PREFIXO = "resultados_worker_" # Resultados de cada worker (<prefixo><id>.jsonl)
+FILA_RETRY_WORKER_PREFIXO = "fila_retry_worker_"  # Falhas de cada worker (<prefixo><id>.json)
+RANKING_INDICE_FILE = "banco_geral_ranking_indice.json"  # Ordem e offsets das linhas do CSV de ranking
+ARTIGOS_DIR = "artigos"                         # Artigos gerados (markdown), indexados pela busca
+INDICE_BUSCA_FILE = "indice_busca.sqlite3"      # Índice invertido (BM25) de problemas e artigos
+
+# Camadas do modo cascade (campo "camada" de cada resultado)
+CAMADA_HEURISTICA = "heuristica"
+CAMADA_API_TOPO = "api_topo"
+CAMADA_API_CALIBRACAO = "api_calibracao"
 
 # ============================================================================
 # FRAMEWORK DE AVALIAÇÃO
@@ -239,15 +347,86 @@ Considere o contexto de 2026, com as tecnologias e regulações atuais.
 Avalie com base no potencial para uma startup early-stage no Brasil e/ou globalmente."""
 
 
-def build_evaluation_prompt(problema: str, descricao: str, desenvolvimento: str) -> str:
-    """Constrói o prompt de avaliação para um problema específico."""
-
+@lru_cache(maxsize=1)
+def bloco_criterios_estatico() -> str:
+    """
+    Parte estática do prompt (critérios + formato de resposta), gerada uma única
+    vez a partir do FRAMEWORK. É enviada como prefixo cacheável junto ao
+    SYSTEM_PROMPT; apenas o texto do problema varia entre as chamadas.
+    """
     criterios_text = ""
     for cat_key, cat_data in FRAMEWORK.items():
         criterios_text += f"\n### {cat_data['nome']}\n"
         for c in cat_data["criterios"]:
             criterios_text += f"- **{c['id']}** (Peso {c['peso']}): {c['nome']} — {c['descricao']}\n"
 
+    modelo_json = ",\n".join(
+        f'  "{c["id"]}": <nota>' for cat in FRAMEWORK.values() for c in cat["criterios"]
+    )
+
+    return f"""Avalie CADA critério abaixo com uma nota de 1 a 10. Responda EXCLUSIVAMENTE no formato JSON abaixo, sem texto adicional.
+
+CRITÉRIOS:
+{criterios_text}
+
+Responda SOMENTE com o JSON abaixo (sem markdown, sem ```json, sem texto antes ou depois):
+{{
+{modelo_json}
+}}"""
+
+
+def build_system_blocks() -> list[dict]:
+    """Blocos de system prompt com o prefixo estático marcado para prompt caching."""
+    return [
+        {"type": "text", "text": SYSTEM_PROMPT},
+        {"type": "text", "text": bloco_criterios_estatico(),
+         "cache_control": {"type": "ephemeral"}},
+    ]
+
+
+FERRAMENTA_NOTAS = "registrar_notas"
+
+
+@lru_cache(maxsize=None)
+def schema_notas(ids: Optional[tuple] = None) -> dict:
+    """
+    JSON schema das notas de um problema: os 50 ids do FRAMEWORK (ou só `ids`),
+    inteiros de 1 a 10, todos obrigatórios.
+    """
+    ids = list(ids) if ids else [c["id"] for cat in FRAMEWORK.values() for c in cat["criterios"]]
+    return {
+        "type": "object",
+        "properties": {i: {"type": "integer", "minimum": 1, "maximum": 10} for i in ids},
+        "required": ids,
+        "additionalProperties": False,
+    }
+
+
+@lru_cache(maxsize=None)
+def ferramenta_notas(k: int = 1) -> dict:
+    """
+    Definição da ferramenta usada como saída estruturada: com tool_choice forçado o
+    modelo devolve as notas já como objeto validado pelo schema, sem texto a parsear.
+    Para k > 1 (empacotamento), o input é {"avaliacoes": [k objetos de notas]}.
+    """
+    if k == 1:
+        return {"name": FERRAMENTA_NOTAS,
+                "description": "Registra as notas (1 a 10) de cada critério do problema avaliado.",
+                "input_schema": schema_notas()}
+    return {
+        "name": FERRAMENTA_NOTAS,
+        "description": f"Registra as notas (1 a 10) dos {k} problemas avaliados, na ordem em que aparecem.",
+        "input_schema": {
+            "type": "object",
+            "properties": {"avaliacoes": {"type": "array", "items": schema_notas(),
+                                          "minItems": k, "maxItems": k}},
+            "required": ["avaliacoes"],
+        },
+    }
+
+
+def build_evaluation_prompt(problema: str, descricao: str, desenvolvimento: str) -> str:
+    """Constrói a parte variável do prompt (o problema) — os critérios vão no prefixo cacheável."""
     return f"""Avalie o seguinte problema/oportunidade de startup:
 
 **PROBLEMA:** {problema}
@@ -258,64 +437,7 @@ def build_evaluation_prompt(problema: str, descricao: str, desenvolvimento: str)
 
 ---
 
-Avalie CADA critério abaixo com uma nota de 1 a 10. Responda EXCLUSIVAMENTE no formato JSON abaixo, sem texto adicional.
-
-CRITÉRIOS:
-{criterios_text}
-
-Responda SOMENTE com o JSON abaixo (sem markdown, sem ```json, sem texto antes ou depois):
-{{
-  "dor_financeira": <nota>,
-  "gambiarras": <nota>,
-  "frequencia": <nota>,
-  "urgencia": <nota>,
-  "dor_tempo": <nota>,
-  "risco": <nota>,
-  "frustracao": <nota>,
-  "consequencia_erro": <nota>,
-  "observabilidade": <nota>,
-  "clareza_persona": <nota>,
-  "tam": <nota>,
-  "crescimento": <nota>,
-  "monopolio_local": <nota>,
-  "amplitude": <nota>,
-  "escala_nao_linear": <nota>,
-  "ticket": <nota>,
-  "expansao": <nota>,
-  "penetracao_digital": <nota>,
-  "internacionalizacao": <nota>,
-  "dep_infraestrutura": <nota>,
-  "timing_tech": <nota>,
-  "timing_regulatorio": <nota>,
-  "mudanca_comportamental": <nota>,
-  "pressao_macro": <nota>,
-  "janela": <nota>,
-  "acesso_usuarios": <nota>,
-  "velocidade_validacao": <nota>,
-  "facilidade_mvp": <nota>,
-  "mudanca_habito": <nota>,
-  "dados_disponiveis": <nota>,
-  "aha_moment": <nota>,
-  "multiplos_lados": <nota>,
-  "feedback": <nota>,
-  "wtp": <nota>,
-  "clareza_pagador": <nota>,
-  "orcamento": <nota>,
-  "ciclo_vendas": <nota>,
-  "recorrencia": <nota>,
-  "poder_preco": <nota>,
-  "cac": <nota>,
-  "ausencia_monopolios": <nota>,
-  "efeito_rede": <nota>,
-  "switching_cost": <nota>,
-  "dados_proprietarios": <nota>,
-  "diferenciacao_10x": <nota>,
-  "fragmentacao": <nota>,
-  "tarpit": <nota>,
-  "risco_legal": <nota>,
-  "platform_risk": <nota>,
-  "alinhamento_ods": <nota>
-}}"""
+Atribua as notas de 1 a 10 para cada critério das instruções e responda SOMENTE com o JSON especificado."""
 
 
 # ============================================================================
@@ -350,6 +472,148 @@ def calcular_pontuacoes(notas: dict) -> dict:
     return resultado
 
 
+# ============================================================================
+# PERFIL DE EXECUÇÃO (--profile)
+# ============================================================================
+
+class Perfilador:
+    """
+    Coleta tempos por etapa, latências e retries da API e pico de memória.
+
+    Desligado por padrão (custo de uma checagem por chamada). As etapas podem se
+    aninhar (ex: "checkpoint" dentro de "avaliar") e, com workers concorrentes,
+    somam o tempo de todas as threads.
+    """
+
+    def __init__(self):
+        self.ativo = False
+        self._lock = threading.Lock()
+        self._inicio = 0.0
+        self._inicio_relogio: Optional[datetime] = None
+        self.etapas = {}
+        self.latencias = []
+        self.falhas_api = 0
+        self.retries = {}
+
+    def iniciar(self, rastrear_memoria: bool = False):
+        self.ativo = True
+        self._inicio = time.perf_counter()
+        self._inicio_relogio = datetime.now()
+        if rastrear_memoria:
+            import tracemalloc  # só com --tracemalloc, fora do caminho de startup
+            tracemalloc.start()
+
+    def acumular(self, nome: str, segundos: float):
+        with self._lock:
+            etapa = self.etapas.setdefault(nome, {"segundos": 0.0, "chamadas": 0})
+            etapa["segundos"] += segundos
+            etapa["chamadas"] += 1
+
+    @contextmanager
+    def _medir_etapa(self, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.acumular(nome, time.perf_counter() - inicio)
+
+    def etapa(self, nome: str):
+        """Context manager que cronometra um trecho (no-op se o perfil estiver desligado)."""
+        return self._medir_etapa(nome) if self.ativo else nullcontext()
+
+    def medir(self, nome: str):
+        """Decorador: cronometra cada chamada da função como a etapa `nome`."""
+        def decorador(funcao):
+            @wraps(funcao)
+            def envolvida(*args, **kwargs):
+                if not self.ativo:
+                    return funcao(*args, **kwargs)
+                with self._medir_etapa(nome):
+                    return funcao(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    def registrar_latencia(self, segundos: float, sucesso: bool):
+        if not self.ativo:
+            return
+        with self._lock:
+            self.latencias.append(segundos)
+            if not sucesso:
+                self.falhas_api += 1
+
+    def registrar_retry(self, motivo: str):
+        if not self.ativo:
+            return
+        with self._lock:
+            self.retries[motivo] = self.retries.get(motivo, 0) + 1
+
+    @staticmethod
+    def _percentil(ordenados: list[float], p: float) -> float:
+        """Percentil pelo método nearest-rank."""
+        return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+    def relatorio(self, comando: str) -> dict:
+        latencias = sorted(self.latencias)
+        api = {"chamadas": len(latencias), "falhas": self.falhas_api, "retries": dict(self.retries)}
+        if latencias:
+            api["latencia_ms"] = {
+                "media": round(sum(latencias) / len(latencias) * 1000, 1),
+                **{f"p{p}": round(self._percentil(latencias, p) * 1000, 1) for p in (50, 90, 95, 99)},
+                "max": round(latencias[-1] * 1000, 1),
+            }
+
+        memoria = {}
+        if resource is not None:
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memoria["rss_pico_mb"] = round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        tracemalloc = sys.modules.get("tracemalloc")
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            _, pico = tracemalloc.get_traced_memory()
+            memoria["tracemalloc_pico_mb"] = round(pico / (1024 * 1024), 2)
+            memoria["tracemalloc_top"] = [
+                {"local": str(stat.traceback), "mb": round(stat.size / (1024 * 1024), 3), "blocos": stat.count}
+                for stat in tracemalloc.take_snapshot().statistics("lineno")[:15]
+            ]
+
+        return {
+            "comando": comando,
+            "argv": sys.argv[1:],
+            "inicio": (self._inicio_relogio or datetime.now()).isoformat(timespec="seconds"),
+            "wall_segundos": round(time.perf_counter() - self._inicio, 3),
+            "etapas": {nome: {"segundos": round(e["segundos"], 4), "chamadas": e["chamadas"]}
+                       for nome, e in sorted(self.etapas.items(), key=lambda kv: -kv[1]["segundos"])},
+            "api": api,
+            "memoria": memoria,
+        }
+
+
+PERFIL = Perfilador()
+
+
+def _resumo_cprofile(perfil: "cProfile.Profile", limite: int = 25) -> list[dict]:
+    """Funções com maior tempo cumulativo, em formato JSON."""
+    import pstats
+    stats = pstats.Stats(perfil)
+    linhas = []
+    for (arquivo, linha, funcao), (_, chamadas, proprio, cumulativo, _) in stats.stats.items():
+        linhas.append({"funcao": f"{os.path.basename(arquivo)}:{linha}({funcao})", "chamadas": chamadas,
+                       "proprio_s": round(proprio, 4), "cumulativo_s": round(cumulativo, 4)})
+    linhas.sort(key=lambda item: -item["cumulativo_s"])
+    return linhas[:limite]
+
+
+def _criar_mensagem(client, **params):
+    """client.messages.create com a latência registrada no perfil."""
+    inicio = time.perf_counter()
+    sucesso = False
+    try:
+        resposta = client.messages.create(**params)
+        sucesso = True
+        return resposta
+    finally:
+        PERFIL.registrar_latencia(time.perf_counter() - inicio, sucesso)
+
+
 # ============================================================================
 # LEITURA DOS CSVs
 # ============================================================================
@@ -383,6 +647,7 @@ def carregar_problemas_de_csv(caminho_csv: str, nome_batch: str = "") -> list[di
     return problemas
 
 
+@PERFIL.medir("carregar_csvs")
 def carregar_problemas_de_diretorio(diretorio: str, nome_batch: str = "") -> list[dict]:
     """Carrega todos os problemas dos CSVs num diretório."""
     problemas = []
@@ -408,6 +673,112 @@ def carregar_problemas(diretorio: str) -> list[dict]:
     return problemas
 
 
+# ============================================================================
+# PERSISTÊNCIA INCREMENTAL (LOG APPEND-ONLY)
+# ============================================================================
+
+@PERFIL.medir("gravar_json")
+def _gravar_json_atomico(path: str, dados, indent: Optional[int] = None):
+    """Grava JSON num arquivo temporário, faz fsync e substitui o destino atomicamente."""
+    # Temporário exclusivo por processo: vários workers podem gravar o mesmo arquivo
+    tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        if indent is None:
+            # dumps usa o encoder em C (json.dump itera em Python puro)
+            f.write(json.dumps(dados, ensure_ascii=False, separators=(",", ":")))
+        else:
+            json.dump(dados, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LogAvaliacoes:
+    """
+    Log JSONL append-only dos resultados de um batch em avaliação.
+
+    Cada registro é uma linha completa gravada com flush imediato, e o fsync é
+    feito a cada `fsync_cada` registros. Um crash no meio de uma escrita deixa
+    no máximo a última linha truncada, que é descartada na reprodução do log.
+    """
+
+    def __init__(self, path: str, fsync_cada: int = 20):
+        self.path = path
+        self.fsync_cada = fsync_cada
+        self._pendentes_sync = 0
+        self._f = None
+
+    def _abrir(self):
+        # Descartar uma linha final truncada por crash anterior antes de voltar a anexar
+        if os.path.exists(self.path):
+            with open(self.path, "rb+") as f:
+                dados = f.read()
+                if dados and not dados.endswith(b"\n"):
+                    f.truncate(dados.rfind(b"\n") + 1)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    @PERFIL.medir("checkpoint")
+    def registrar(self, resultado: dict):
+        if self._f is None:
+            self._abrir()
+        self._f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._pendentes_sync += 1
+        if self._pendentes_sync >= self.fsync_cada:
+            os.fsync(self._f.fileno())
+            self._pendentes_sync = 0
+
+    def fechar(self):
+        if self._f is not None:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def reproduzir_log(path: str) -> list[dict]:
+    """Lê os registros válidos de um log JSONL, ignorando linhas truncadas."""
+    registros = []
+    if not os.path.exists(path):
+        return registros
+    with open(path, "r", encoding="utf-8") as f:
+        for n, linha in enumerate(f, 1):
+            if not linha.endswith("\n"):
+                print(f"  Aviso: última linha do log truncada descartada ({os.path.basename(path)})")
+                break
+            try:
+                registros.append(json.loads(linha))
+            except json.JSONDecodeError:
+                print(f"  Aviso: linha {n} inválida ignorada em {os.path.basename(path)}")
+    return registros
+
+
+@PERFIL.medir("carregar_resultados")
+def carregar_resultados_batch(batch_dir: str) -> list[dict]:
+    """Resultados de um batch: JSON compactado + registros do log e dos workers ainda não compactados."""
+    resultados = []
+    eval_path = os.path.join(batch_dir, BATCH_EVAL_FILE)
+    if os.path.exists(eval_path):
+        with open(eval_path, "r", encoding="utf-8") as f:
+            resultados = json.load(f)
+
+    do_log = reproduzir_log(os.path.join(batch_dir, BATCH_LOG_FILE))
+    for nome in _shards_workers(batch_dir):
+        do_log += reproduzir_log(os.path.join(batch_dir, nome))
+    if do_log:
+        # O mesmo problema pode ter sido avaliado por dois workers (lease retomado): vale o último
+        do_log = list({r["problema"]: r for r in do_log}.values())
+        titulos_log = {r["problema"] for r in do_log}
+        resultados = [r for r in resultados if r["problema"] not in titulos_log] + do_log
+    return resultados
+
+
 # ============================================================================
 # GESTÃO DE BATCHES
 # ============================================================================
@@ -419,6 +790,25 @@ def _batches_dir(base: str) -> str:
     return d
 
 
+def _stat_resumido(path: str) -> list[int]:
+    """[tamanho, mtime_ns] de um arquivo, usado para invalidar contagens em cache."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _carregar_meta_batch(batch_path: str) -> dict:
+    """Metadados do batch: contagens por CSV e de resultados, com o stat de origem."""
+    path = os.path.join(batch_path, BATCH_META_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {"csvs": {}, "resultados": {}}
+
+
+@PERFIL.medir("listar_batches")
 def listar_batches(base: str) -> list[dict]:
     """Lista todos os batches com seu status."""
     bdir = _batches_dir(base)
@@ -429,17 +819,42 @@ def listar_batches(base: str) -> list[dict]:
             continue
 
         csvs = glob_module.glob(os.path.join(batch_path, "*.csv"))
-        eval_path = os.path.join(batch_path, BATCH_EVAL_FILE)
-        avaliado = os.path.exists(eval_path)
+        arquivos_resultado = _arquivos_resultado(batch_path)
+        avaliado = bool(arquivos_resultado)
+
+        meta = _carregar_meta_batch(batch_path)
+        novo_meta = {"csvs": {}, "resultados": {}}
 
         n_problemas = 0
         for c in csvs:
-            n_problemas += len(carregar_problemas_de_csv(c, entry))
+            nome = os.path.basename(c)
+            stat = _stat_resumido(c)
+            anterior = meta["csvs"].get(nome)
+            if anterior and anterior["stat"] == stat:
+                n = anterior["n"]
+            else:
+                n = len(carregar_problemas_de_csv(c, entry))
+            novo_meta["csvs"][nome] = {"stat": stat, "n": n}
+            n_problemas += n
 
         n_avaliados = 0
+        uso = _agregar_uso([])
         if avaliado:
-            with open(eval_path, "r", encoding="utf-8") as f:
-                n_avaliados = len(json.load(f))
+            stats = {nome: _stat_resumido(os.path.join(batch_path, nome)) for nome in arquivos_resultado}
+            if meta["resultados"].get("stats") == stats and "uso" in meta["resultados"]:
+                n_avaliados = meta["resultados"]["n"]
+                uso = meta["resultados"]["uso"]
+            else:
+                resultados = carregar_resultados_batch(batch_path)
+                n_avaliados = len(resultados)
+                uso = _agregar_uso(resultados)
+            novo_meta["resultados"] = {"stats": stats, "n": n_avaliados, "uso": uso}
+
+        if novo_meta != meta:
+            _gravar_json_atomico(os.path.join(batch_path, BATCH_META_FILE), novo_meta)
+
+        n_ignorados = len(_carregar_quase_dup_batch(batch_path))
+        falhas = _carregar_fila_retry(batch_path)
 
         batches.append({
             "nome": entry,
@@ -448,12 +863,32 @@ def listar_batches(base: str) -> list[dict]:
             "n_problemas": n_problemas,
             "avaliado": avaliado,
             "n_avaliados": n_avaliados,
+            "n_ignorados": n_ignorados,
+            "falhas": falhas,
+            "uso": uso,
         })
 
     return batches
 
 
-def adicionar_batch(base: str, fonte: str, nome: Optional[str] = None) -> str:
+def _agregar_uso(resultados: list[dict]) -> dict:
+    """Soma tokens e custo (US$) das avaliações pagas de um batch (campo uso_api)."""
+    uso = {campo: 0 for campo in CAMPOS_USO}
+    uso.update(n_api=0, custo_usd=0.0)
+    for r in resultados:
+        uso_api = r.get("uso_api")
+        if not uso_api:
+            continue
+        for campo in CAMPOS_USO:
+            uso[campo] += uso_api.get(campo, 0)
+        uso["n_api"] += 1
+        uso["custo_usd"] += custo_uso(uso_api, uso_api.get("modelo", ""))
+    uso["custo_usd"] = round(uso["custo_usd"], 6)
+    return uso
+
+
+def adicionar_batch(base: str, fonte: str, nome: Optional[str] = None,
+                    limiar_quase_dup: float = LIMIAR_QUASE_DUPLICATA) -> str:
     """Adiciona um novo batch de problemas (arquivo CSV ou diretório de CSVs)."""
     hoje = date.today().isoformat()
     sufixo = nome if nome else "novos"
@@ -489,6 +924,14 @@ def adicionar_batch(base: str, fonte: str, nome: Optional[str] = None) -> str:
         sys.exit(1)
 
     print(f"\nBatch '{batch_nome}' criado com {len(problemas)} problemas.")
+
+    # Quase-duplicatas contra os batches anteriores e dentro do próprio batch
+    quase = detectar_quase_duplicatas(carregar_indice_minhash(base), batch_nome, problemas, limiar_quase_dup)
+    if quase:
+        print(f"  {len(quase)} quase-duplicatas (similaridade >= {limiar_quase_dup:.0%}):")
+        imprimir_quase_duplicatas(quase)
+        print("  Use 'evaluate --near-dup skip' ou '--near-dup reuse' para não avaliá-las de novo.")
+
     print(f"  Caminho: {batch_dir}")
     print(f"  Execute: python bars_judge_agent.py evaluate --batch {batch_nome}")
     return batch_nome
@@ -525,95 +968,864 @@ def importar_legacy(base: str) -> str:
     return batch_nome
 
 
+def _ordenar_resultados(resultados: list[dict], problemas: list[dict]):
+    """Ordena os resultados na ordem dos problemas nos CSVs (determinística)."""
+    ordem = {}
+    for i, p in enumerate(problemas):
+        ordem.setdefault(p["problema"], i)
+    resultados.sort(key=lambda r: ordem.get(r["problema"], len(ordem)))
+
+
+def _montar_resultado(problema: dict, batch_nome: str, notas: dict) -> dict:
+    """Monta o registro de resultado de um problema a partir das notas."""
+    pontuacoes = calcular_pontuacoes(notas)
+    return {
+        "problema": problema["problema"],
+        "descricao": problema["descricao"],
+        "desenvolvimento": problema["desenvolvimento"],
+        "arquivo_fonte": problema["arquivo_fonte"],
+        "batch": batch_nome,
+        "notas": notas,
+        **pontuacoes,
+    }
+
+
 def avaliar_batch(base: str, batch_nome: str, mode: str = "heuristic",
-                  model: str = "claude-sonnet-4-20250514", client=None) -> list[dict]:
+                  model: str = "claude-sonnet-4-20250514", client=None,
+                  concorrencia: int = 1, rpm: int = 50, tpm: int = 80000,
+                  bulk_intervalo: float = 60.0, bulk_aguardar: bool = True,
+                  pack: int = 1, quase_dup: str = "off",
+                  limiar_quase_dup: float = LIMIAR_QUASE_DUPLICATA,
+                  api_top: float = 10.0, calibracao: float = 2.0,
+                  orcamento: Optional["OrcamentoAPI"] = None) -> list[dict]:
     """Avalia todos os problemas de um batch."""
     batch_dir = os.path.join(_batches_dir(base), batch_nome)
     if not os.path.isdir(batch_dir):
         print(f"ERRO: Batch '{batch_nome}' não encontrado em {batch_dir}")
         return []
 
+    ativos = leases_ativos(batch_dir)
+    if ativos:
+        print(f"ERRO: Batch '{batch_nome}' tem {len(ativos)} shards em avaliação por workers "
+              f"({', '.join(sorted({l['worker'] for l in ativos}))}); use 'evaluate --worker' para participar.")
+        return []
+
     # Carregar problemas do batch
     problemas = carregar_problemas_de_diretorio(batch_dir, batch_nome)
     if not problemas:
         print(f"  Nenhum problema encontrado no batch '{batch_nome}'.")
         return []
 
-    # Verificar se já existe avaliação parcial
+    # Verificar se já existe avaliação parcial (JSON compactado + log de execução interrompida)
     eval_path = os.path.join(batch_dir, BATCH_EVAL_FILE)
-    resultados = []
-    avaliados = set()
-    if os.path.exists(eval_path):
-        with open(eval_path, "r", encoding="utf-8") as f:
-            resultados = json.load(f)
-        avaliados = {r["problema"] for r in resultados}
+    log_path = os.path.join(batch_dir, BATCH_LOG_FILE)
+    resultados = carregar_resultados_batch(batch_dir)
+    avaliados = {r["problema"] for r in resultados}
+    if resultados:
         print(f"  Retomando: {len(resultados)} já avaliados de {len(problemas)}")
 
     pendentes = [p for p in problemas if p["problema"] not in avaliados]
     total = len(problemas)
 
+    # Falhas de execuções anteriores vão na frente
+    falhas = _carregar_fila_retry(batch_dir)
+    if falhas:
+        print(f"  Fila de retry: {len(falhas)} problemas que falharam antes serão tentados primeiro")
+        pendentes.sort(key=lambda p: p["problema"] not in falhas)
+
+    # Modo cascade: triagem heurística do batch inteiro define quem vai para a API
+    camadas, notas_heuristicas = {}, {}
+    if mode == "cascade":
+        camadas, notas_heuristicas = planejar_cascata(problemas, api_top, calibracao, batch_nome)
+
+    # Reaproveitar notas já pagas (mesmo conteúdo, modelo e framework) de qualquer batch
+    modelo_cache = model if mode in ("api", "bulk", "cascade") else MODELO_HEURISTICO
+    cache = carregar_cache(base)
+    n_cache_inicial = len(cache)
+    do_cache = [p for p in pendentes if chave_cache(p, modelo_cache) in cache
+                and camadas.get(p["problema"], {}).get("camada") != CAMADA_HEURISTICA]
+    if do_cache:
+        with LogAvaliacoes(log_path) as log:
+            for p in do_cache:
+                resultado = _montar_resultado(p, batch_nome, dict(cache[chave_cache(p, modelo_cache)]))
+                resultado.update(camadas.get(p["problema"], {}))
+                resultados.append(resultado)
+                log.registrar(resultado)
+        avaliados.update(p["problema"] for p in do_cache)
+        pendentes = [p for p in pendentes if p["problema"] not in avaliados]
+        print(f"  Cache: {len(do_cache)} problemas reaproveitados sem nova avaliação")
+
+    # Quase-duplicatas de problemas anteriores: sinalizar, pular ou reaproveitar as notas
+    adiados = {}
+    if quase_dup != "off" and pendentes:
+        pendentes, adiados = _tratar_quase_duplicatas(base, batch_dir, batch_nome, pendentes, resultados,
+                                                      log_path, quase_dup, limiar_quase_dup)
+
     print(f"  Avaliando {len(pendentes)} problemas pendentes no batch '{batch_nome}'...")
 
-    for i, problema in enumerate(pendentes, 1):
-        idx = len(resultados) + 1
-        if i % 50 == 1 or i == len(pendentes):
-            print(f"    [{idx}/{total}] {problema['problema'][:55]}...")
+    estatisticas = EstatisticasAPI()
+    if mode == "api" and client:
+        avaliacoes = _avaliacoes_api(client, pendentes, model, concorrencia, rpm, tpm, pack, orcamento)
+    elif mode == "cascade" and client:
+        via_heuristica = [p for p in pendentes if camadas[p["problema"]]["camada"] == CAMADA_HEURISTICA]
+        via_api = [p for p in pendentes if camadas[p["problema"]]["camada"] != CAMADA_HEURISTICA]
+        por_camada = {}
+        for c in camadas.values():
+            por_camada[c["camada"]] = por_camada.get(c["camada"], 0) + 1
+        print(f"  Cascata: {por_camada.get(CAMADA_API_TOPO, 0)} no topo ({api_top:g}%) + "
+              f"{por_camada.get(CAMADA_API_CALIBRACAO, 0)} de calibração pela API, "
+              f"{por_camada.get(CAMADA_HEURISTICA, 0)} pela heurística "
+              f"(pendentes: {len(via_api)} via API, {len(via_heuristica)} via heurística)")
+        # Camada heurística primeiro: é instantânea e já fica registrada no log
+        avaliacoes = chain(
+            ((p, notas_heuristicas[p["problema"]], None) for p in via_heuristica),
+            _avaliacoes_api(client, via_api, model, concorrencia, rpm, tpm, pack, orcamento),
+        )
+    elif mode == "bulk" and client:
+        notas_bulk = avaliar_pendentes_bulk(client, batch_dir, pendentes, model,
+                                            bulk_intervalo, bulk_aguardar)
+        if notas_bulk is None:
+            return resultados
+        avaliacoes = ((p, notas_bulk[p["problema"]][0], {**notas_bulk[p["problema"]][1], "lote": True})
+                      for p in pendentes if p["problema"] in notas_bulk)
+    else:
+        avaliacoes = ((p, avaliar_problema_heuristico(p), None) for p in pendentes)
+
+    log = LogAvaliacoes(log_path)
+    try:
+        with PERFIL.etapa("avaliar"):
+            _consumir_avaliacoes(avaliacoes, resultados, log, cache, modelo_cache,
+                                 batch_nome, total, len(pendentes), estatisticas, camadas, orcamento,
+                                 falhas)
+    finally:
+        log.fechar()
+        if len(cache) != n_cache_inicial:
+            salvar_cache(base, cache)
+        PARSE.salvar(base)
+
+    if adiados:
+        _resolver_adiados(adiados, resultados, batch_nome)
+
+    # Pulados como quase-duplicata que acabaram avaliados deixam de contar como pulados
+    pulados = _carregar_quase_dup_batch(batch_dir)
+    if pulados:
+        avaliados = {r["problema"] for r in resultados}
+        restantes = {t: v for t, v in pulados.items() if t not in avaliados}
+        if not restantes:
+            os.remove(os.path.join(batch_dir, QUASE_DUP_FILE))
+        elif restantes != pulados:
+            _gravar_json_atomico(os.path.join(batch_dir, QUASE_DUP_FILE), restantes, indent=2)
+
+    # Fila de retry: só o que continua sem resultado
+    avaliados = {r["problema"] for r in resultados}
+    falhas = {t: v for t, v in falhas.items() if t not in avaliados}
+    fila_path = os.path.join(batch_dir, FILA_RETRY_FILE)
+    if falhas:
+        _gravar_json_atomico(fila_path, falhas, indent=2)
+        print(f"  {len(falhas)} problemas falharam e ficaram na fila de retry ({FILA_RETRY_FILE}); "
+              f"execute 'evaluate' de novo para retentá-los.")
+    elif os.path.exists(fila_path):
+        os.remove(fila_path)
+
+    # Compactar log + shards de workers + avaliações anteriores no JSON do batch
+    _ordenar_resultados(resultados, problemas)
+    _gravar_json_atomico(eval_path, resultados, indent=2)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    _remover_arquivos_workers(batch_dir)
+
+    if orcamento and orcamento.esgotado():
+        print(f"  Orçamento atingido ({orcamento.descricao()}): {len(resultados)} de {total} avaliados; "
+              f"execute 'evaluate' de novo para retomar o restante.")
+    else:
+        print(f"  Batch '{batch_nome}' concluído: {len(resultados)} problemas avaliados.")
+    if mode == "cascade":
+        relatorio_calibracao(resultados)
+    estatisticas.imprimir_resumo()
+    return resultados
+
 
-        if mode == "api" and client:
-            notas = avaliar_problema(client, problema, model)
+def _avaliacoes_api(client, pendentes: list[dict], model: str, concorrencia: int,
+                    rpm: int, tpm: int, pack: int, orcamento: Optional["OrcamentoAPI"] = None,
+                    limitador: Optional["LimitadorTokenBucket"] = None):
+    """
+    Gerador de (problema, notas, uso) via API, com limite de taxa, concorrência e empacotamento.
+    Problemas que esgotam as tentativas são entregues com notas None (uso["erro"] diz o motivo)
+    e reenfileirados ao fim da rodada, até RODADAS_REQUEUE vezes, com backoff entre as rodadas.
+    """
+    limitador = limitador or LimitadorTokenBucket(rpm, tpm)
+    disjuntor = DisjuntorAPI()
+    parar = orcamento.parar if orcamento else None
+    if concorrencia > 1:
+        print(f"  Concorrência: {concorrencia} workers (limite {rpm} req/min, {tpm} tokens/min)")
+    k = pack if pack > 0 else calcular_pack_automatico(model)
+    if k > 1:
+        print(f"  Empacotamento: {k} problemas por requisição")
+
+    fila = pendentes
+    for rodada in range(RODADAS_REQUEUE + 1):
+        falhas = []
+        for problema, notas, uso in _rodada_api(client, fila, model, concorrencia, k,
+                                                limitador, disjuntor, parar):
+            if notas is None and uso and uso.get("erro"):
+                falhas.append(problema)
+            yield problema, notas, uso
+        if not falhas or rodada == RODADAS_REQUEUE or (parar and parar.is_set()):
+            return
+        espera = espera_backoff(rodada + 1, base=5.0)
+        print(f"  Reenfileirando {len(falhas)} problemas que falharam "
+              f"(rodada {rodada + 2} de {RODADAS_REQUEUE + 1}) em {espera:.0f}s...")
+        time.sleep(espera)
+        fila = falhas
+
+
+def _rodada_api(client, pendentes: list[dict], model: str, concorrencia: int, k: int,
+                limitador: "LimitadorTokenBucket", disjuntor: "DisjuntorAPI",
+                parar: Optional[threading.Event]):
+    """Uma passada de avaliação via API sobre `pendentes` (em grupos de k se k > 1)."""
+    if k > 1:
+        grupos = [pendentes[i:i + k] for i in range(0, len(pendentes), k)]
+        # Tarefas que só começam depois do orçamento esgotado não chamam a API
+        return (
+            item for _, itens in _executar_concorrente(
+                lambda g: ([(p, None, None) for p in g] if parar and parar.is_set()
+                           else avaliar_grupo_api(client, g, model, limitador=limitador,
+                                                  disjuntor=disjuntor)),
+                grupos, concorrencia, parar,
+            )
+            for item in itens
+        )
+    return (
+        (p, notas, uso) for p, (notas, uso) in _executar_concorrente(
+            lambda p: ((None, None) if parar and parar.is_set()
+                       else avaliar_problema_detalhado(client, p, model, limitador=limitador,
+                                                       disjuntor=disjuntor)),
+            pendentes, concorrencia, parar,
+        )
+    )
+
+
+@PERFIL.medir("triagem_cascata")
+def planejar_cascata(problemas: list[dict], api_top: float, calibracao: float,
+                     semente: str) -> tuple[dict, dict]:
+    """
+    Triagem do modo cascade: pontua o batch inteiro pela heurística e escolhe quem vai
+    para a API (top api_top% + amostra aleatória de calibracao% do restante).
+
+    Determinístico (semente = nome do batch), então uma execução retomada refaz o
+    mesmo plano. Retorna ({titulo: {"camada", "pct_heuristico"}}, {titulo: notas heurísticas}).
+    """
+    notas_heuristicas = {}
+    pct = {}
+    for p in problemas:
+        if p["problema"] not in notas_heuristicas:
+            notas = avaliar_problema_heuristico(p)
+            notas_heuristicas[p["problema"]] = notas
+            pct[p["problema"]] = calcular_pontuacoes(notas)["pct_total"]
+
+    ordem = sorted(pct, key=pct.__getitem__, reverse=True)
+    n_topo = math.ceil(len(ordem) * api_top / 100)
+    restante = ordem[n_topo:]
+    amostra = set(random.Random(semente).sample(restante, math.ceil(len(restante) * calibracao / 100)))
+
+    camadas = {}
+    for i, titulo in enumerate(ordem):
+        if i < n_topo:
+            camada = CAMADA_API_TOPO
+        elif titulo in amostra:
+            camada = CAMADA_API_CALIBRACAO
         else:
-            notas = avaliar_problema_heuristico(problema)
+            camada = CAMADA_HEURISTICA
+        camadas[titulo] = {"camada": camada, "pct_heuristico": pct[titulo]}
+    return camadas, notas_heuristicas
+
+
+def relatorio_calibracao(resultados: list[dict]):
+    """Compara heurística e API na amostra de calibração do modo cascade."""
+    topo = [r for r in resultados if r.get("camada") == CAMADA_API_TOPO]
+    calib = [r for r in resultados if r.get("camada") == CAMADA_API_CALIBRACAO]
+    if not calib:
+        return
+    erro = sum(abs(r["pct_total"] - r["pct_heuristico"]) for r in calib) / len(calib)
+    print(f"  Calibração: {len(calib)} problemas fora do topo avaliados pela API; "
+          f"diferença média heurística × API de {erro:.1f} p.p.")
+    if topo:
+        corte = min(r["pct_total"] for r in topo)
+        perdidos = [r for r in calib if r["pct_total"] >= corte]
+        print(f"  {len(perdidos)} da amostra de calibração ficariam no topo pela nota da API "
+              f"(corte {corte:.1f}%): estimativa de {len(perdidos) / len(calib):.0%} de falsos negativos da triagem")
+
+
+def _tratar_quase_duplicatas(base: str, batch_dir: str, batch_nome: str, pendentes: list[dict],
+                             resultados: list[dict], log_path: str, modo: str,
+                             limiar: float) -> tuple[list[dict], dict]:
+    """
+    Aplica o modo de quase-duplicatas (flag, skip ou reuse) aos pendentes do batch.
+
+    Retorna (pendentes restantes, adiados). Adiados são quase-duplicatas de outro
+    pendente do mesmo batch: recebem as notas dele depois que ele for avaliado.
+    """
+    quase = detectar_quase_duplicatas(carregar_indice_minhash(base), batch_nome, pendentes, limiar)
+    if not quase:
+        return pendentes, {}
+    print(f"  Quase-duplicatas: {len(quase)} pendentes com similaridade >= {limiar:.0%}")
+    imprimir_quase_duplicatas(quase)
+
+    if modo == "flag":
+        return pendentes, {}
+
+    if modo == "skip":
+        pulados = _carregar_quase_dup_batch(batch_dir)
+        for titulo, (sim, batch, similar) in quase.items():
+            pulados[titulo] = {"similar_a": similar, "batch": batch, "similaridade": round(sim, 3)}
+        _gravar_json_atomico(os.path.join(batch_dir, QUASE_DUP_FILE), pulados, indent=2)
+        print(f"  {len(quase)} pulados sem avaliação (registrados em {QUASE_DUP_FILE})")
+        return [p for p in pendentes if p["problema"] not in quase], {}
+
+    # reuse: copiar as notas do problema parecido já avaliado (de qualquer batch)
+    resultados_de = {batch_nome: {r["problema"]: r for r in resultados}}
+    titulos_pendentes = {p["problema"] for p in pendentes}
+    reaproveitados, adiados = set(), {}
+    with LogAvaliacoes(log_path) as log:
+        for p in pendentes:
+            if p["problema"] not in quase:
+                continue
+            sim, batch, similar = quase[p["problema"]]
+            if batch not in resultados_de:
+                resultados_de[batch] = {r["problema"]: r for r in
+                                        carregar_resultados_batch(os.path.join(_batches_dir(base), batch))}
+            origem = resultados_de[batch].get(similar)
+            if origem is not None:
+                resultado = _resultado_quase_duplicata(p, batch_nome, origem, sim)
+                resultados.append(resultado)
+                log.registrar(resultado)
+                reaproveitados.add(p["problema"])
+            elif batch == batch_nome and similar in titulos_pendentes:
+                adiados[p["problema"]] = (p, sim, similar)
+
+    print(f"  {len(reaproveitados)} com notas reaproveitadas"
+          + (f", {len(adiados)} aguardando a avaliação do similar neste batch" if adiados else ""))
+    return [p for p in pendentes if p["problema"] not in reaproveitados and p["problema"] not in adiados], adiados
+
+
+def _resultado_quase_duplicata(problema: dict, batch_nome: str, origem: dict, sim: float) -> dict:
+    """Resultado de um problema com as notas copiadas da sua quase-duplicata já avaliada."""
+    resultado = _montar_resultado(problema, batch_nome, dict(origem["notas"]))
+    resultado["quase_duplicata_de"] = {"problema": origem["problema"], "batch": origem.get("batch", ""),
+                                       "similaridade": round(sim, 3)}
+    return resultado
+
+
+def _resolver_adiados(adiados: dict, resultados: list[dict], batch_nome: str):
+    """Completa os adiados com as notas dos similares avaliados nesta execução."""
+    por_titulo = {r["problema"]: r for r in resultados}
+    # Em ordem do CSV: um adiado pode apontar para outro adiado anterior
+    for titulo, (p, sim, similar) in adiados.items():
+        origem = por_titulo.get(similar)
+        if origem is None:
+            continue
+        resultado = _resultado_quase_duplicata(p, batch_nome, origem, sim)
+        resultados.append(resultado)
+        por_titulo[titulo] = resultado
+
+
+def _consumir_avaliacoes(avaliacoes, resultados: list[dict], log: "LogAvaliacoes",
+                         cache: dict, modelo_cache: str, batch_nome: str,
+                         total: int, n_pendentes: int, estatisticas: "EstatisticasAPI",
+                         camadas: Optional[dict] = None,
+                         orcamento: Optional["OrcamentoAPI"] = None,
+                         falhas: Optional[dict] = None):
+    """
+    Registra cada avaliação concluída no log append-only e no cache. Avaliações que
+    falharam (notas None com uso["erro"]) vão para `falhas`, a fila de retry do batch.
+    """
+    falhas = {} if falhas is None else falhas
+    camadas = camadas or {}
+    for i, (problema, notas, uso) in enumerate(avaliacoes, 1):
+        idx = len(resultados) + 1
+        if uso:
+            estatisticas.registrar(uso)
+            if orcamento:
+                orcamento.registrar(uso, modelo_cache)
+        if i % 50 == 1 or i == n_pendentes:
+            detalhe = ""
+            if uso:
+                detalhe = (f" [cache: {'hit' if uso['cache_read_input_tokens'] else 'miss'}, "
+                           f"economia {EstatisticasAPI.economia_tokens(uso)} tokens]")
+            print(f"    [{idx}/{total}] {problema['problema'][:55]}...{detalhe}")
 
         if notas is None:
+            if uso and uso.get("erro"):
+                anterior = falhas.get(problema["problema"], {})
+                falhas[problema["problema"]] = {
+                    "tentativas": anterior.get("tentativas", 0) + 1,
+                    "ultimo_erro": uso["erro"],
+                    "ultima_falha": datetime.now().isoformat(timespec="seconds"),
+                }
             continue
 
-        pontuacoes = calcular_pontuacoes(notas)
-        resultado = {
-            "problema": problema["problema"],
-            "descricao": problema["descricao"],
-            "desenvolvimento": problema["desenvolvimento"],
-            "arquivo_fonte": problema["arquivo_fonte"],
-            "batch": batch_nome,
-            "notas": notas,
-            **pontuacoes,
-        }
+        falhas.pop(problema["problema"], None)
+        camada = camadas.get(problema["problema"])
+        # No modo cascade a camada heurística não pode ir para o cache do modelo da API
+        modelo = MODELO_HEURISTICO if camada and camada["camada"] == CAMADA_HEURISTICA else modelo_cache
+        cache[chave_cache(problema, modelo)] = dict(notas)
+        resultado = _montar_resultado(problema, batch_nome, notas)
+        if camada:
+            resultado.update(camada)
+        if uso:
+            resultado["uso_api"] = {**uso, "modelo": modelo_cache}
         resultados.append(resultado)
+        log.registrar(resultado)
 
-        # Checkpoint a cada 20
-        if idx % 20 == 0:
-            with open(eval_path, "w", encoding="utf-8") as f:
-                json.dump(resultados, f, ensure_ascii=False, indent=2)
 
-        if mode == "api":
-            time.sleep(0.5)
+# ============================================================================
+# AVALIAÇÃO DISTRIBUÍDA (LEASES DE SHARDS ENTRE WORKERS)
+# ============================================================================
 
-    # Salvar avaliação completa do batch
-    with open(eval_path, "w", encoding="utf-8") as f:
-        json.dump(resultados, f, ensure_ascii=False, indent=2)
+LEASE_TTL_PADRAO = 300.0
+TAMANHO_SHARD_PADRAO = 50
+
+
+def id_worker_padrao() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _shards_workers(batch_dir: str) -> list[str]:
+    """Arquivos de resultado por worker ainda não compactados no JSON do batch."""
+    return sorted(os.path.basename(c) for c in
+                  glob_module.glob(os.path.join(batch_dir, RESULTADO_WORKER_PREFIXO + "*.jsonl")))
 
-    print(f"  Batch '{batch_nome}' concluído: {len(resultados)} problemas avaliados.")
+
+def ler_lease(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def leases_ativos(batch_dir: str) -> list[dict]:
+    """Leases de shards ainda válidos (não expirados) no batch."""
+    ativos = []
+    agora = time.time()
+    for path in glob_module.glob(os.path.join(batch_dir, LEASES_DIR, "*.lease")):
+        lease = ler_lease(path)
+        if lease and lease.get("expira_em", 0) > agora:
+            ativos.append({**lease, "shard": os.path.basename(path)[:-len(".lease")]})
+    return ativos
+
+
+class LeaseShard:
+    """
+    Lease de um shard do batch em batches/<batch>/leases/<nome>.lease.
+
+    Criado com O_EXCL (só um worker consegue), renovado por uma thread a cada ttl/3
+    enquanto o shard é avaliado, então um worker saudável sempre tem ao menos 2/3 do
+    TTL de folga. Um lease cujo `expira_em` passou (worker morto ou travado) é
+    retomado por outro: o arquivo é retirado com rename atômico, de modo que só um
+    dos concorrentes vence. A renovação confere o dono e regrava pelo mesmo descritor
+    (mesmo inode), em vez de substituir o caminho, então nunca sobrescreve o lease de
+    quem o retomou; o dono antigo percebe a troca e abandona o shard. Funciona entre máquinas que compartilham o
+    sistema de arquivos, desde que os relógios não divirjam mais que o TTL. Numa
+    corrida rara dois workers podem avaliar o mesmo problema; os resultados são
+    mesclados por título, então o custo é só a avaliação repetida.
+    """
+
+    def __init__(self, leases_dir: str, nome: str, worker: str, ttl: float = LEASE_TTL_PADRAO):
+        self.path = os.path.join(leases_dir, f"{nome}.lease")
+        self.path_ok = os.path.join(leases_dir, f"{nome}.ok")
+        self.worker = worker
+        self.ttl = ttl
+        self.retomado = False
+        self.perdido = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _conteudo(self) -> str:
+        return json.dumps({"worker": self.worker, "host": socket.gethostname(), "pid": os.getpid(),
+                           "expira_em": time.time() + self.ttl})
+
+    def _e_meu(self, lease: Optional[dict]) -> bool:
+        # worker + host + pid: o nome do worker sozinho pode se repetir entre processos
+        return bool(lease) and (lease.get("worker"), lease.get("host"), lease.get("pid")) == \
+            (self.worker, socket.gethostname(), os.getpid())
+
+    def adquirir(self) -> bool:
+        """Cria o lease (ou retoma um expirado). False se outro worker o detém."""
+        for _ in range(3):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileNotFoundError:
+                return False  # diretório de leases removido: o batch acabou de ser compactado
+            except FileExistsError:
+                try:
+                    mtime = os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                # Lease ilegível (sendo escrito agora) vale por um TTL a partir da última escrita
+                atual = ler_lease(self.path)
+                expira_em = atual.get("expira_em", 0) if atual else mtime + self.ttl
+                if expira_em > time.time():
+                    return False
+                retirado = f"{self.path}.{self.worker}.expirado"
+                try:
+                    os.rename(self.path, retirado)
+                except FileNotFoundError:
+                    continue
+                os.remove(retirado)
+                self.retomado = True
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._conteudo())
+            return True
+        return False
+
+    def renovar(self) -> bool:
+        """Estende o lease; False (e `perdido` sinalizado) se outro worker o retomou."""
+        try:
+            f = open(self.path, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            self.perdido.set()
+            return False
+        with f:
+            # Verificação e escrita pelo mesmo descritor, preso ao inode aberto: se o lease
+            # for retomado entre as duas, a escrita cai no arquivo retirado, não no novo
+            try:
+                meu = self._e_meu(json.load(f))
+            except json.JSONDecodeError:
+                meu = False  # só este worker escreve no próprio lease, e nunca pela metade aqui
+            if not meu:
+                self.perdido.set()
+                return False
+            # Leitores que pegarem a escrita pela metade usam o mtime (lease ilegível)
+            f.seek(0)
+            f.write(self._conteudo())
+            f.truncate()
+        return True
+
+    def _renovar_periodicamente(self):
+        while not self._parar.wait(self.ttl / 3):
+            if not self.renovar():
+                print(f"    [Lease] {os.path.basename(self.path)} foi retomado por outro worker; "
+                      f"abandonando o shard")
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._renovar_periodicamente, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def liberar(self):
+        """Remove o lease, se ainda for deste worker."""
+        if self._e_meu(ler_lease(self.path)):
+            os.remove(self.path)
+
+    def concluir(self):
+        """Marca o shard como avaliado e libera o lease."""
+        with open(self.path_ok, "w", encoding="utf-8") as f:
+            f.write(self.worker)
+        self.liberar()
+
+
+def _enquanto_valido(avaliacoes, lease: LeaseShard):
+    """Repassa as avaliações até o lease ser perdido."""
+    for item in avaliacoes:
+        yield item
+        if lease.perdido.is_set():
+            return
+
+
+def _remover_arquivos_workers(batch_dir: str, filas: bool = True):
+    """Remove shards de resultado, leases e (com `filas`) as filas de retry dos workers, já compactados."""
+    for nome in _shards_workers(batch_dir):
+        os.remove(os.path.join(batch_dir, nome))
+    if filas:
+        for path in glob_module.glob(os.path.join(batch_dir, FILA_RETRY_WORKER_PREFIXO + "*.json")):
+            os.remove(path)
+    shutil.rmtree(os.path.join(batch_dir, LEASES_DIR), ignore_errors=True)
+
+
+def compactar_batch_workers(batch_dir: str, problemas: list[dict]) -> list[dict]:
+    """Mescla JSON do batch, log e shards dos workers num único avaliacao_batch.json."""
+    resultados = carregar_resultados_batch(batch_dir)
+    _ordenar_resultados(resultados, problemas)
+    avaliados = {r["problema"] for r in resultados}
+    falhas = {t: v for t, v in _carregar_fila_retry(batch_dir).items() if t not in avaliados}
+
+    _gravar_json_atomico(os.path.join(batch_dir, BATCH_EVAL_FILE), resultados, indent=2)
+    fila_path = os.path.join(batch_dir, FILA_RETRY_FILE)
+    if falhas:
+        _gravar_json_atomico(fila_path, falhas, indent=2)
+    elif os.path.exists(fila_path):
+        os.remove(fila_path)
+    if os.path.exists(os.path.join(batch_dir, BATCH_LOG_FILE)):
+        os.remove(os.path.join(batch_dir, BATCH_LOG_FILE))
+    _remover_arquivos_workers(batch_dir)
     return resultados
 
 
+def avaliar_batch_worker(base: str, batch_nome: str, worker: str, mode: str = "heuristic",
+                         model: str = "claude-sonnet-4-20250514", client=None,
+                         concorrencia: int = 1, rpm: int = 50, tpm: int = 80000, pack: int = 1,
+                         api_top: float = 10.0, calibracao: float = 2.0,
+                         orcamento: Optional["OrcamentoAPI"] = None,
+                         ttl: float = LEASE_TTL_PADRAO,
+                         tamanho_shard: int = TAMANHO_SHARD_PADRAO) -> int:
+    """
+    Avalia um batch em cooperação com outros processos (na mesma máquina ou em máquinas
+    que compartilham o diretório). O batch é dividido em shards fixos de `tamanho_shard`
+    problemas (na ordem dos CSVs); cada worker reivindica shards por lease, grava seus
+    resultados em resultados_worker_<id>.jsonl e marca o shard como concluído. Shards
+    de workers mortos são retomados quando o lease expira. O último worker a terminar
+    compacta tudo no avaliacao_batch.json. Retorna quantos problemas este worker avaliou.
+    """
+    batch_dir = os.path.join(_batches_dir(base), batch_nome)
+    if not os.path.isdir(batch_dir):
+        print(f"ERRO: Batch '{batch_nome}' não encontrado em {batch_dir}")
+        return 0
+    problemas = carregar_problemas_de_diretorio(batch_dir, batch_nome)
+    if not problemas:
+        print(f"  Nenhum problema encontrado no batch '{batch_nome}'.")
+        return 0
+
+    worker = re.sub(r"[^\w.-]", "_", worker)
+    leases_dir = os.path.join(batch_dir, LEASES_DIR)
+    os.makedirs(leases_dir, exist_ok=True)
+    shards = [problemas[i:i + tamanho_shard] for i in range(0, len(problemas), tamanho_shard)]
+    avaliados = {r["problema"] for r in carregar_resultados_batch(batch_dir)}
+    print(f"  Worker {worker}: {len(shards)} shards de até {tamanho_shard} problemas "
+          f"(lease de {ttl:.0f}s), {len(avaliados)} problemas já avaliados")
+
+    camadas, notas_heuristicas = {}, {}
+    if mode == "cascade":
+        camadas, notas_heuristicas = planejar_cascata(problemas, api_top, calibracao, batch_nome)
+    modelo_cache = model if mode in ("api", "cascade") else MODELO_HEURISTICO
+    cache = carregar_cache(base)
+    n_cache_inicial = len(cache)
+    limitador = LimitadorTokenBucket(rpm, tpm)
+    estatisticas = EstatisticasAPI()
+    fila_path = os.path.join(batch_dir, f"{FILA_RETRY_WORKER_PREFIXO}{worker}.json")
+    falhas = {}
+    resultados = []
+    log = LogAvaliacoes(os.path.join(batch_dir, f"{RESULTADO_WORKER_PREFIXO}{worker}.jsonl"))
+
+    def concluido(indice: int) -> bool:
+        return (os.path.exists(os.path.join(leases_dir, f"shard_{indice:04d}.ok"))
+                or all(p["problema"] in avaliados for p in shards[indice]))
+
+    try:
+        while True:
+            restantes = [i for i in range(len(shards)) if not concluido(i)]
+            if not restantes or (orcamento and orcamento.esgotado()):
+                break
+            reivindicados = 0
+            for indice in restantes:
+                if orcamento and orcamento.esgotado():
+                    break
+                lease = LeaseShard(leases_dir, f"shard_{indice:04d}", worker, ttl)
+                if concluido(indice) or not lease.adquirir():
+                    continue
+                reivindicados += 1
+                if lease.retomado:
+                    print(f"  Shard {indice + 1} retomado de um worker cujo lease expirou")
+                    avaliados = {r["problema"] for r in carregar_resultados_batch(batch_dir)}
+                pendentes = [p for p in shards[indice] if p["problema"] not in avaliados]
+                print(f"  Shard {indice + 1}/{len(shards)}: {len(pendentes)} problemas")
+
+                with lease:
+                    do_cache = [p for p in pendentes if chave_cache(p, modelo_cache) in cache
+                                and camadas.get(p["problema"], {}).get("camada") != CAMADA_HEURISTICA]
+                    for p in do_cache:
+                        resultado = _montar_resultado(p, batch_nome, dict(cache[chave_cache(p, modelo_cache)]))
+                        resultado.update(camadas.get(p["problema"], {}))
+                        resultados.append(resultado)
+                        log.registrar(resultado)
+                    titulos_cache = {p["problema"] for p in do_cache}
+                    pendentes = [p for p in pendentes if p["problema"] not in titulos_cache]
+
+                    if mode == "api" and client:
+                        avaliacoes = _avaliacoes_api(client, pendentes, model, concorrencia, rpm, tpm, pack,
+                                                     orcamento, limitador)
+                    elif mode == "cascade" and client:
+                        via_heuristica = [p for p in pendentes
+                                          if camadas[p["problema"]]["camada"] == CAMADA_HEURISTICA]
+                        via_api = [p for p in pendentes if camadas[p["problema"]]["camada"] != CAMADA_HEURISTICA]
+                        avaliacoes = chain(
+                            ((p, notas_heuristicas[p["problema"]], None) for p in via_heuristica),
+                            _avaliacoes_api(client, via_api, model, concorrencia, rpm, tpm, pack,
+                                            orcamento, limitador),
+                        )
+                    else:
+                        avaliacoes = ((p, avaliar_problema_heuristico(p), None) for p in pendentes)
+                    with PERFIL.etapa("avaliar"):
+                        _consumir_avaliacoes(_enquanto_valido(avaliacoes, lease), resultados, log, cache,
+                                             modelo_cache, batch_nome, len(problemas), len(pendentes),
+                                             estatisticas, camadas, orcamento, falhas)
+                    log.fechar()
+
+                avaliados.update(r["problema"] for r in resultados)
+                if lease.perdido.is_set() or (orcamento and orcamento.esgotado()):
+                    lease.liberar()
+                else:
+                    lease.concluir()
+
+            if not reivindicados and not (orcamento and orcamento.esgotado()):
+                # Os shards restantes estão com outros workers: esperar terminarem ou o lease expirar
+                ativos = leases_ativos(batch_dir)
+                if ativos:
+                    espera = min(ttl / 3, 10.0)
+                    print(f"  {len(ativos)} shards com outros workers; verificando de novo em {espera:.0f}s...")
+                    time.sleep(espera)
+                else:
+                    time.sleep(1.0)
+                avaliados = {r["problema"] for r in carregar_resultados_batch(batch_dir)}
+    finally:
+        log.fechar()
+        if len(cache) != n_cache_inicial:
+            # Outros workers também gravam o cache: mesclar com o que está no disco
+            salvar_cache(base, {**carregar_cache(base), **cache})
+        if falhas:
+            _gravar_json_atomico(fila_path, falhas, indent=2)
+        elif os.path.exists(fila_path):
+            os.remove(fila_path)
+        PARSE.salvar(base)
+
+    print(f"  Worker {worker}: {len(resultados)} problemas avaliados no batch '{batch_nome}'")
+    if orcamento and orcamento.esgotado():
+        print(f"  Orçamento atingido ({orcamento.descricao()}); shards restantes ficam para outros workers "
+              f"ou para a próxima execução.")
+    elif not leases_ativos(batch_dir):
+        # Último worker: compactar (o lease "compactacao" impede que dois façam isso ao mesmo tempo)
+        compactacao = LeaseShard(leases_dir, "compactacao", worker, ttl)
+        if os.path.isdir(leases_dir) and compactacao.adquirir():
+            total = len(compactar_batch_workers(batch_dir, problemas))
+            print(f"  Batch '{batch_nome}' compactado: {total} problemas avaliados")
+    estatisticas.imprimir_resumo()
+    return len(resultados)
+
+
 # ============================================================================
 # BANCO GERAL (CONSOLIDAÇÃO)
 # ============================================================================
 
+def _arquivos_resultado(batch_path: str) -> list[str]:
+    """Arquivos de resultado existentes num batch (JSON compactado, log em andamento e shards de workers)."""
+    return [nome for nome in (BATCH_EVAL_FILE, BATCH_LOG_FILE)
+            if os.path.exists(os.path.join(batch_path, nome))] + _shards_workers(batch_path)
+
+
+def _hash_arquivo(path: str) -> str:
+    """SHA-256 do conteúdo de um arquivo (lido em blocos)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _assinatura_arquivos(diretorio: str, nomes: list[str], anterior: dict) -> dict:
+    """
+    {nome: {size, mtime_ns, sha256}} dos arquivos. O hash só é recalculado quando
+    tamanho ou mtime diferem do registrado em `anterior`.
+    """
+    assinatura = {}
+    for nome in nomes:
+        st = os.stat(os.path.join(diretorio, nome))
+        prev = anterior.get(nome, {})
+        if prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            sha = prev["sha256"]
+        else:
+            sha = _hash_arquivo(os.path.join(diretorio, nome))
+        assinatura[nome] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+    return assinatura
+
+
+def _carregar_manifest(base: str) -> dict:
+    path = os.path.join(base, BANCO_MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"banco": {}, "batches": {}}
+
+
+@PERFIL.medir("consolidar")
 def consolidar_banco_geral(base: str) -> list[dict]:
-    """Consolida todos os batches avaliados num único banco de dados."""
+    """
+    Consolida todos os batches avaliados num único banco de dados.
+
+    Incremental: o manifest registra tamanho, mtime e hash dos arquivos de
+    resultado de cada batch. Só os batches alterados são relidos; os demais vêm
+    do banco já consolidado. Se o resultado não mudou, o banco não é regravado.
+    Com o backend SQLite a consolidação é feita no banco (consolidar_banco_sqlite).
+    """
+    if usa_sqlite(base):
+        return consolidar_banco_sqlite(base)
+
     bdir = _batches_dir(base)
-    todos_resultados = []
+    banco_path = os.path.join(base, BANCO_GERAL_JSON)
+    manifest = _carregar_manifest(base)
+
+    # O banco em disco só serve de base se for exatamente o que o manifest descreve
+    banco_anterior = None
+    if os.path.exists(banco_path):
+        st = os.stat(banco_path)
+        banco_anterior = carregar_banco_geral(base)
+        if manifest["banco"] != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}:
+            manifest = {"banco": {}, "batches": {}}
 
+    assinaturas = {}
     for entry in sorted(os.listdir(bdir)):
-        eval_path = os.path.join(bdir, entry, BATCH_EVAL_FILE)
-        if os.path.exists(eval_path):
-            with open(eval_path, "r", encoding="utf-8") as f:
-                batch_results = json.load(f)
+        batch_path = os.path.join(bdir, entry)
+        if not os.path.isdir(batch_path):
+            continue
+        arquivos = _arquivos_resultado(batch_path)
+        if arquivos:
+            anterior = manifest["batches"].get(entry, {}).get("arquivos", {})
+            assinaturas[entry] = _assinatura_arquivos(batch_path, arquivos, anterior)
+
+    def _hashes(arquivos: dict) -> dict:
+        return {nome: a["sha256"] for nome, a in arquivos.items()}
+
+    mudados = {entry for entry, sig in assinaturas.items()
+               if entry not in manifest["batches"]
+               or _hashes(manifest["batches"][entry]["arquivos"]) != _hashes(sig)}
+    removidos = set(manifest["batches"]) - set(assinaturas)
+
+    if banco_anterior is not None and manifest["batches"] and not mudados and not removidos:
+        _salvar_manifest(base, manifest, assinaturas, banco_path)
+        print(f"  {len(assinaturas)} batches inalterados desde a última consolidação")
+        print(f"\nBanco geral consolidado: {len(banco_anterior)} problemas únicos (sem alterações)")
+        return banco_anterior
+
+    # Registros já consolidados, agrupados pelo batch de origem
+    do_banco = {}
+    for r in banco_anterior or []:
+        do_banco.setdefault(r.get("batch"), []).append(r)
+
+    todos_resultados = []
+    reaproveitados = 0
+    for entry in assinaturas:
+        n_anterior = manifest["batches"].get(entry, {}).get("n")
+        reaproveitar = do_banco.get(entry, [])
+        # Batch intacto e sem registros sombreados por batches posteriores: vem do banco
+        if entry not in mudados and n_anterior is not None and len(reaproveitar) == n_anterior:
+            batch_results = reaproveitar
+            reaproveitados += 1
+        else:
+            batch_results = carregar_resultados_batch(os.path.join(bdir, entry))
             # Garantir que cada resultado tenha o campo batch
             for r in batch_results:
                 r.setdefault("batch", entry)
-            todos_resultados.extend(batch_results)
             print(f"  Batch '{entry}': {len(batch_results)} problemas")
+        todos_resultados.extend(batch_results)
+        assinaturas[entry] = {"arquivos": assinaturas[entry], "n": len(batch_results)}
+
+    if reaproveitados:
+        print(f"  {reaproveitados} batches inalterados reaproveitados do banco geral")
 
     # Deduplicar por nome do problema (manter o mais recente)
     vistos = {}
@@ -621,75 +1833,1300 @@ def consolidar_banco_geral(base: str) -> list[dict]:
         vistos[r["problema"]] = r
     todos_resultados = list(vistos.values())
 
-    # Salvar banco geral JSON
-    banco_path = os.path.join(base, BANCO_GERAL_JSON)
-    with open(banco_path, "w", encoding="utf-8") as f:
-        json.dump(todos_resultados, f, ensure_ascii=False, indent=2)
+    # Salvar banco geral JSON (apenas se mudou); o manifest só é atualizado depois
+    # que o banco novo está inteiro no disco
+    if todos_resultados != banco_anterior:
+        _gravar_json_atomico(banco_path, todos_resultados, indent=2)
+    else:
+        print("  Banco geral idêntico ao existente; arquivo não regravado")
+
+    manifest["batches"] = assinaturas
+    _salvar_manifest(base, manifest, None, banco_path)
 
     print(f"\nBanco geral consolidado: {len(todos_resultados)} problemas únicos")
     return todos_resultados
 
 
-def gerar_ranking_geral(resultados: list[dict], base: str) -> str:
-    """Gera o CSV de ranking geral unificado."""
-    return gerar_csv_final(resultados, base, nome_arquivo=BANCO_GERAL_CSV)
+def _salvar_manifest(base: str, manifest: dict, assinaturas: Optional[dict], banco_path: str):
+    """Grava o manifest com o estado atual do banco (e assinaturas atualizadas, se dadas)."""
+    if assinaturas is not None:
+        # Mesmo conteúdo, mas mtimes podem ter mudado: atualizar para evitar re-hash
+        for entry, sig in assinaturas.items():
+            manifest["batches"][entry]["arquivos"] = sig
+    st = os.stat(banco_path)
+    manifest["banco"] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    _gravar_json_atomico(os.path.join(base, BANCO_MANIFEST_FILE), manifest, indent=1)
+
+
+@PERFIL.medir("carregar_banco")
+def carregar_banco_geral(base: str) -> list[dict]:
+    """Carrega o banco geral consolidado (lista vazia se ainda não existir)."""
+    if usa_sqlite(base):
+        return carregar_banco_sqlite(base)
+    banco_path = os.path.join(base, BANCO_GERAL_JSON)
+    if os.path.exists(banco_path):
+        with open(banco_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+
+def gerar_ranking_geral(resultados: list[dict], base: str, resumo: bool = True) -> str:
+    """Gera o CSV de ranking geral unificado (incremental, via atualizar_ranking_geral)."""
+    ordenados, info = atualizar_ranking_geral(resultados, base)
+    output_path = os.path.join(base, BANCO_GERAL_CSV)
+    if not resumo:
+        return output_path
+    print(f"\nCSV gerado: {output_path}")
+    print(f"Total de problemas avaliados: {len(ordenados)}")
+    if info["incremental"]:
+        faixa = f"posições #{info['faixa'][0]}–#{info['faixa'][1]} afetadas" if info["faixa"] else "nenhuma posição alterada"
+        print(f"  Ranking incremental: {info['formatadas']} linhas formatadas, {info['reaproveitadas']} reaproveitadas, "
+              f"{info['removidas']} removidas; {faixa}")
+    imprimir_resumo_ranking(ordenados)
+    return output_path
+
+
+# ============================================================================
+# BANCO GERAL EM SQLITE (OPCIONAL)
+# ============================================================================
+
+BANCO_SQLITE = "banco_geral.sqlite3"
+STORES = ("auto", "json", "sqlite")
+CAMPOS_TEXTO = ("descricao", "desenvolvimento", "arquivo_fonte")
+
+# Backend do banco geral escolhido pela CLI (auto = SQLite se o arquivo já existir)
+_STORE = "auto"
+
+
+def definir_store(store: str):
+    """Define o backend do banco geral para o processo (json, sqlite ou auto)."""
+    global _STORE
+    _STORE = store
+
+
+def usa_sqlite(base: str) -> bool:
+    """Indica se o banco geral deve ser lido e gravado via SQLite."""
+    if _STORE == "auto":
+        return os.path.exists(os.path.join(base, BANCO_SQLITE))
+    return _STORE == "sqlite"
+
+
+def _colunas_pontuacao() -> list[str]:
+    """Colunas de pontuação de um registro, na ordem de calcular_pontuacoes."""
+    colunas = []
+    for cat_key in FRAMEWORK:
+        colunas += [f"subtotal_{cat_key}", f"max_{cat_key}", f"pct_{cat_key}"]
+    return colunas + ["total_geral", "max_total", "pct_total"]
+
+
+def _hash_problema(titulo: str) -> str:
+    """Chave de deduplicação do banco geral (o título do problema)."""
+    return hashlib.sha256(titulo.encode("utf-8")).hexdigest()
+
+
+def abrir_banco_sqlite(base: str) -> sqlite3.Connection:
+    """Abre (criando o esquema, se preciso) o banco geral em SQLite."""
+    conn = sqlite3.connect(os.path.join(base, BANCO_SQLITE))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    # Colunas sem tipo declarado: inteiros continuam inteiros e pct continuam float
+    pontuacao = ",\n            ".join(_colunas_pontuacao())
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS batches (
+            nome TEXT PRIMARY KEY,
+            assinatura TEXT NOT NULL,
+            n INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS problemas (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE,
+            problema TEXT NOT NULL,
+            primeiro_batch TEXT,
+            posicao INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS avaliacoes (
+            id INTEGER PRIMARY KEY,
+            problema_id INTEGER NOT NULL REFERENCES problemas(id),
+            batch TEXT NOT NULL REFERENCES batches(nome) ON DELETE CASCADE,
+            posicao INTEGER NOT NULL,
+            vigente INTEGER NOT NULL DEFAULT 0,
+            descricao, desenvolvimento, arquivo_fonte,
+            {pontuacao},
+            extra TEXT,
+            UNIQUE (problema_id, batch)
+        );
+        CREATE TABLE IF NOT EXISTS notas (
+            avaliacao_id INTEGER NOT NULL REFERENCES avaliacoes(id) ON DELETE CASCADE,
+            criterio TEXT NOT NULL,
+            nota INTEGER NOT NULL,
+            PRIMARY KEY (avaliacao_id, criterio)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_avaliacoes_batch ON avaliacoes(batch);
+        CREATE INDEX IF NOT EXISTS idx_avaliacoes_pct_total ON avaliacoes(vigente, pct_total);
+    """)
+    return conn
+
+
+def _inserir_batch_sqlite(conn: sqlite3.Connection, batch_nome: str, resultados: list[dict]):
+    """Grava as avaliações de um batch (já removidas as anteriores do mesmo batch)."""
+    colunas = _colunas_pontuacao()
+    conhecidos = {"problema", "batch", "notas", "ranking", *CAMPOS_TEXTO, *colunas}
+
+    # Título repetido dentro do batch: vale a posição da primeira ocorrência e o conteúdo da última
+    por_titulo = {}
+    for pos, r in enumerate(resultados):
+        por_titulo[r["problema"]] = (por_titulo.get(r["problema"], (pos,))[0], r)
+
+    conn.executemany("INSERT OR IGNORE INTO problemas (hash, problema) VALUES (?, ?)",
+                     ((_hash_problema(t), t) for t in por_titulo))
+    sql = (f"INSERT INTO avaliacoes (problema_id, batch, posicao, {', '.join(CAMPOS_TEXTO)}, "
+           f"{', '.join(colunas)}, extra) VALUES ({', '.join('?' * (len(CAMPOS_TEXTO) + len(colunas) + 4))})")
+    for titulo, (pos, r) in por_titulo.items():
+        problema_id = conn.execute("SELECT id FROM problemas WHERE hash = ?",
+                                   (_hash_problema(titulo),)).fetchone()[0]
+        extra = {k: v for k, v in r.items() if k not in conhecidos}
+        cur = conn.execute(sql, (problema_id, batch_nome, pos,
+                                 *(r.get(c, "") for c in CAMPOS_TEXTO),
+                                 *(r.get(c, 0) for c in colunas),
+                                 json.dumps(extra, ensure_ascii=False) if extra else None))
+        conn.executemany("INSERT INTO notas (avaliacao_id, criterio, nota) VALUES (?, ?, ?)",
+                         ((cur.lastrowid, cid, nota) for cid, nota in r.get("notas", {}).items()))
+
+
+def consolidar_banco_sqlite(base: str) -> list[dict]:
+    """
+    Consolida os batches no banco SQLite. Só os batches cujos arquivos de resultado
+    mudaram são regravados; a deduplicação por título (vale o batch mais recente) é
+    refeita apenas para os problemas tocados.
+    """
+    bdir = _batches_dir(base)
+    conn = abrir_banco_sqlite(base)
+    try:
+        anteriores = {row["nome"]: json.loads(row["assinatura"])
+                      for row in conn.execute("SELECT nome, assinatura FROM batches")}
+
+        assinaturas = {}
+        for entry in sorted(os.listdir(bdir)):
+            batch_path = os.path.join(bdir, entry)
+            if not os.path.isdir(batch_path):
+                continue
+            arquivos = _arquivos_resultado(batch_path)
+            if arquivos:
+                assinaturas[entry] = _assinatura_arquivos(batch_path, arquivos, anteriores.get(entry, {}))
+
+        def _hashes(arquivos: dict) -> dict:
+            return {nome: a["sha256"] for nome, a in arquivos.items()}
+
+        mudados = sorted(entry for entry, sig in assinaturas.items()
+                         if entry not in anteriores or _hashes(anteriores[entry]) != _hashes(sig))
+        removidos = sorted(set(anteriores) - set(assinaturas))
+
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS afetados (id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM afetados")
+            for entry in removidos + mudados:
+                conn.execute("INSERT OR IGNORE INTO afetados SELECT problema_id FROM avaliacoes "
+                             "WHERE batch = ?", (entry,))
+                conn.execute("DELETE FROM avaliacoes WHERE batch = ?", (entry,))
+            conn.executemany("DELETE FROM batches WHERE nome = ?", ((e,) for e in removidos))
+
+            for entry in mudados:
+                batch_results = carregar_resultados_batch(os.path.join(bdir, entry))
+                conn.execute("INSERT INTO batches (nome, assinatura, n) VALUES (?, ?, ?) "
+                             "ON CONFLICT(nome) DO UPDATE SET assinatura = excluded.assinatura, n = excluded.n",
+                             (entry, json.dumps(assinaturas[entry]), len(batch_results)))
+                _inserir_batch_sqlite(conn, entry, batch_results)
+                conn.execute("INSERT OR IGNORE INTO afetados SELECT problema_id FROM avaliacoes "
+                             "WHERE batch = ?", (entry,))
+                print(f"  Batch '{entry}': {len(batch_results)} problemas")
+
+            # Mesmo conteúdo, mas mtimes podem ter mudado: atualizar para evitar re-hash
+            conn.executemany("UPDATE batches SET assinatura = ? WHERE nome = ?",
+                             ((json.dumps(sig), entry) for entry, sig in assinaturas.items()
+                              if entry not in mudados))
+
+            # Deduplicação: a avaliação vigente é a do batch mais recente; a ordem do
+            # banco segue a primeira aparição do título (como no banco JSON)
+            conn.execute("UPDATE avaliacoes SET vigente = 0 WHERE problema_id IN (SELECT id FROM afetados)")
+            conn.execute("""
+                UPDATE avaliacoes SET vigente = 1 WHERE id IN (
+                    SELECT (SELECT a.id FROM avaliacoes a WHERE a.problema_id = t.id
+                            ORDER BY a.batch DESC LIMIT 1)
+                    FROM afetados t)""")
+            conn.execute("""
+                UPDATE problemas SET (primeiro_batch, posicao) = (
+                    SELECT a.batch, a.posicao FROM avaliacoes a WHERE a.problema_id = problemas.id
+                    ORDER BY a.batch, a.posicao LIMIT 1)
+                WHERE id IN (SELECT id FROM afetados)""")
+            conn.execute("""
+                DELETE FROM problemas WHERE id IN (SELECT id FROM afetados)
+                AND NOT EXISTS (SELECT 1 FROM avaliacoes WHERE problema_id = problemas.id)""")
+
+        n_unicos = conn.execute("SELECT COUNT(*) FROM problemas").fetchone()[0]
+    finally:
+        conn.close()
+
+    if not mudados and not removidos:
+        print(f"  {len(assinaturas)} batches inalterados desde a última consolidação")
+    print(f"\nBanco geral consolidado (SQLite): {n_unicos} problemas únicos")
+    return carregar_banco_sqlite(base)
+
+
+def _registros_sqlite(conn: sqlite3.Connection, filtro: str = "", params: tuple = (),
+                      ordem: str = "p.primeiro_batch, p.posicao",
+                      limite: Optional[int] = None) -> list[dict]:
+    """Monta registros no formato do banco JSON a partir das avaliações vigentes."""
+    colunas = _colunas_pontuacao()
+    sql = (f"SELECT a.*, p.problema FROM avaliacoes a JOIN problemas p ON p.id = a.problema_id "
+           f"WHERE a.vigente = 1 {filtro} ORDER BY {ordem}")
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    linhas = conn.execute(sql, params).fetchall()
+
+    notas = {}
+    ids = [linha["id"] for linha in linhas]
+    for i in range(0, len(ids), 500):
+        bloco = ids[i:i + 500]
+        for aid, cid, nota in conn.execute(
+                f"SELECT avaliacao_id, criterio, nota FROM notas WHERE avaliacao_id IN "
+                f"({', '.join('?' * len(bloco))})", bloco):
+            notas.setdefault(aid, {})[cid] = nota
+
+    registros = []
+    for linha in linhas:
+        r = {"problema": linha["problema"]}
+        r.update((c, linha[c]) for c in CAMPOS_TEXTO)
+        r["batch"] = linha["batch"]
+        r["notas"] = notas.get(linha["id"], {})
+        r.update((c, linha[c]) for c in colunas)
+        if linha["extra"]:
+            r.update(json.loads(linha["extra"]))
+        registros.append(r)
+    return registros
+
+
+def carregar_banco_sqlite(base: str) -> list[dict]:
+    """Carrega o banco geral inteiro do SQLite, na mesma ordem do banco JSON."""
+    if not os.path.exists(os.path.join(base, BANCO_SQLITE)):
+        return []
+    conn = abrir_banco_sqlite(base)
+    try:
+        return _registros_sqlite(conn)
+    finally:
+        conn.close()
+
+
+def consultar_banco_sqlite(base: str, categoria: Optional[str] = None, batch: Optional[str] = None,
+                           min_pct: Optional[float] = None, top: int = 20) -> list[dict]:
+    """Top-N do banco por pct da categoria (ou total), sem carregar o banco inteiro."""
+    coluna = f"pct_{categoria}" if categoria else "pct_total"
+    filtro, params = "", []
+    if batch:
+        filtro += " AND a.batch = ?"
+        params.append(batch)
+    if min_pct is not None:
+        filtro += f" AND a.{coluna} >= ?"
+        params.append(min_pct)
+    conn = abrir_banco_sqlite(base)
+    try:
+        return _registros_sqlite(conn, filtro, tuple(params),
+                                 ordem=f"a.{coluna} DESC, p.primeiro_batch, p.posicao", limite=top)
+    finally:
+        conn.close()
+
+
+def resumo_banco_sqlite(base: str) -> dict:
+    """Contagens do banco SQLite para o status."""
+    conn = abrir_banco_sqlite(base)
+    try:
+        return {
+            "problemas": conn.execute("SELECT COUNT(*) FROM problemas").fetchone()[0],
+            "avaliacoes": conn.execute("SELECT COUNT(*) FROM avaliacoes").fetchone()[0],
+            "batches": conn.execute("SELECT COUNT(*) FROM batches").fetchone()[0],
+            "media_pct": conn.execute("SELECT AVG(pct_total) FROM avaliacoes WHERE vigente = 1").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# RERANKING COM PESOS ALTERNATIVOS (WHAT-IF)
+# ============================================================================
+
+RERANK_CSV = "banco_geral_rerank.csv"
+
+
+def _ids_criterios() -> list[tuple[str, str, int]]:
+    """Lista (categoria, id, peso) de todos os critérios, na ordem do FRAMEWORK."""
+    return [(cat_key, c["id"], c["peso"])
+            for cat_key, cat_data in FRAMEWORK.items() for c in cat_data["criterios"]]
+
+
+class MatrizNotas:
+    """Banco carregado como matriz densa problemas × critérios (int8, linha a linha)."""
+
+    def __init__(self, resultados: list[dict]):
+        self.criterios = _ids_criterios()
+        self.problemas = [r["problema"] for r in resultados]
+        self.batches = [r.get("batch", "") for r in resultados]
+        self.n = len(resultados)
+        self.m = len(self.criterios)
+        ids = [cid for _, cid, _ in self.criterios]
+        # Mesma regra de calcular_pontuacoes: critério ausente vale 5. Notas fracionárias
+        # (bancos antigos, respostas não validadas) são arredondadas para caber em int8
+        self.dados = array("b", (int(round(r.get("notas", {}).get(cid, 5)))
+                                 for r in resultados for cid in ids))
+
+    def coluna(self, j: int) -> array:
+        """Notas de um critério para todos os problemas (fatia com passo m)."""
+        return self.dados[j::self.m]
+
+    def pontuar(self, pesos: dict) -> dict:
+        """Recalcula subtotais, pct e total com os pesos dados, num único produto matriz × vetor.
+
+        Retorna {"subtotal_<cat>": [...], "pct_<cat>": [...], "total_geral": [...],
+        "max_total": float, "pct_total": [...]}, com listas alinhadas às linhas da matriz.
+        """
+        cats = list(FRAMEWORK)
+        # Matriz de pesos critérios × categorias: subtotais = notas @ W
+        w = [[pesos[cid] if cat == c else 0 for c in cats] for cat, cid, _ in self.criterios]
+        max_cat = [10 * sum(linha[k] for linha in w) for k in range(len(cats))]
+
+        if HAS_NUMPY:
+            notas = np.frombuffer(self.dados, dtype=np.int8).reshape(self.n, self.m)
+            sub = notas @ np.array(w, dtype=np.float64)
+            # Categoria só com pesos inteiros (o caso normal) volta a int, como no caminho
+            # sem numpy; senão o CSV ganharia ".0". A soma em float64 é exata nesse caso.
+            subtotais = [(sub[:, k].astype(np.int64) if all(isinstance(linha[k], int) for linha in w)
+                          else sub[:, k]).tolist() for k in range(len(cats))]
+        else:
+            # Sem numpy: acumular coluna a coluna (cada critério contribui para uma categoria)
+            subtotais = [[0] * self.n for _ in cats]
+            for j, (cat, cid, _) in enumerate(self.criterios):
+                peso = pesos[cid]
+                if peso:
+                    k = cats.index(cat)
+                    subtotais[k] = list(map(add, subtotais[k], map(mul, self.coluna(j), repeat(peso))))
+
+        saida = {}
+        for k, cat in enumerate(cats):
+            saida[f"subtotal_{cat}"] = subtotais[k]
+            saida[f"pct_{cat}"] = ([round(s / max_cat[k] * 100, 1) for s in subtotais[k]]
+                                   if max_cat[k] > 0 else [0] * self.n)
+        totais = list(map(sum, zip(*subtotais))) if subtotais else [0] * self.n
+        max_total = sum(max_cat)
+        saida["total_geral"] = totais
+        saida["max_total"] = max_total
+        saida["pct_total"] = ([round(t / max_total * 100, 1) for t in totais]
+                              if max_total > 0 else [0] * self.n)
+        return saida
+
+
+def carregar_pesos(caminho: str) -> Optional[dict]:
+    """Lê um JSON {criterio_id: peso} e devolve os pesos completos (atuais + sobrescritos)."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        novos = json.load(f)
+    if not isinstance(novos, dict):
+        print(f"ERRO: {caminho} deve conter um objeto {{criterio_id: peso}}")
+        return None
+    pesos = {cid: peso for _, cid, peso in _ids_criterios()}
+    desconhecidos = sorted(set(novos) - set(pesos))
+    if desconhecidos:
+        print(f"ERRO: critérios desconhecidos em {caminho}: {', '.join(desconhecidos)}")
+        return None
+    for cid, peso in novos.items():
+        if isinstance(peso, bool) or not isinstance(peso, (int, float)) or peso < 0:
+            print(f"ERRO: peso inválido para '{cid}': {peso!r}")
+            return None
+        pesos[cid] = peso
+    return pesos
+
+
+def _ranking_por_total(totais: list) -> list[int]:
+    """Posição (1-based) de cada linha ao ordenar por total decrescente, estável como gerar_csv_final."""
+    if HAS_NUMPY:
+        ordem = np.argsort(-np.asarray(totais, dtype=np.float64), kind="stable").tolist()
+    else:
+        ordem = sorted(range(len(totais)), key=totais.__getitem__, reverse=True)
+    posicoes = [0] * len(totais)
+    for pos, i in enumerate(ordem, 1):
+        posicoes[i] = pos
+    return posicoes
+
+
+def _ranking_atual_csv(base: str) -> dict:
+    """Lê {problema: ranking} do banco_geral_ranking.csv atual (vazio se não existir)."""
+    path = os.path.join(base, BANCO_GERAL_CSV)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return {row["problema"]: int(row["ranking"]) for row in csv.DictReader(f)}
+
+
+def rerank_com_pesos(base: str, pesos: dict, nome_arquivo: str = RERANK_CSV,
+                     top: int = 20) -> Optional[str]:
+    """Recalcula o ranking geral com pesos alternativos e grava os deltas vs. o ranking atual."""
+    resultados = carregar_banco_geral(base)
+    if not resultados:
+        print("Banco geral vazio. Execute 'rebuild' primeiro.")
+        return None
+
+    t0 = time.perf_counter()
+    matriz = MatrizNotas(resultados)
+    t1 = time.perf_counter()
+    novo = matriz.pontuar(pesos)
+    rank_novo = _ranking_por_total(novo["total_geral"])
+    t2 = time.perf_counter()
+
+    pesos_atuais = {cid: peso for _, cid, peso in matriz.criterios}
+    atual = _ranking_atual_csv(base)
+    if atual:
+        rank_atual = [atual.get(p) for p in matriz.problemas]
+        faltando = sum(1 for r in rank_atual if r is None)
+        if faltando:
+            print(f"  AVISO: {faltando} problemas ausentes de {BANCO_GERAL_CSV} (rode 'rebuild')")
+    else:
+        print(f"  AVISO: {BANCO_GERAL_CSV} não encontrado; comparando com os pesos atuais do FRAMEWORK")
+        rank_atual = _ranking_por_total(matriz.pontuar(pesos_atuais)["total_geral"])
+
+    print(f"  Matriz {matriz.n}×{matriz.m} carregada em {t1 - t0:.3f}s; "
+          f"reranking em {t2 - t1:.3f}s ({'numpy' if HAS_NUMPY else 'python puro'})")
+
+    alterados = [cid for cid in pesos_atuais if pesos[cid] != pesos_atuais[cid]]
+    if alterados:
+        print("  Pesos alterados: " + ", ".join(
+            f"{cid} {pesos_atuais[cid]}→{pesos[cid]}" for cid in alterados))
+
+    colunas = ["ranking", "ranking_atual", "delta", "batch", "problema"]
+    for cat_key in FRAMEWORK:
+        colunas += [f"subtotal_{cat_key}", f"pct_{cat_key}"]
+    colunas += ["total_geral", "max_total", "pct_total"]
+
+    ordem = sorted(range(matriz.n), key=rank_novo.__getitem__)
+    linhas = []
+    for i in ordem:
+        ra = rank_atual[i]
+        linha = {
+            "ranking": rank_novo[i],
+            "ranking_atual": ra if ra is not None else "",
+            # Positivo = subiu no ranking com os novos pesos
+            "delta": ra - rank_novo[i] if ra is not None else "",
+            "batch": matriz.batches[i],
+            "problema": matriz.problemas[i],
+        }
+        for cat_key in FRAMEWORK:
+            linha[f"subtotal_{cat_key}"] = novo[f"subtotal_{cat_key}"][i]
+            linha[f"pct_{cat_key}"] = novo[f"pct_{cat_key}"][i]
+        linha["total_geral"] = novo["total_geral"][i]
+        linha["max_total"] = novo["max_total"]
+        linha["pct_total"] = novo["pct_total"][i]
+        linhas.append(linha)
+
+    output_path = os.path.join(base, nome_arquivo)
+    with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=colunas, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(linhas)
+
+    com_delta = [linha for linha in linhas if linha["delta"] != ""]
+    mudaram = sum(1 for linha in com_delta if linha["delta"] != 0)
+    print(f"\nCSV gerado: {output_path}")
+    print(f"Problemas que mudaram de posição: {mudaram} de {len(linhas)}")
+
+    print("\n" + "=" * 80)
+    print(f"TOP {top} COM OS NOVOS PESOS")
+    print("=" * 80)
+    for linha in linhas[:top]:
+        delta = f"{linha['delta']:+d}" if linha["delta"] != "" else "novo"
+        print(f"  #{linha['ranking']:>3d} ({delta:>5s}) | {linha['pct_total']:>5.1f}% | "
+              f"{linha['problema'][:62]}")
+
+    if mudaram:
+        por_delta = sorted(com_delta, key=lambda linha: linha["delta"], reverse=True)
+        subidas = [linha for linha in por_delta[:10] if linha["delta"] > 0]
+        quedas = [linha for linha in por_delta[::-1][:10] if linha["delta"] < 0]
+        for titulo, movidos in (("MAIORES SUBIDAS", subidas), ("MAIORES QUEDAS", quedas)):
+            if not movidos:
+                continue
+            print("\n" + "=" * 80)
+            print(titulo)
+            print("=" * 80)
+            for linha in movidos:
+                print(f"  #{linha['ranking_atual']:>3d} → #{linha['ranking']:>3d} ({linha['delta']:+d}) | "
+                      f"{linha['problema'][:60]}")
+
+    return output_path
+
+
+# ============================================================================
+# CONTROLE DE TAXA E CONCORRÊNCIA
+# ============================================================================
+
+# Tokens de saída esperados por avaliação (JSON com 50 notas, ~450 na prática, com folga).
+# Vale para a estimativa do limitador e para o tamanho dos pacotes (K e max_tokens).
+TOKENS_SAIDA_ESTIMADOS = 600
+
+
+def _estimar_tokens(texto: str) -> int:
+    """Estimativa grosseira de tokens para português (~3.5 caracteres por token)."""
+    return int(len(texto) / 3.5) + 1
+
+
+class LimitadorTokenBucket:
+    """
+    Token bucket duplo (requisições/minuto e tokens/minuto), compartilhado
+    entre as threads de avaliação.
+
+    Cada chamada reserva uma estimativa de tokens antes de ser enviada; depois
+    da resposta, `ajustar` corrige o balde com o consumo real informado pela API.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = max(1, rpm)
+        self.tpm = max(1, tpm)
+        self._requisicoes = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        decorrido = agora - self._ultimo
+        self._ultimo = agora
+        self._requisicoes = min(self.rpm, self._requisicoes + decorrido * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + decorrido * self.tpm / 60)
+
+    def adquirir(self, tokens: int):
+        """Bloqueia até haver capacidade para uma requisição com `tokens` tokens."""
+        tokens = min(tokens, self.tpm)  # uma requisição maior que o balde nunca passaria
+        while True:
+            with self._lock:
+                self._repor()
+                if self._requisicoes >= 1 and self._tokens >= tokens:
+                    self._requisicoes -= 1
+                    self._tokens -= tokens
+                    return
+                espera = max(
+                    (1 - self._requisicoes) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+            time.sleep(max(espera, 0.01))
+
+    def ajustar(self, estimado: int, real: int):
+        """Devolve (ou cobra) a diferença entre os tokens reservados e os consumidos."""
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens + estimado - real)
+
+
+# Backoff das novas tentativas (segundos) e rodadas extras para os que falharam numa execução
+BACKOFF_BASE = 1.0
+BACKOFF_TETO = 120.0
+RODADAS_REQUEUE = 2
+
+
+def _retry_after(erro) -> Optional[float]:
+    """Espera sugerida pelo servidor nos cabeçalhos retry-after-ms / retry-after, se houver."""
+    headers = getattr(getattr(erro, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # formato data HTTP: cai no backoff exponencial
+    return None
+
+
+def espera_backoff(tentativa: int, erro=None, base: float = BACKOFF_BASE) -> float:
+    """
+    Segundos até a próxima tentativa: a dica do servidor (Retry-After) quando existe,
+    senão backoff exponencial com jitter (metade fixa + metade aleatória), para que
+    workers que falharam juntos não voltem todos no mesmo instante.
+    """
+    sugerida = _retry_after(erro) if erro is not None else None
+    if sugerida is not None:
+        return min(BACKOFF_TETO, sugerida) + random.uniform(0, base)
+    teto = min(BACKOFF_TETO, base * 2 ** tentativa)
+    return teto / 2 + random.uniform(0, teto / 2)
+
+
+def _erro_sobrecarga(erro) -> bool:
+    """429, 5xx/529 ou falha de conexão: sinal de que a API (e não a requisição) está com problema."""
+    if HAS_ANTHROPIC and isinstance(erro, (anthropic.RateLimitError, anthropic.APIConnectionError)):
+        return True
+    return (getattr(erro, "status_code", None) or 0) >= 500
+
+
+class DisjuntorAPI:
+    """
+    Circuit breaker compartilhado entre os workers. Após `limiar` falhas seguidas de
+    sobrecarga (429/5xx) ele abre: todas as threads aguardam `pausa` segundos (ou o
+    Retry-After do servidor, se maior) antes da próxima requisição. Cada reabertura
+    dobra a pausa até `pausa_maxima`; um sucesso fecha e zera a contagem.
+    """
+
+    def __init__(self, limiar: int = 5, pausa: float = 30.0, pausa_maxima: float = 300.0):
+        self.limiar = limiar
+        self.pausa_inicial = pausa
+        self.pausa_maxima = pausa_maxima
+        self._pausa = pausa
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self.aberturas = 0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia enquanto o disjuntor estiver aberto."""
+        while True:
+            with self._lock:
+                restante = self._aberto_ate - time.monotonic()
+            if restante <= 0:
+                return
+            with PERFIL.etapa("disjuntor_aberto"):
+                time.sleep(restante)
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self._pausa = self.pausa_inicial
+
+    def registrar_falha(self, espera_sugerida: Optional[float] = None):
+        with self._lock:
+            self._falhas += 1
+            if self._falhas < self.limiar or self._aberto_ate > time.monotonic():
+                return
+            pausa = max(self._pausa, espera_sugerida or 0)
+            self._aberto_ate = time.monotonic() + pausa
+            self._pausa = min(self.pausa_maxima, self._pausa * 2)
+            self._falhas = 0
+            self.aberturas += 1
+        print(f"    [Disjuntor] {self.limiar} falhas seguidas de sobrecarga; "
+              f"pausando todos os workers por {pausa:.0f}s")
+
+
+def _executar_concorrente(funcao, itens: list, concorrencia: int,
+                          parar: Optional[threading.Event] = None):
+    """
+    Executa `funcao(item)` em paralelo, entregando (item, resultado) à medida que
+    concluem. Mantém no máximo 2x `concorrencia` tarefas submetidas, de modo que
+    interromper a iteração não dispara o restante da fila. Com `parar` sinalizado,
+    nenhuma tarefa nova é submetida e só as em voo são entregues.
+    """
+    concorrencia = max(1, concorrencia)
+    fila = iter(itens)
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        em_voo = {executor.submit(funcao, item): item
+                  for item in islice(fila, concorrencia * 2)}
+        while em_voo:
+            concluidos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                item = em_voo.pop(futuro)
+                yield item, futuro.result()
+            if parar is not None and parar.is_set():
+                continue
+            for item in islice(fila, len(concluidos)):
+                em_voo[executor.submit(funcao, item)] = item
 
 
 # ============================================================================
 # AVALIAÇÃO VIA API
 # ============================================================================
 
-def avaliar_problema(client: anthropic.Anthropic, problema: dict, model: str,
-                     max_retries: int = 3) -> Optional[dict]:
-    """Avalia um único problema usando a API do Claude."""
+_SAIDA_ESTRUTURADA = True
+
+
+def definir_saida_estruturada(ativa: bool):
+    """Liga/desliga a saída estruturada (tool use com schema) para o processo."""
+    global _SAIDA_ESTRUTURADA
+    _SAIDA_ESTRUTURADA = ativa
+
+
+def _parametros_avaliacao(model: str, prompt: str, max_tokens: int = 2000, k: int = 1) -> dict:
+    """Parâmetros de `messages.create` para avaliar um prompt (API síncrona e bulk)."""
+    parametros = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": 0.3,
+        "system": build_system_blocks(),
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    if _SAIDA_ESTRUTURADA:
+        # A ferramenta vem antes do system no prefixo, então também entra no prompt cache
+        parametros["tools"] = [ferramenta_notas(k)]
+        parametros["tool_choice"] = {"type": "tool", "name": FERRAMENTA_NOTAS}
+    return parametros
+
+
+class ContadorParse:
+    """
+    Respostas e falhas de parse por modelo e formato de saída (tool ou texto).
+    `salvar` acumula a contagem da execução em PARSE_STATS_FILE, lido pelo `status`.
+    """
+
+    def __init__(self):
+        self._contagem = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, model: str, ok: bool):
+        chave = f"{model}|{'tool' if _SAIDA_ESTRUTURADA else 'texto'}"
+        with self._lock:
+            c = self._contagem.setdefault(chave, {"respostas": 0, "falhas_parse": 0})
+            c["respostas"] += 1
+            if not ok:
+                c["falhas_parse"] += 1
+
+    def salvar(self, base: str):
+        with self._lock:
+            contagem, self._contagem = self._contagem, {}
+        if not contagem:
+            return
+        acumulado = carregar_estatisticas_parse(base)
+        for chave, c in contagem.items():
+            total = acumulado.setdefault(chave, {"respostas": 0, "falhas_parse": 0})
+            total["respostas"] += c["respostas"]
+            total["falhas_parse"] += c["falhas_parse"]
+        _gravar_json_atomico(os.path.join(base, PARSE_STATS_FILE), acumulado, indent=2)
+
+
+def carregar_estatisticas_parse(base: str) -> dict:
+    """Contagem acumulada de respostas/falhas de parse ({"modelo|formato": {...}})."""
+    path = os.path.join(base, PARSE_STATS_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+PARSE = ContadorParse()
+
+
+CAMPOS_USO = ("input_tokens", "output_tokens",
+              "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# US$ por milhão de tokens, na ordem de CAMPOS_USO (input, output, leitura e escrita de cache)
+PRECOS_MODELOS = {
+    "claude-opus-4": (15.0, 75.0, 1.50, 18.75),
+    "claude-sonnet-4": (3.0, 15.0, 0.30, 3.75),
+    "claude-3-7-sonnet": (3.0, 15.0, 0.30, 3.75),
+    "claude-3-5-sonnet": (3.0, 15.0, 0.30, 3.75),
+    "claude-3-5-haiku": (0.80, 4.0, 0.08, 1.00),
+    "claude-3-haiku": (0.25, 1.25, 0.03, 0.30),
+}
+PRECO_PADRAO = PRECOS_MODELOS["claude-sonnet-4"]
+DESCONTO_LOTE = 0.5   # Message Batches custa metade
+
+
+def _precos_modelo(model: str) -> tuple:
+    for prefixo in sorted(PRECOS_MODELOS, key=len, reverse=True):
+        if model.startswith(prefixo):
+            return PRECOS_MODELOS[prefixo]
+    return PRECO_PADRAO
+
+
+def custo_uso(uso: dict, model: str) -> float:
+    """Custo em US$ de um registro de uso (com desconto se veio de um job bulk)."""
+    custo = sum(uso.get(campo, 0) * preco for campo, preco in zip(CAMPOS_USO, _precos_modelo(model))) / 1e6
+    return custo * DESCONTO_LOTE if uso.get("lote") else custo
+
+
+def total_tokens(uso: dict) -> int:
+    return sum(uso.get(campo, 0) for campo in CAMPOS_USO)
+
+
+class OrcamentoAPI:
+    """
+    Teto de custo (US$) e/ou de tokens de uma execução de evaluate. Ao ser atingido,
+    sinaliza `parar`: nenhuma requisição nova é iniciada, as que já estão em voo
+    são registradas e o restante do batch fica pendente para a próxima execução.
+    """
+
+    def __init__(self, max_custo: Optional[float] = None, max_tokens: Optional[int] = None):
+        self.max_custo = max_custo
+        self.max_tokens = max_tokens
+        self.custo = 0.0
+        self.tokens = 0
+        self.parar = threading.Event()
+        self._lock = threading.Lock()
+
+    def registrar(self, uso: dict, model: str):
+        with self._lock:
+            self.custo += custo_uso(uso, model)
+            self.tokens += total_tokens(uso)
+            if self.esgotado():
+                self.parar.set()
+
+    def esgotado(self) -> bool:
+        return ((self.max_custo is not None and self.custo >= self.max_custo)
+                or (self.max_tokens is not None and self.tokens >= self.max_tokens))
+
+    def descricao(self) -> str:
+        limites = []
+        if self.max_custo is not None:
+            limites.append(f"US$ {self.custo:.4f} de {self.max_custo:.4f}")
+        if self.max_tokens is not None:
+            limites.append(f"{self.tokens} de {self.max_tokens} tokens")
+        return ", ".join(limites)
+
+
+def _extrair_uso(response) -> dict:
+    """Extrai os contadores de tokens de `response.usage` (campos ausentes = 0)."""
+    usage = getattr(response, "usage", None)
+    return {campo: int(getattr(usage, campo, 0) or 0) for campo in CAMPOS_USO}
+
+
+class EstatisticasAPI:
+    """
+    Acumula o uso de tokens das chamadas de um batch, com foco no prompt caching:
+    leituras do cache custam ~10% do input normal e escritas ~125%.
+    """
+
+    def __init__(self):
+        self.chamadas = 0
+        self.hits_cache = 0
+        self.totais = {campo: 0 for campo in CAMPOS_USO}
+        self._lock = threading.Lock()
+
+    def registrar(self, uso: dict):
+        with self._lock:
+            self.chamadas += 1
+            if uso.get("cache_read_input_tokens"):
+                self.hits_cache += 1
+            for campo in CAMPOS_USO:
+                self.totais[campo] += uso.get(campo, 0)
+
+    @staticmethod
+    def economia_tokens(uso: dict) -> int:
+        """Tokens de input economizados (equivalente) por causa do cache."""
+        return int(uso.get("cache_read_input_tokens", 0) * 0.9
+                   - uso.get("cache_creation_input_tokens", 0) * 0.25)
+
+    def imprimir_resumo(self):
+        if not self.chamadas:
+            return
+        t = self.totais
+        input_bruto = t["input_tokens"] + t["cache_read_input_tokens"] + t["cache_creation_input_tokens"]
+        economia = self.economia_tokens(t)
+        pct = (economia / input_bruto * 100) if input_bruto else 0
+        print(f"  Prompt cache: {self.hits_cache}/{self.chamadas} avaliações com hit | "
+              f"input {input_bruto} tokens ({t['cache_read_input_tokens']} lidos do cache, "
+              f"{t['cache_creation_input_tokens']} gravados) | economia ≈ {economia} tokens ({pct:.0f}%)")
+
+
+def _limpar_resposta(texto: str) -> str:
+    """Remove espaços e possíveis marcadores de código da resposta do modelo."""
+    texto = texto.strip()
+    if texto.startswith("```"):
+        texto = texto.split("\n", 1)[1] if "\n" in texto else texto[3:]
+    if texto.endswith("```"):
+        texto = texto[:-3]
+    return texto.strip()
+
+
+def _validar_notas(notas: dict, ids: Optional[tuple] = None) -> dict:
+    """
+    Notas de `ids` (default: todos os critérios do FRAMEWORK) como inteiros de 1 a 10,
+    o que schema_notas() exige. Fora da faixa é limitado; id ausente ou nota não
+    numérica levanta ValueError, e a resposta conta como falha de parse (nova tentativa).
+    """
+    ids = ids or [cid for _, cid, _ in _ids_criterios()]
+    faltando = [cid for cid in ids if cid not in notas]
+    if faltando:
+        raise ValueError(f"{len(faltando)} critérios sem nota ({', '.join(faltando[:3])}...)")
+    validas = {}
+    for cid in ids:
+        val = notas[cid]
+        try:
+            if isinstance(val, bool):
+                raise ValueError
+            val = float(val)
+            if val != val:  # NaN
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"nota não numérica em '{cid}': {notas[cid]!r}") from None
+        validas[cid] = max(1, min(10, int(round(val))))
+    return validas
+
+
+def _conteudo_resposta(message):
+    """Input do bloco tool_use (saída estruturada) ou, sem ele, o JSON do texto da resposta."""
+    for bloco in message.content:
+        if getattr(bloco, "type", None) == "tool_use":
+            return bloco.input
+    return json.loads(_limpar_resposta(message.content[0].text))
+
+
+def _notas_da_resposta(message, ids: Optional[tuple] = None) -> dict:
+    """Notas 1-10 de `ids` numa resposta (ValueError se faltar o objeto ou alguma nota)."""
+    notas = _conteudo_resposta(message)
+    if not isinstance(notas, dict):
+        raise ValueError("resposta sem objeto de notas")
+    return _validar_notas(notas, ids)
+
+
+def avaliar_problema_detalhado(client: "anthropic.Anthropic", problema: dict, model: str,
+                               max_retries: int = 3,
+                               limitador: Optional[LimitadorTokenBucket] = None,
+                               disjuntor: Optional[DisjuntorAPI] = None) -> tuple[Optional[dict], dict]:
+    """
+    Avalia um problema via API e retorna (notas, uso de tokens somado entre tentativas).
+    Se todas as tentativas falharem, notas é None e o uso traz o último erro em "erro".
+    """
     prompt = build_evaluation_prompt(
         problema["problema"],
         problema["descricao"],
         problema["desenvolvimento"],
     )
+    estimativa = (_estimar_tokens(SYSTEM_PROMPT) + _estimar_tokens(bloco_criterios_estatico())
+                  + _estimar_tokens(prompt) + TOKENS_SAIDA_ESTIMADOS)
+    uso = {campo: 0 for campo in CAMPOS_USO}
+    ultimo_erro = ""
 
     for attempt in range(max_retries):
         try:
-            response = client.messages.create(
-                model=model,
-                max_tokens=2000,
-                temperature=0.3,
-                system=SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": prompt}],
-            )
+            if disjuntor:
+                disjuntor.aguardar()
+            if limitador:
+                with PERFIL.etapa("espera_limite_taxa"):
+                    limitador.adquirir(estimativa)
+            response = _criar_mensagem(client, **_parametros_avaliacao(model, prompt))
+            if disjuntor:
+                disjuntor.registrar_sucesso()
+            uso_chamada = _extrair_uso(response)
+            for campo in CAMPOS_USO:
+                uso[campo] += uso_chamada[campo]
+            if limitador:
+                # Leituras do cache não contam para o limite de tokens de input
+                limitador.ajustar(estimativa, uso_chamada["input_tokens"]
+                                  + uso_chamada["cache_creation_input_tokens"]
+                                  + uso_chamada["output_tokens"])
+
+            try:
+                notas = _notas_da_resposta(response)
+            except ValueError:
+                PARSE.registrar(model, False)
+                raise
+            PARSE.registrar(model, True)
+            return notas, uso
+
+        except ValueError as e:
+            PERFIL.registrar_retry("json_invalido")
+            ultimo_erro = f"JSON inválido: {e}"
+            print(f"    [Tentativa {attempt + 1}] Erro ao parsear JSON: {e}")
+            if attempt < max_retries - 1:
+                time.sleep(espera_backoff(attempt))
+        except anthropic.APIError as e:
+            ultimo_erro = _tratar_erro_api(e, attempt, max_retries, disjuntor)
+
+    return None, {**uso, "erro": ultimo_erro}
+
+
+def _tratar_erro_api(erro, attempt: int, max_retries: int,
+                     disjuntor: Optional[DisjuntorAPI]) -> str:
+    """Registra a falha de API (perfil e disjuntor), aguarda o backoff e descreve o erro."""
+    rate_limit = isinstance(erro, anthropic.RateLimitError)
+    PERFIL.registrar_retry("rate_limit" if rate_limit else "erro_api")
+    if disjuntor and _erro_sobrecarga(erro):
+        disjuntor.registrar_falha(_retry_after(erro))
+    if rate_limit:
+        # Rate limit sempre espera, mesmo na última tentativa: a próxima requisição do worker também pagaria
+        espera = espera_backoff(attempt + 2, erro)
+        print(f"    [Rate limit] Aguardando {espera:.1f}s...")
+        time.sleep(espera)
+        return f"rate limit: {erro}"
+    print(f"    [Tentativa {attempt + 1}] Erro de API: {erro}")
+    if attempt < max_retries - 1:
+        time.sleep(espera_backoff(attempt, erro))
+    return f"erro de API: {erro}"
+
+
+def avaliar_problema(client: "anthropic.Anthropic", problema: dict, model: str,
+                     max_retries: int = 3,
+                     limitador: Optional[LimitadorTokenBucket] = None) -> Optional[dict]:
+    """Avalia um único problema usando a API do Claude."""
+    notas, _ = avaliar_problema_detalhado(client, problema, model, max_retries, limitador)
+    return notas
 
-            texto = response.content[0].text.strip()
 
-            # Limpar possíveis marcadores de código
-            if texto.startswith("```"):
-                texto = texto.split("\n", 1)[1] if "\n" in texto else texto[3:]
-            if texto.endswith("```"):
-                texto = texto[:-3]
-            texto = texto.strip()
+# ============================================================================
+# AVALIAÇÃO EMPACOTADA (VÁRIOS PROBLEMAS POR REQUISIÇÃO)
+# ============================================================================
 
-            notas = json.loads(texto)
+# Limite de tokens de saída por família de modelo (prefixo do nome)
+LIMITE_SAIDA_MODELOS = {
+    "claude-opus-4": 32000,
+    "claude-sonnet-4": 64000,
+    "claude-3-7-sonnet": 64000,
+    "claude-3-5-sonnet": 8192,
+    "claude-3-5-haiku": 8192,
+    "claude-3-haiku": 4096,
+}
+LIMITE_SAIDA_PADRAO = 8192
 
-            # Validar que todas as notas estão entre 1 e 10
-            for key, val in notas.items():
-                if not isinstance(val, (int, float)) or val < 1 or val > 10:
-                    notas[key] = max(1, min(10, int(val) if isinstance(val, (int, float)) else 5))
+# Teto de problemas por requisição
+PACK_MAXIMO = 20
 
-            return notas
 
-        except json.JSONDecodeError as e:
-            print(f"    [Tentativa {attempt + 1}] Erro ao parsear JSON: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-        except anthropic.RateLimitError:
-            wait_time = 2 ** (attempt + 2)
-            print(f"    [Rate limit] Aguardando {wait_time}s...")
-            time.sleep(wait_time)
+def _limite_saida_modelo(model: str) -> int:
+    """Limite de tokens de saída do modelo (pelo prefixo mais longo conhecido)."""
+    for prefixo in sorted(LIMITE_SAIDA_MODELOS, key=len, reverse=True):
+        if model.startswith(prefixo):
+            return LIMITE_SAIDA_MODELOS[prefixo]
+    return LIMITE_SAIDA_PADRAO
+
+
+def calcular_pack_automatico(model: str) -> int:
+    """Maior K cuja resposta (K objetos de notas) cabe com folga no limite de saída do modelo."""
+    k = int(_limite_saida_modelo(model) * 0.8) // TOKENS_SAIDA_ESTIMADOS
+    return max(1, min(PACK_MAXIMO, k))
+
+
+def build_packed_prompt(problemas: list[dict]) -> str:
+    """Parte variável do prompt para avaliar vários problemas numa única requisição."""
+    blocos = []
+    for i, p in enumerate(problemas, 1):
+        blocos.append(f"""### PROBLEMA {i}
+
+**PROBLEMA:** {p['problema']}
+
+**DESCRIÇÃO GERAL:** {p['descricao']}
+
+**DESENVOLVIMENTO/OPORTUNIDADE:** {p['desenvolvimento']}""")
+
+    return f"""Avalie os {len(problemas)} problemas/oportunidades de startup abaixo, cada um de forma independente:
+
+{chr(10).join(blocos)}
+
+---
+
+Responda SOMENTE com um array JSON de {len(problemas)} objetos, na mesma ordem dos problemas acima.
+Cada objeto deve seguir exatamente o formato JSON especificado nas instruções (sem markdown, sem texto antes ou depois)."""
+
+
+def _extrair_notas_lote(message, k: int) -> list[dict]:
+    """Converte a resposta empacotada em K dicionários de notas (ValueError se malformada)."""
+    dados = _conteudo_resposta(message)
+    if isinstance(dados, dict):
+        dados = dados.get("avaliacoes")  # saída estruturada
+    if not isinstance(dados, list) or len(dados) != k or not all(isinstance(d, dict) for d in dados):
+        raise ValueError(f"esperado array com {k} objetos de notas")
+    # Um item incompleto invalida o pacote: o grupo é dividido e tentado de novo
+    return [_validar_notas(d) for d in dados]
+
+
+def _ratear_uso(uso: dict, k: int) -> list[dict]:
+    """Divide o uso de uma chamada entre K problemas; o resto da divisão fica com o primeiro."""
+    rateio = [{campo: uso[campo] // k for campo in CAMPOS_USO} for _ in range(k)]
+    for campo in CAMPOS_USO:
+        rateio[0][campo] += uso[campo] % k
+    return rateio
+
+
+def avaliar_grupo_api(client: "anthropic.Anthropic", grupo: list[dict], model: str,
+                      max_retries: int = 3,
+                      limitador: Optional[LimitadorTokenBucket] = None,
+                      disjuntor: Optional[DisjuntorAPI] = None) -> list[tuple]:
+    """
+    Avalia um grupo de problemas numa única requisição e retorna [(problema, notas, uso)].
+    Se a resposta vier malformada, divide o grupo ao meio e tenta os subgrupos;
+    grupos de um problema usam o prompt individual. O uso de tokens da chamada
+    é rateado entre os problemas do grupo (o resto da divisão vai para o primeiro).
+    """
+    if len(grupo) == 1:
+        notas, uso = avaliar_problema_detalhado(client, grupo[0], model, max_retries, limitador, disjuntor)
+        return [(grupo[0], notas, uso)]
+
+    k = len(grupo)
+    prompt = build_packed_prompt(grupo)
+    max_tokens = min(_limite_saida_modelo(model), k * TOKENS_SAIDA_ESTIMADOS + 500)
+    estimativa = (_estimar_tokens(SYSTEM_PROMPT) + _estimar_tokens(bloco_criterios_estatico())
+                  + _estimar_tokens(prompt) + k * TOKENS_SAIDA_ESTIMADOS)
+    uso = {campo: 0 for campo in CAMPOS_USO}
+    ultimo_erro = ""
+
+    for attempt in range(max_retries):
+        try:
+            if disjuntor:
+                disjuntor.aguardar()
+            if limitador:
+                with PERFIL.etapa("espera_limite_taxa"):
+                    limitador.adquirir(estimativa)
+            response = _criar_mensagem(client, **_parametros_avaliacao(model, prompt, max_tokens, k))
+            if disjuntor:
+                disjuntor.registrar_sucesso()
+            uso_chamada = _extrair_uso(response)
+            for campo in CAMPOS_USO:
+                uso[campo] += uso_chamada[campo]
+            if limitador:
+                limitador.ajustar(estimativa, uso_chamada["input_tokens"]
+                                  + uso_chamada["cache_creation_input_tokens"]
+                                  + uso_chamada["output_tokens"])
+
+            try:
+                notas_lote = _extrair_notas_lote(response, k)
+            except ValueError:
+                PARSE.registrar(model, False)
+                raise
+            PARSE.registrar(model, True)
+            return [(p, notas, uso_p) for p, notas, uso_p in zip(grupo, notas_lote, _ratear_uso(uso, k))]
+
+        except ValueError as e:
+            # Resposta malformada: repetir o grupo inteiro custaria o mesmo; dividir
+            PERFIL.registrar_retry("pacote_malformado")
+            print(f"    [Pacote de {k}] Resposta malformada ({e}); dividindo em grupos menores")
+            meio = k // 2
+            return (avaliar_grupo_api(client, grupo[:meio], model, max_retries, limitador, disjuntor)
+                    + avaliar_grupo_api(client, grupo[meio:], model, max_retries, limitador, disjuntor))
         except anthropic.APIError as e:
-            print(f"    [Tentativa {attempt + 1}] Erro de API: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            ultimo_erro = _tratar_erro_api(e, attempt, max_retries, disjuntor)
+
+    return [(p, None, {**uso_p, "erro": ultimo_erro}) for p, uso_p in zip(grupo, _ratear_uso(uso, k))]
+
+
+# ============================================================================
+# AVALIAÇÃO EM LOTE ASSÍNCRONO (MESSAGE BATCHES)
+# ============================================================================
+
+BULK_REQUESTS_FILE = "bulk_requisicoes.jsonl"
+BULK_JOB_FILE = "bulk_job.json"
+
+
+@PERFIL.medir("bulk_submeter")
+def submeter_bulk(client: "anthropic.Anthropic", batch_dir: str, pendentes: list[dict],
+                  model: str) -> dict:
+    """
+    Grava os prompts pendentes em `bulk_requisicoes.jsonl` e submete todos como um
+    único job assíncrono. O estado do job (id + mapa custom_id -> problema) fica
+    em `bulk_job.json`, permitindo retomar o polling após uma interrupção.
+    """
+    requisicoes = []
+    mapa = {}
+    for i, p in enumerate(pendentes):
+        custom_id = f"p{i:05d}"
+        mapa[custom_id] = p["problema"]
+        prompt = build_evaluation_prompt(p["problema"], p["descricao"], p["desenvolvimento"])
+        requisicoes.append({"custom_id": custom_id, "params": _parametros_avaliacao(model, prompt)})
+
+    with open(os.path.join(batch_dir, BULK_REQUESTS_FILE), "w", encoding="utf-8") as f:
+        for req in requisicoes:
+            f.write(json.dumps(req, ensure_ascii=False) + "\n")
+
+    job = client.messages.batches.create(requests=requisicoes)
+    estado = {
+        "id": job.id,
+        "model": model,
+        "submetido_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_requisicoes": len(requisicoes),
+        "mapa": mapa,
+    }
+    with open(os.path.join(batch_dir, BULK_JOB_FILE), "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+
+    print(f"  Job bulk submetido: {job.id} ({len(requisicoes)} requisições)")
+    return estado
+
+
+@PERFIL.medir("bulk_aguardar")
+def aguardar_bulk(client: "anthropic.Anthropic", job_id: str, intervalo: float = 60.0):
+    """Faz polling do job até o processamento terminar."""
+    while True:
+        job = client.messages.batches.retrieve(job_id)
+        c = job.request_counts
+        print(f"    [{job.processing_status}] processando={c.processing} ok={c.succeeded} "
+              f"erro={c.errored} expirado={c.expired} cancelado={c.canceled}")
+        if job.processing_status == "ended":
+            return job
+        time.sleep(intervalo)
+
+
+@PERFIL.medir("bulk_coletar")
+def coletar_bulk(client: "anthropic.Anthropic", estado: dict) -> dict:
+    """Baixa os resultados do job e retorna {problema: (notas, uso)}; falhas vêm com notas None."""
+    notas_por_problema = {}
+    falhas = 0
+    for item in client.messages.batches.results(estado["id"]):
+        titulo = estado["mapa"].get(item.custom_id)
+        if titulo is None:
+            continue
+        if item.result.type != "succeeded":
+            falhas += 1
+            notas_por_problema[titulo] = (None, {**{campo: 0 for campo in CAMPOS_USO},
+                                                 "erro": f"bulk: {item.result.type}"})
+            continue
+        uso = _extrair_uso(item.result.message)
+        try:
+            notas_por_problema[titulo] = (_notas_da_resposta(item.result.message), uso)
+            PARSE.registrar(estado.get("model", ""), True)
+        except ValueError as e:
+            PARSE.registrar(estado.get("model", ""), False)
+            falhas += 1
+            notas_por_problema[titulo] = (None, {**uso, "erro": f"bulk: JSON inválido: {e}"})
+
+    if falhas:
+        print(f"  {falhas} requisições falharam no job bulk; vão para a fila de retry ({FILA_RETRY_FILE}).")
+    return notas_por_problema
+
+
+def _concluir_job_bulk(client: "anthropic.Anthropic", batch_dir: str, estado: dict,
+                       intervalo: float, aguardar: bool) -> Optional[dict]:
+    """Aguarda (ou só consulta) o job, coleta as notas e apaga o estado local do job."""
+    if aguardar:
+        aguardar_bulk(client, estado["id"], intervalo)
+    elif client.messages.batches.retrieve(estado["id"]).processing_status != "ended":
+        print("  Job ainda em processamento. Execute 'evaluate --mode bulk' novamente para coletar.")
+        return None
 
-    return None
+    notas_por_problema = coletar_bulk(client, estado)
+
+    os.remove(os.path.join(batch_dir, BULK_JOB_FILE))
+    req_path = os.path.join(batch_dir, BULK_REQUESTS_FILE)
+    if os.path.exists(req_path):
+        os.remove(req_path)
+    return notas_por_problema
+
+
+def avaliar_pendentes_bulk(client: "anthropic.Anthropic", batch_dir: str, pendentes: list[dict],
+                           model: str, intervalo: float = 60.0,
+                           aguardar: bool = True) -> Optional[dict]:
+    """
+    Submete (ou retoma) o job bulk do batch, aguarda e coleta as notas.
+
+    Ao retomar, os pendentes atuais são comparados com o mapa custom_id -> problema
+    do job: resultados de problemas que deixaram de estar pendentes são descartados,
+    e pendentes que não estão no job vão para um novo job depois da coleta.
+    Retorna None se `aguardar` for False e nenhum job tiver terminado ainda.
+    """
+    estado_path = os.path.join(batch_dir, BULK_JOB_FILE)
+    notas_por_problema = {}
+    if os.path.exists(estado_path):
+        with open(estado_path, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+        titulos = {p["problema"] for p in pendentes}
+        no_job = set(estado["mapa"].values())
+        fora_do_job = [p for p in pendentes if p["problema"] not in no_job]
+        print(f"  Retomando job bulk {estado['id']} ({estado['n_requisicoes']} requisições)")
+        if no_job - titulos:
+            print(f"  {len(no_job - titulos)} problemas do job não estão mais pendentes; "
+                  f"seus resultados serão ignorados")
+        if fora_do_job:
+            print(f"  {len(fora_do_job)} pendentes não estão no job; serão submetidos num novo job após a coleta")
+
+        coletadas = _concluir_job_bulk(client, batch_dir, estado, intervalo, aguardar)
+        if coletadas is None:
+            return None
+        notas_por_problema = {t: v for t, v in coletadas.items() if t in titulos}
+        pendentes = fora_do_job
+
+    if not pendentes:
+        return notas_por_problema
+    estado = submeter_bulk(client, batch_dir, pendentes, model)
+    coletadas = _concluir_job_bulk(client, batch_dir, estado, intervalo, aguardar)
+    if coletadas is None:
+        # O job novo fica em bulk_job.json; o que já foi coletado é gravado agora
+        return notas_por_problema or None
+    notas_por_problema.update(coletadas)
+    return notas_por_problema
 
 
 # ============================================================================
@@ -1319,46 +3756,152 @@ def _count_keyword_matches(text: str, keywords: list[str]) -> int:
     return count
 
 
-def _detect_domains(text: str) -> list[str]:
+class AutomatoKeywords:
+    """
+    Autômato Aho-Corasick sobre um conjunto de padrões em minúsculas.
+
+    `encontrar` percorre o texto uma única vez e devolve os índices de todos os
+    padrões que ocorrem como substring (inclusive sobrepostos), com a mesma
+    semântica de `padrao in texto`.
+    """
+
+    def __init__(self, padroes: list[str]):
+        self.padroes = padroes
+        goto = [{}]
+        saida = [[]]
+        for i, padrao in enumerate(padroes):
+            estado = 0
+            for ch in padrao:
+                proximo = goto[estado].get(ch)
+                if proximo is None:
+                    proximo = len(goto)
+                    goto.append({})
+                    saida.append([])
+                    goto[estado][ch] = proximo
+                estado = proximo
+            saida[estado].append(i)
+
+        # Links de falha em BFS; cada estado herda as saídas do seu link de falha
+        falha = [0] * len(goto)
+        fila = list(goto[0].values())
+        for estado in fila:
+            for ch, filho in goto[estado].items():
+                fila.append(filho)
+                f = falha[estado]
+                while f and ch not in goto[f]:
+                    f = falha[f]
+                destino = goto[f].get(ch, 0)
+                falha[filho] = destino if destino != filho else 0
+                saida[filho] = saida[filho] + saida[falha[filho]]
+
+        # Transições determinísticas: cada estado herda (em BFS) as transições do seu
+        # link de falha, exceto as da raiz, que ficam num único dicionário de fallback
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        for estado in fila:
+            herdado = delta[falha[estado]] if falha[estado] else {}
+            delta[estado] = {**herdado, **goto[estado]}
+        delta[0] = {}
+
+        self._raiz = goto[0]
+        self._delta = delta
+        self._saida = [tuple(s) or None for s in saida]
+
+    def encontrar(self, texto: str) -> set[int]:
+        delta, saida, raiz_get = self._delta, self._saida, self._raiz.get
+        estado = 0
+        encontrados = set()
+        for ch in texto:
+            proximo = delta[estado].get(ch)
+            estado = proximo if proximo is not None else raiz_get(ch, 0)
+            if saida[estado]:
+                encontrados.update(saida[estado])
+        return encontrados
+
+
+@lru_cache(maxsize=1)
+def _compilar_regras_heuristicas() -> tuple:
+    """
+    Compila KEYWORD_RULES e DOMAIN_PROFILES num único autômato. Para cada padrão,
+    guarda em quais regras (sinal positivo/negativo) e domínios ele conta —
+    com duplicatas preservadas, como na contagem original por lista. Compilado
+    no primeiro uso, não no import: comandos sem heurística não pagam o custo.
+    """
+    padroes = sorted(
+        {kw.lower() for rules in KEYWORD_RULES.values()
+         for kw in rules["positivo"] + rules["negativo"]}
+        | {kw.lower() for profile in DOMAIN_PROFILES.values() for kw in profile["keywords"]}
+    )
+    indice = {p: i for i, p in enumerate(padroes)}
+
+    regras = []
+    contrib_regras = [[] for _ in padroes]
+    for r, (criterio_id, rules) in enumerate(KEYWORD_RULES.items()):
+        regras.append((criterio_id, rules["base"]))
+        for kw in rules["positivo"]:
+            contrib_regras[indice[kw.lower()]].append(2 * r)
+        for kw in rules["negativo"]:
+            contrib_regras[indice[kw.lower()]].append(2 * r + 1)
+
+    dominios = list(DOMAIN_PROFILES)
+    contrib_dominios = [[] for _ in padroes]
+    for d, profile in enumerate(DOMAIN_PROFILES.values()):
+        for kw in profile["keywords"]:
+            contrib_dominios[indice[kw.lower()]].append(d)
+
+    return AutomatoKeywords(padroes), regras, contrib_regras, dominios, contrib_dominios
+
+
+@lru_cache(maxsize=None)
+def _nota_por_contagem(base: int, pos_matches: int, neg_matches: int) -> int:
+    """Nota de um critério a partir das contagens de keywords positivas e negativas."""
+    # Calcular ajuste: cada match positivo +0.5, cada negativo -0.7
+    ajuste = (pos_matches * 0.5) - (neg_matches * 0.7)
+
+    # Aplicar ajuste com diminishing returns (logarítmico)
+    if ajuste > 0:
+        ajuste = min(ajuste, 2 + math.log1p(ajuste))
+    elif ajuste < 0:
+        ajuste = max(ajuste, -(2 + math.log1p(abs(ajuste))))
+
+    nota = base + ajuste
+
+    # Clampar entre 1 e 10
+    return max(1, min(10, round(nota)))
+
+
+def _detect_domains(text: str, encontrados: Optional[set] = None) -> list[str]:
     """Detecta quais domínios se aplicam ao texto."""
-    text_lower = text.lower()
-    domains = []
-    for domain, profile in DOMAIN_PROFILES.items():
-        matches = sum(1 for kw in profile["keywords"] if kw.lower() in text_lower)
-        if matches >= 2:
-            domains.append(domain)
-    return domains
+    automato, _, _, dominios, contrib_dominios = _compilar_regras_heuristicas()
+    if encontrados is None:
+        encontrados = automato.encontrar(text.lower())
+    matches = [0] * len(dominios)
+    for i in encontrados:
+        for d in contrib_dominios[i]:
+            matches[d] += 1
+    return [domain for domain, n in zip(dominios, matches) if n >= 2]
 
 
 def avaliar_problema_heuristico(problema: dict) -> dict:
     """Avalia um problema usando análise heurística de keywords."""
     # Concatenar todo o texto para análise
     texto = f"{problema['problema']} {problema['descricao']} {problema['desenvolvimento']}"
+    texto_lower = texto.lower()
 
-    notas = {}
+    # Uma única passada encontra todas as keywords de todas as regras e domínios
+    automato, regras, contrib_regras, _, _ = _compilar_regras_heuristicas()
+    encontrados = automato.encontrar(texto_lower)
+    contagens = [0] * (2 * len(regras))
+    for i in encontrados:
+        for slot in contrib_regras[i]:
+            contagens[slot] += 1
 
     # Pontuar cada critério baseado em keywords
-    for criterio_id, rules in KEYWORD_RULES.items():
-        base = rules["base"]
-        pos_matches = _count_keyword_matches(texto, rules["positivo"])
-        neg_matches = _count_keyword_matches(texto, rules["negativo"])
-
-        # Calcular ajuste: cada match positivo +0.5, cada negativo -0.7
-        ajuste = (pos_matches * 0.5) - (neg_matches * 0.7)
-
-        # Aplicar ajuste com diminishing returns (logarítmico)
-        if ajuste > 0:
-            ajuste = min(ajuste, 2 + math.log1p(ajuste))
-        elif ajuste < 0:
-            ajuste = max(ajuste, -(2 + math.log1p(abs(ajuste))))
-
-        nota = base + ajuste
-
-        # Clampar entre 1 e 10
-        notas[criterio_id] = max(1, min(10, round(nota)))
+    notas = {}
+    for r, (criterio_id, base) in enumerate(regras):
+        notas[criterio_id] = _nota_por_contagem(base, contagens[2 * r], contagens[2 * r + 1])
 
     # Aplicar ajustes de domínio
-    domains = _detect_domains(texto)
+    domains = _detect_domains(texto, encontrados)
     for domain in domains:
         adjustments = DOMAIN_PROFILES[domain].get("adjustments", {})
         for criterio_id, adj in adjustments.items():
@@ -1372,7 +3915,7 @@ def avaliar_problema_heuristico(problema: dict) -> dict:
         notas["clareza_persona"] = min(10, notas.get("clareza_persona", 5) + 1)
 
     # Verificar se há "Oportunidade:" explícita no texto (indica boa estruturação)
-    if "oportunidade:" in texto.lower():
+    if "oportunidade:" in texto_lower:
         notas["janela"] = min(10, notas.get("janela", 5) + 1)
         notas["diferenciacao_10x"] = min(10, notas.get("diferenciacao_10x", 5) + 1)
 
@@ -1403,21 +3946,476 @@ def carregar_checkpoint(diretorio: str) -> list[dict]:
 
 
 # ============================================================================
-# GERAÇÃO DO CSV FINAL
+# CACHE DE AVALIAÇÕES (ENDEREÇADO POR CONTEÚDO)
 # ============================================================================
 
-def gerar_csv_final(resultados: list[dict], diretorio: str,
-                    nome_arquivo: str = "avaliacao_500_temas_ranking.csv") -> str:
-    """Gera o CSV final unificado com todas as pontuações e ranking."""
+CACHE_FILE = "cache_avaliacoes.json"
 
-    # Ordenar por total_geral (decrescente)
-    resultados_ordenados = sorted(resultados, key=lambda x: x.get("total_geral", 0), reverse=True)
+# Rótulo usado no lugar do modelo para as avaliações heurísticas
+MODELO_HEURISTICO = "heuristic"
+# Incrementar ao mudar a lógica de avaliar_problema_heuristico (as tabelas já entram no hash)
+VERSAO_HEURISTICA = "1"
 
-    # Atribuir ranking
-    for i, r in enumerate(resultados_ordenados, 1):
-        r["ranking"] = i
 
-    # Definir colunas do CSV
+@lru_cache(maxsize=1)
+def fingerprint_framework() -> str:
+    """Hash do FRAMEWORK: muda quando critérios, pesos ou descrições mudam."""
+    dados = json.dumps(FRAMEWORK, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=1)
+def fingerprint_heuristica() -> str:
+    """Hash das tabelas da heurística (KEYWORD_RULES, DOMAIN_PROFILES) e de VERSAO_HEURISTICA."""
+    dados = json.dumps([VERSAO_HEURISTICA, KEYWORD_RULES, DOMAIN_PROFILES], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()[:16]
+
+
+def chave_cache(problema: dict, model: str) -> str:
+    """
+    Chave do cache: hash de (problema, descrição, desenvolvimento, modelo, framework).
+    Notas heurísticas também dependem das tabelas de keywords/domínios.
+    """
+    partes = [
+        problema.get("problema", ""),
+        problema.get("descricao", ""),
+        problema.get("desenvolvimento", ""),
+        model,
+        fingerprint_framework(),
+    ]
+    if model == MODELO_HEURISTICO:
+        partes.append(fingerprint_heuristica())
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+@PERFIL.medir("cache")
+def carregar_cache(base: str) -> dict:
+    """Carrega o cache persistente {chave: notas}."""
+    path = os.path.join(base, CACHE_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+@PERFIL.medir("cache")
+def salvar_cache(base: str, cache: dict):
+    """Grava o cache de forma atômica (arquivo temporário + rename)."""
+    _gravar_json_atomico(os.path.join(base, CACHE_FILE), cache)
+
+
+def semear_cache(base: str, model: str = MODELO_HEURISTICO) -> int:
+    """
+    Popula o cache a partir do checkpoint legado e do histórico do banco geral.
+    `model` indica qual avaliador produziu essas notas (por padrão, o heurístico).
+    """
+    cache = carregar_cache(base)
+    fontes = [
+        carregar_checkpoint(base),
+        carregar_banco_geral(base),
+    ]
+
+    adicionados = 0
+    for registros in fontes:
+        for r in registros:
+            if not r.get("notas"):
+                continue
+            chave = chave_cache(r, model)
+            if chave not in cache:
+                cache[chave] = r["notas"]
+                adicionados += 1
+
+    salvar_cache(base, cache)
+    print(f"Cache semeado: {adicionados} novas entradas ({len(cache)} no total, modelo '{model}')")
+    return adicionados
+
+
+# ============================================================================
+# QUASE-DUPLICATAS (MINHASH + LSH)
+# ============================================================================
+
+MINHASH_PERMUTACOES = 64
+MINHASH_BANDAS = 16   # 16 bandas × 4 linhas: vira candidato a partir de ~50% de similaridade
+MODOS_QUASE_DUP = ("off", "flag", "skip", "reuse")
+_PRIMO_MINHASH = (1 << 61) - 1
+
+
+@lru_cache(maxsize=1)
+def _coeficientes_minhash() -> tuple:
+    """Coeficientes (a, b) das permutações h(x) = (a·x + b) mod p, fixos entre execuções."""
+    rng = random.Random(MINHASH_PERMUTACOES)
+    return tuple((rng.randrange(1, _PRIMO_MINHASH), rng.randrange(_PRIMO_MINHASH))
+                 for _ in range(MINHASH_PERMUTACOES))
+
+
+def normalizar_tokens(texto: str) -> list[str]:
+    """Minúsculas, sem acentos e sem palavras curtas (artigos, preposições)."""
+    sem_acento = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return [t for t in re.findall(r"[a-z0-9]+", sem_acento) if len(t) > 2]
+
+
+def assinatura_minhash(problema: dict) -> list[int]:
+    """Assinatura MinHash (32 bits por permutação) dos bigramas de palavras do problema."""
+    tokens = normalizar_tokens(" ".join(problema.get(c, "") for c in
+                                        ("problema", "descricao", "desenvolvimento")))
+    shingles = {" ".join(tokens[i:i + 2]) for i in range(max(len(tokens) - 1, 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+              for s in shingles]
+    p = _PRIMO_MINHASH
+    return [min((a * h + b) % p for h in hashes) & 0xFFFFFFFF for a, b in _coeficientes_minhash()]
+
+
+class IndiceMinHash:
+    """Índice LSH das assinaturas de todos os problemas dos batches (consulta sub-linear)."""
+
+    def __init__(self):
+        self.docs = []       # [batch, posicao, titulo, assinatura]
+        self.posicoes = {}   # (batch, titulo) -> índice em docs
+        self.batches = {}    # batch -> {csv: [tamanho, mtime_ns]} dos CSVs indexados
+        self.buckets = {}    # (banda, valores) -> [índices em docs]
+
+    @staticmethod
+    def _bandas(assinatura: list[int]):
+        r = MINHASH_PERMUTACOES // MINHASH_BANDAS
+        for i in range(MINHASH_BANDAS):
+            yield (i, *assinatura[i * r:(i + 1) * r])
+
+    def adicionar(self, batch: str, posicao: int, titulo: str, assinatura: list[int]):
+        if (batch, titulo) in self.posicoes:
+            return
+        idx = len(self.docs)
+        self.docs.append([batch, posicao, titulo, assinatura])
+        self.posicoes[(batch, titulo)] = idx
+        for chave in self._bandas(assinatura):
+            self.buckets.setdefault(chave, []).append(idx)
+
+    def indexar_batch(self, batch: str, problemas: list[dict], csvs: Optional[dict] = None):
+        """Indexa os problemas do batch; `csvs` é a assinatura dos CSVs lidos (ver _assinatura_csvs)."""
+        for pos, p in enumerate(problemas):
+            self.adicionar(batch, pos, p["problema"], assinatura_minhash(p))
+        self.batches[batch] = csvs if csvs is not None else {}
+
+    def mais_similar(self, batch: str, titulo: str, limiar: float) -> Optional[tuple]:
+        """
+        Problema anterior mais parecido com (batch, titulo), se a similaridade estimada
+        for >= limiar. "Anterior" = batch mais antigo ou posição anterior no mesmo batch,
+        o que evita ciclos (A pula por causa de B e B por causa de A).
+        Retorna (similaridade, batch, titulo) ou None.
+        """
+        idx = self.posicoes.get((batch, titulo))
+        if idx is None:
+            return None  # problema ainda não indexado (CSV chegou depois da última indexação)
+        _, posicao, _, assinatura = self.docs[idx]
+        candidatos = set()
+        for chave in self._bandas(assinatura):
+            candidatos.update(self.buckets.get(chave, ()))
+        melhor = None
+        for c in candidatos:
+            c_batch, c_pos, c_titulo, c_sig = self.docs[c]
+            if (c_batch, c_pos) >= (batch, posicao):
+                continue
+            sim = sum(1 for x, y in zip(assinatura, c_sig) if x == y) / MINHASH_PERMUTACOES
+            if sim >= limiar and (melhor is None or sim > melhor[0]):
+                melhor = (sim, c_batch, c_titulo)
+        return melhor
+
+    def para_json(self) -> dict:
+        return {
+            "parametros": {"permutacoes": MINHASH_PERMUTACOES, "bandas": MINHASH_BANDAS},
+            "batches": self.batches,
+            "docs": [[b, pos, t, base64.b64encode(array("I", sig).tobytes()).decode()]
+                     for b, pos, t, sig in self.docs],
+        }
+
+    @classmethod
+    def de_json(cls, dados: dict) -> "IndiceMinHash":
+        indice = cls()
+        if dados.get("parametros") != {"permutacoes": MINHASH_PERMUTACOES, "bandas": MINHASH_BANDAS}:
+            return indice
+        for b, pos, t, sig in dados["docs"]:
+            assinatura = array("I")
+            assinatura.frombytes(base64.b64decode(sig))
+            indice.adicionar(b, pos, t, assinatura.tolist())
+        indice.batches = dados["batches"]
+        return indice
+
+
+def _assinatura_csvs(batch_path: str) -> dict:
+    """{csv: [tamanho, mtime_ns]} dos CSVs de um batch; muda quando um CSV entra, sai ou é editado."""
+    return {os.path.basename(c): _stat_resumido(c)
+            for c in sorted(glob_module.glob(os.path.join(batch_path, "*.csv")))}
+
+
+@PERFIL.medir("indice_minhash")
+def carregar_indice_minhash(base: str) -> IndiceMinHash:
+    """
+    Carrega o índice e (re)indexa os batches novos ou cujos CSVs mudaram desde a
+    última indexação (salvando se algo mudou). As assinaturas dos demais batches
+    são reaproveitadas do arquivo.
+    """
+    path = os.path.join(base, INDICE_MINHASH_FILE)
+    anterior = IndiceMinHash()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            anterior = IndiceMinHash.de_json(json.load(f))
+
+    bdir = _batches_dir(base)
+    csvs = {entry: _assinatura_csvs(os.path.join(bdir, entry)) for entry in sorted(os.listdir(bdir))
+            if os.path.isdir(os.path.join(bdir, entry))}
+    mudados = [entry for entry, sig in csvs.items() if anterior.batches.get(entry) != sig]
+    if not mudados and set(anterior.batches) <= set(csvs):
+        return anterior
+
+    indice = IndiceMinHash()
+    for b, pos, t, sig in anterior.docs:
+        if b in csvs and b not in mudados:
+            indice.adicionar(b, pos, t, sig)
+    indice.batches = {b: sig for b, sig in anterior.batches.items() if b in csvs and b not in mudados}
+    for entry in mudados:
+        acao = "reindexando" if entry in anterior.batches else "indexando"
+        print(f"  Índice de quase-duplicatas: {acao} batch '{entry}'")
+        indice.indexar_batch(entry, carregar_problemas_de_diretorio(os.path.join(bdir, entry), entry),
+                             csvs[entry])
+    _gravar_json_atomico(path, indice.para_json())
+    return indice
+
+
+def detectar_quase_duplicatas(indice: IndiceMinHash, batch: str, problemas: list[dict],
+                              limiar: float = LIMIAR_QUASE_DUPLICATA) -> dict:
+    """{titulo: (similaridade, batch, titulo_similar)} dos problemas com um anterior parecido."""
+    encontrados = {}
+    for p in problemas:
+        similar = indice.mais_similar(batch, p["problema"], limiar)
+        if similar:
+            encontrados[p["problema"]] = similar
+    return encontrados
+
+
+def imprimir_quase_duplicatas(encontrados: dict, limite: int = 10):
+    """Lista (resumida) as quase-duplicatas encontradas."""
+    for titulo, (sim, batch, similar) in islice(encontrados.items(), limite):
+        print(f"    ~{sim:.0%} '{titulo[:45]}' ≈ '{similar[:45]}' ({batch})")
+    if len(encontrados) > limite:
+        print(f"    ... e mais {len(encontrados) - limite}")
+
+
+def _carregar_fila_retry(batch_dir: str) -> dict:
+    """
+    Problemas do batch cuja avaliação falhou ({titulo: {tentativas, ultimo_erro, ultima_falha}}),
+    incluindo as filas dos workers ainda não compactadas.
+    """
+    fila = {}
+    caminhos = [os.path.join(batch_dir, FILA_RETRY_FILE)]
+    caminhos += sorted(glob_module.glob(os.path.join(batch_dir, FILA_RETRY_WORKER_PREFIXO + "*.json")))
+    for path in caminhos:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                fila.update(json.load(f))
+    return fila
+
+
+def _carregar_quase_dup_batch(batch_dir: str) -> dict:
+    """Problemas do batch pulados por serem quase-duplicatas ({titulo: origem})."""
+    path = os.path.join(batch_dir, QUASE_DUP_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+# ============================================================================
+# BACKFILL DE CRITÉRIOS FALTANTES
+# ============================================================================
+
+def criterios_faltantes(notas: dict) -> tuple:
+    """Ids do FRAMEWORK ausentes em `notas` (na ordem do FRAMEWORK)."""
+    return tuple(cid for _, cid, _ in _ids_criterios() if cid not in notas)
+
+
+def build_backfill_prompt(problema: dict, ids: tuple) -> str:
+    """Prompt mínimo: o problema e apenas os critérios que faltam."""
+    criterios = {c["id"]: c for cat in FRAMEWORK.values() for c in cat["criterios"]}
+    linhas = "\n".join(f"- **{cid}**: {criterios[cid]['nome']} — {criterios[cid]['descricao']}" for cid in ids)
+    modelo_json = ",\n".join(f'  "{cid}": <nota>' for cid in ids)
+    return f"""Avalie o seguinte problema/oportunidade de startup APENAS nos critérios listados, com notas de 1 a 10:
+
+**PROBLEMA:** {problema['problema']}
+
+**DESCRIÇÃO GERAL:** {problema['descricao']}
+
+**DESENVOLVIMENTO/OPORTUNIDADE:** {problema['desenvolvimento']}
+
+CRITÉRIOS:
+{linhas}
+
+Responda SOMENTE com o JSON abaixo (sem markdown, sem texto antes ou depois):
+{{
+{modelo_json}
+}}"""
+
+
+def avaliar_criterios_api(client: "anthropic.Anthropic", problema: dict, ids: tuple, model: str,
+                          max_retries: int = 3,
+                          limitador: Optional[LimitadorTokenBucket] = None) -> tuple[Optional[dict], dict]:
+    """Notas só dos critérios `ids` de um problema, via API. Retorna (notas, uso) como avaliar_problema_detalhado."""
+    prompt = build_backfill_prompt(problema, ids)
+    parametros = {
+        "model": model,
+        "max_tokens": 200 + 20 * len(ids),
+        "temperature": 0.3,
+        "system": SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    if _SAIDA_ESTRUTURADA:
+        parametros["tools"] = [{"name": FERRAMENTA_NOTAS,
+                                "description": "Registra as notas (1 a 10) dos critérios pedidos.",
+                                "input_schema": schema_notas(ids)}]
+        parametros["tool_choice"] = {"type": "tool", "name": FERRAMENTA_NOTAS}
+    estimativa = _estimar_tokens(SYSTEM_PROMPT) + _estimar_tokens(prompt) + 10 * len(ids)
+    uso = {campo: 0 for campo in CAMPOS_USO}
+    ultimo_erro = ""
+
+    for attempt in range(max_retries):
+        try:
+            if limitador:
+                with PERFIL.etapa("espera_limite_taxa"):
+                    limitador.adquirir(estimativa)
+            response = _criar_mensagem(client, **parametros)
+            uso_chamada = _extrair_uso(response)
+            for campo in CAMPOS_USO:
+                uso[campo] += uso_chamada[campo]
+            if limitador:
+                limitador.ajustar(estimativa, uso_chamada["input_tokens"] + uso_chamada["output_tokens"])
+            try:
+                notas = _notas_da_resposta(response, ids)
+            except ValueError:
+                PARSE.registrar(model, False)
+                raise
+            PARSE.registrar(model, True)
+            return notas, uso
+
+        except ValueError as e:
+            PERFIL.registrar_retry("json_invalido")
+            ultimo_erro = f"JSON inválido: {e}"
+            print(f"    [Tentativa {attempt + 1}] Erro ao parsear JSON: {e}")
+            if attempt < max_retries - 1:
+                time.sleep(espera_backoff(attempt))
+        except anthropic.APIError as e:
+            ultimo_erro = _tratar_erro_api(e, attempt, max_retries, None)
+
+    return None, {**uso, "erro": ultimo_erro}
+
+
+def backfill_criterios(base: str, mode: str = "heuristic", model: str = "claude-sonnet-4-20250514",
+                       client=None, concorrencia: int = 1, rpm: int = 50, tpm: int = 80000,
+                       batch_nome: Optional[str] = None, simular: bool = False) -> int:
+    """
+    Completa as notas de critérios ausentes nos resultados dos batches (modelo que
+    omitiu chaves ou critério novo no FRAMEWORK), pedindo só os critérios que faltam.
+    Problemas com o mesmo conteúdo em vários batches são avaliados uma vez. Só os
+    registros afetados têm as pontuações recalculadas e só os batches alterados são
+    regravados (a consolidação incremental reprocessa apenas esses).
+    Retorna o número de registros completados.
+    """
+    # {conteúdo: {"problema", "ids", "registros"}}; registros são os dicts dentro de `por_batch`
+    alvos = {}
+    por_batch = {}
+    for b in listar_batches(base):
+        if batch_nome and b["nome"] != batch_nome or not b["avaliado"]:
+            continue
+        if leases_ativos(b["caminho"]):
+            print(f"  Aviso: batch '{b['nome']}' está sendo avaliado por workers; ignorado.")
+            continue
+        resultados = carregar_resultados_batch(b["caminho"])
+        for r in resultados:
+            ids = criterios_faltantes(r["notas"])
+            if ids:
+                alvo = alvos.setdefault((r["problema"], r["descricao"], r["desenvolvimento"]),
+                                        {"problema": r, "ids": set(), "registros": []})
+                alvo["ids"].update(ids)
+                alvo["registros"].append(r)
+                por_batch[b["nome"]] = (b["caminho"], resultados)
+
+    if not alvos:
+        print("  Nenhum registro com critérios faltantes.")
+        return 0
+
+    frequencia = {}
+    for alvo in alvos.values():
+        for cid in alvo["ids"]:
+            frequencia[cid] = frequencia.get(cid, 0) + len(alvo["registros"])
+    n_registros = sum(len(a["registros"]) for a in alvos.values())
+    print(f"  {n_registros} registros com critérios faltantes ({len(alvos)} problemas distintos) "
+          f"em {len(por_batch)} batches")
+    for cid, n in sorted(frequencia.items(), key=lambda x: -x[1])[:10]:
+        print(f"    {cid:<35s} ausente em {n} registros")
+    if simular:
+        return 0
+
+    itens = [(alvo, tuple(cid for _, cid, _ in _ids_criterios() if cid in alvo["ids"]))
+             for alvo in alvos.values()]
+    if mode == "api" and client:
+        limitador = LimitadorTokenBucket(rpm, tpm)
+        avaliacoes = (
+            (alvo, notas, uso) for (alvo, _), (notas, uso) in _executar_concorrente(
+                lambda item: avaliar_criterios_api(client, item[0]["problema"], item[1], model,
+                                                   limitador=limitador),
+                itens, concorrencia,
+            )
+        )
+    else:
+        avaliacoes = ((alvo, {cid: avaliar_problema_heuristico(alvo["problema"])[cid] for cid in ids}, None)
+                      for alvo, ids in itens)
+
+    modelo_cache = model if mode == "api" else MODELO_HEURISTICO
+    ordem = {cid: i for i, (_, cid, _) in enumerate(_ids_criterios())}
+    cache = carregar_cache(base)
+    completados = incompletos = falhas = 0
+    try:
+        for i, (alvo, novas, uso) in enumerate(avaliacoes, 1):
+            if novas is None:
+                falhas += 1
+                print(f"    Falha: {alvo['problema']['problema'][:60]} ({uso.get('erro', '')[:60]})")
+                continue
+            for r in alvo["registros"]:
+                notas = {**novas, **r["notas"]}
+                r["notas"] = dict(sorted(notas.items(), key=lambda kv: ordem.get(kv[0], len(ordem))))
+                r.update(calcular_pontuacoes(r["notas"]))
+                if uso:
+                    anterior = r.get("uso_api") or {"modelo": model}
+                    r["uso_api"] = {**anterior, **{c: anterior.get(c, 0) + uso[c] for c in CAMPOS_USO}}
+                for m in {modelo_cache, (r.get("uso_api") or {}).get("modelo", modelo_cache)}:
+                    if chave_cache(r, m) in cache:
+                        cache[chave_cache(r, m)] = dict(r["notas"])
+                if criterios_faltantes(r["notas"]):
+                    incompletos += 1
+                else:
+                    completados += 1
+            if i % 50 == 0:
+                print(f"    [{i}/{len(itens)}] problemas completados")
+    finally:
+        # Regrava só os batches afetados (compactando o log, como ao fim de evaluate)
+        for nome, (caminho, resultados) in por_batch.items():
+            _ordenar_resultados(resultados, carregar_problemas_de_diretorio(caminho, nome))
+            _gravar_json_atomico(os.path.join(caminho, BATCH_EVAL_FILE), resultados, indent=2)
+            if os.path.exists(os.path.join(caminho, BATCH_LOG_FILE)):
+                os.remove(os.path.join(caminho, BATCH_LOG_FILE))
+            _remover_arquivos_workers(caminho, filas=False)
+        salvar_cache(base, cache)
+        PARSE.salvar(base)
+
+    print(f"  {completados} registros completados"
+          + (f", {incompletos} ainda com lacunas (resposta sem todos os critérios)" if incompletos else "")
+          + (f", {falhas} problemas com falha na API" if falhas else ""))
+    return completados
+
+
+# ============================================================================
+# GERAÇÃO DO CSV FINAL
+# ============================================================================
+
+def _colunas_csv() -> list[str]:
+    """Colunas do CSV de ranking, na ordem do FRAMEWORK."""
     colunas = [
         "ranking",
         "batch",
@@ -1440,75 +4438,74 @@ def gerar_csv_final(resultados: list[dict], diretorio: str,
 
     # Adicionar total geral
     colunas.extend(["total_geral", "max_total", "pct_total"])
+    return colunas
+
+
+def _linha_csv(r: dict) -> dict:
+    """Linha do CSV de ranking de um resultado (com o ranking já atribuído)."""
+    linha = {
+        "ranking": r.get("ranking"),
+        "batch": r.get("batch", ""),
+        "problema": r["problema"],
+        "descricao": r.get("descricao", ""),
+        "desenvolvimento": r.get("desenvolvimento", ""),
+        "arquivo_fonte": r.get("arquivo_fonte", ""),
+    }
 
-    # Montar as linhas
-    linhas = []
-    for r in resultados_ordenados:
-        linha = {
-            "ranking": r["ranking"],
-            "batch": r.get("batch", ""),
-            "problema": r["problema"],
-            "descricao": r.get("descricao", ""),
-            "desenvolvimento": r.get("desenvolvimento", ""),
-            "arquivo_fonte": r.get("arquivo_fonte", ""),
-        }
+    # Notas individuais
+    notas = r.get("notas", {})
+    for cat_key, cat_data in FRAMEWORK.items():
+        for criterio in cat_data["criterios"]:
+            cid = criterio["id"]
+            nota = notas.get(cid, 0)
+            linha[f"nota_{cid}"] = nota
+            linha[f"ponderada_{cid}"] = nota * criterio["peso"]
 
-        # Notas individuais
-        notas = r.get("notas", {})
-        for cat_key, cat_data in FRAMEWORK.items():
-            for criterio in cat_data["criterios"]:
-                cid = criterio["id"]
-                nota = notas.get(cid, 0)
-                linha[f"nota_{cid}"] = nota
-                linha[f"ponderada_{cid}"] = nota * criterio["peso"]
+    # Subtotais
+    for cat_key in FRAMEWORK:
+        linha[f"subtotal_{cat_key}"] = r.get(f"subtotal_{cat_key}", 0)
+        linha[f"pct_{cat_key}"] = r.get(f"pct_{cat_key}", 0)
 
-        # Subtotais
-        for cat_key in FRAMEWORK:
-            linha[f"subtotal_{cat_key}"] = r.get(f"subtotal_{cat_key}", 0)
-            linha[f"pct_{cat_key}"] = r.get(f"pct_{cat_key}", 0)
+    linha["total_geral"] = r.get("total_geral", 0)
+    linha["max_total"] = r.get("max_total", 0)
+    linha["pct_total"] = r.get("pct_total", 0)
+    return linha
 
-        linha["total_geral"] = r.get("total_geral", 0)
-        linha["max_total"] = r.get("max_total", 0)
-        linha["pct_total"] = r.get("pct_total", 0)
 
-        linhas.append(linha)
+@PERFIL.medir("gerar_csv")
+def gerar_csv_final(resultados: list[dict], diretorio: str,
+                    nome_arquivo: str = "avaliacao_500_temas_ranking.csv", resumo: bool = True) -> str:
+    """Gera o CSV final unificado com todas as pontuações e ranking (resumo=False omite o top/bottom)."""
+
+    # Ordenar por total_geral (decrescente)
+    resultados_ordenados = sorted(resultados, key=lambda x: x.get("total_geral", 0), reverse=True)
+
+    # Atribuir ranking
+    for i, r in enumerate(resultados_ordenados, 1):
+        r["ranking"] = i
+
+    colunas = _colunas_csv()
+
+    # Montar as linhas
+    linhas = [_linha_csv(r) for r in resultados_ordenados]
 
     # Escrever CSV
     output_path = os.path.join(diretorio, nome_arquivo)
     with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=colunas, quoting=csv.QUOTE_ALL)
-
-        # Header com nomes legíveis
-        header_names = {
-            "ranking": "Ranking",
-            "batch": "Batch",
-            "problema": "Problema",
-            "descricao": "Descrição Geral",
-            "desenvolvimento": "Desenvolvimento",
-            "arquivo_fonte": "Arquivo Fonte",
-            "total_geral": "Total Geral",
-            "max_total": "Máximo Possível",
-            "pct_total": "% Total",
-        }
-
-        # Adicionar headers das notas
-        for cat_key, cat_data in FRAMEWORK.items():
-            header_names[f"subtotal_{cat_key}"] = f"Subtotal {cat_data['nome']}"
-            header_names[f"pct_{cat_key}"] = f"% {cat_data['nome']}"
-            for criterio in cat_data["criterios"]:
-                cid = criterio["id"]
-                header_names[f"nota_{cid}"] = f"Nota {criterio['nome']}"
-                header_names[f"ponderada_{cid}"] = f"Pond. {criterio['nome']} (x{criterio['peso']})"
-
-        # Escrever header legível como primeira linha de comentário, e depois os dados
         writer.writeheader()
         for linha in linhas:
             writer.writerow(linha)
 
-    print(f"\nCSV gerado: {output_path}")
-    print(f"Total de problemas avaliados: {len(linhas)}")
+    if resumo:
+        print(f"\nCSV gerado: {output_path}")
+        print(f"Total de problemas avaliados: {len(linhas)}")
+        imprimir_resumo_ranking(resultados_ordenados)
+    return output_path
 
-    # Imprimir Top 20
+
+def imprimir_resumo_ranking(resultados_ordenados: list[dict]):
+    """Top 20, bottom 10 e média por categoria de um ranking já ordenado."""
     print("\n" + "=" * 80)
     print("TOP 20 PROBLEMAS/OPORTUNIDADES")
     print("=" * 80)
@@ -1534,7 +4531,833 @@ def gerar_csv_final(resultados: list[dict], diretorio: str,
         media = sum(pcts) / len(pcts) if pcts else 0
         print(f"  {cat_data['nome']:<45s} | Média: {media:>5.1f}%")
 
-    return output_path
+
+# ============================================================================
+# ÍNDICE INCREMENTAL DO RANKING GERAL
+# ============================================================================
+
+# Acima desta fração de linhas novas, ordenar e intercalar sai mais barato que bisect
+FRACAO_INSERCAO_BISECT = 0.05
+
+
+def _chave_ranking(total: int, ordem: int) -> tuple:
+    """Ordem do ranking: total_geral decrescente; empates na ordem do banco (como o sort estável)."""
+    return (-total, ordem)
+
+
+def _assinaturas_ranking(base: str, batches: set) -> dict:
+    """{batch: {arquivo de resultado: [tamanho, mtime_ns]}} dos batches presentes no ranking."""
+    bdir = os.path.join(base, BATCHES_DIR)
+    assinaturas = {}
+    for batch in batches:
+        batch_path = os.path.join(bdir, batch)
+        arquivos = _arquivos_resultado(batch_path) if batch and os.path.isdir(batch_path) else []
+        assinaturas[batch] = {nome: _stat_resumido(os.path.join(batch_path, nome)) for nome in arquivos}
+    return assinaturas
+
+
+def carregar_indice_ranking(base: str) -> Optional[dict]:
+    """
+    Índice do banco_geral_ranking.csv, se ainda descreve o CSV em disco (mesmo
+    tamanho/mtime e mesmo FRAMEWORK). None obriga a gerar o ranking do zero.
+    """
+    path = os.path.join(base, RANKING_INDICE_FILE)
+    csv_path = os.path.join(base, BANCO_GERAL_CSV)
+    if not (os.path.exists(path) and os.path.exists(csv_path)):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            indice = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if indice.get("framework") != fingerprint_framework() or indice.get("csv") != _stat_resumido(csv_path):
+        return None
+    return indice
+
+
+class CodificadorLinhas:
+    """Formata linhas do CSV de ranking em bytes, sem a coluna de ranking (que muda a cada inserção)."""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, quoting=csv.QUOTE_ALL)
+        self.colunas = _colunas_csv()[1:]
+
+    def _codificar(self, valores: list) -> bytes:
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerow(valores)
+        return self.buffer.getvalue().encode("utf-8")
+
+    def cabecalho(self) -> bytes:
+        return self._codificar(_colunas_csv())
+
+    def linha(self, r: dict) -> bytes:
+        linha = _linha_csv(r)
+        return self._codificar([linha[c] for c in self.colunas])
+
+
+@PERFIL.medir("gerar_csv")
+def atualizar_ranking_geral(resultados: list[dict], base: str) -> tuple:
+    """
+    Regrava o banco_geral_ranking.csv mantendo um índice ordenado persistente
+    (RANKING_INDICE_FILE) em vez de ordenar e formatar o banco inteiro.
+
+    O índice guarda a ordem do ranking e, por linha, o intervalo de bytes no CSV
+    após a coluna de ranking. Linhas de batches cujos arquivos de resultado não
+    mudaram (e com o mesmo total) são copiadas do CSV anterior; as novas ou
+    alteradas são formatadas e inseridas por busca binária. Sem índice válido, o
+    ranking é gerado do zero e o índice criado.
+
+    Retorna (resultados ordenados, info) com contagens e a faixa de posições
+    afetadas (1-based, None se nada mudou). Atribui "ranking" em todos os resultados.
+    """
+    csv_path = os.path.join(base, BANCO_GERAL_CSV)
+    por_titulo = {r["problema"]: r for r in resultados}
+    ordem = {titulo: i for i, titulo in enumerate(por_titulo)}
+    assinaturas = _assinaturas_ranking(base, {r.get("batch", "") for r in resultados})
+
+    indice = carregar_indice_ranking(base)
+    anterior = b""
+    titulos_anteriores, descartados = [], {}
+    chaves, titulos, trechos = [], [], []
+    if indice is not None:
+        mudados = {b for b, sig in assinaturas.items() if indice["batches"].get(b) != sig}
+        for titulo, batch, total, inicio, fim in indice["linhas"]:
+            titulos_anteriores.append(titulo)
+            r = por_titulo.get(titulo)
+            if r is None or batch in mudados or r.get("batch", "") != batch or r.get("total_geral", 0) != total:
+                descartados[titulo] = (inicio, fim)
+                continue
+            chave = _chave_ranking(total, ordem[titulo])
+            if chaves and chave < chaves[-1]:
+                # A ordem do banco entre linhas mantidas mudou: o índice não serve
+                indice, titulos_anteriores = None, []
+                chaves, titulos, trechos = [], [], []
+                break
+            chaves.append(chave)
+            titulos.append(titulo)
+            trechos.append((inicio, fim))
+
+    mantidos = set(titulos)
+    novos = sorted((_chave_ranking(r.get("total_geral", 0), ordem[t]), t)
+                   for t, r in por_titulo.items() if t not in mantidos)
+
+    # Nada entrou, saiu ou mudou: o CSV em disco já é o ranking
+    if indice is not None and not novos and len(titulos) == len(titulos_anteriores):
+        for posicao, titulo in enumerate(titulos, 1):
+            por_titulo[titulo]["ranking"] = posicao
+        if indice["batches"] != assinaturas:
+            indice["batches"] = assinaturas
+            _gravar_json_atomico(os.path.join(base, RANKING_INDICE_FILE), indice)
+        info = {"incremental": True, "formatadas": 0, "reaproveitadas": len(titulos), "removidas": 0, "faixa": None}
+        return [por_titulo[t] for t in titulos], info
+    if chaves and len(novos) <= FRACAO_INSERCAO_BISECT * len(chaves):
+        for chave, titulo in novos:
+            pos = bisect.bisect_right(chaves, chave)
+            chaves.insert(pos, chave)
+            titulos.insert(pos, titulo)
+            trechos.insert(pos, None)
+    else:
+        fundidos = list(heapq.merge(zip(chaves, titulos, trechos),
+                                    ((chave, titulo, None) for chave, titulo in novos),
+                                    key=lambda item: item[0]))
+        chaves = [item[0] for item in fundidos]
+        titulos = [item[1] for item in fundidos]
+        trechos = [item[2] for item in fundidos]
+
+    # Gravar: linhas mantidas vêm do CSV anterior; só as novas são formatadas
+    if indice is not None:
+        with open(csv_path, "rb") as f:
+            anterior = f.read()
+    codificador = CodificadorLinhas()
+    origem = memoryview(anterior)
+    linhas_indice = []
+    afetadas = []
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        cabecalho = codecs.BOM_UTF8 + codificador.cabecalho()
+        f.write(cabecalho)
+        offset = len(cabecalho)
+        for posicao, (titulo, trecho) in enumerate(zip(titulos, trechos)):
+            r = por_titulo[titulo]
+            r["ranking"] = posicao + 1
+            prefixo = f'"{posicao + 1}",'.encode("ascii")
+            mesma_posicao = posicao < len(titulos_anteriores) and titulos_anteriores[posicao] == titulo
+            if trecho is None:
+                corpo = codificador.linha(r)
+                # Reformatada no mesmo lugar e com os mesmos bytes não conta como alterada
+                if not mesma_posicao or origem[slice(*descartados[titulo])] != corpo:
+                    afetadas.append(posicao)
+            else:
+                corpo = origem[trecho[0]:trecho[1]]
+                if not mesma_posicao:
+                    afetadas.append(posicao)
+            f.write(prefixo)
+            f.write(corpo)
+            inicio = offset + len(prefixo)
+            offset = inicio + len(corpo)
+            linhas_indice.append([titulo, r.get("batch", ""), r.get("total_geral", 0), inicio, offset])
+    os.replace(tmp_path, csv_path)
+    del origem
+
+    if len(titulos_anteriores) > len(titulos):
+        afetadas.append(len(titulos_anteriores) - 1)
+    _gravar_json_atomico(os.path.join(base, RANKING_INDICE_FILE), {
+        "framework": fingerprint_framework(),
+        "csv": _stat_resumido(csv_path),
+        "batches": assinaturas,
+        "linhas": linhas_indice,
+    })
+
+    info = {
+        "incremental": indice is not None,
+        "formatadas": len(novos),
+        "reaproveitadas": len(titulos) - len(novos),
+        "removidas": len(set(titulos_anteriores) - set(por_titulo)),
+        "faixa": (min(afetadas) + 1, max(afetadas) + 1) if afetadas else None,
+    }
+    return [por_titulo[t] for t in titulos], info
+
+
+# ============================================================================
+# MODO WATCH (RANKING CONTÍNUO)
+# ============================================================================
+
+INTERVALO_WATCH_PADRAO = 2.0
+
+
+class ObservadorBatches:
+    """
+    Estado do comando watch: os resultados de cada batch ficam em memória e, a
+    cada ciclo, só o que mudou em batches/ é tocado.
+
+    A detecção é por polling de tamanho/mtime (sem dependência de inotify):
+    - CSVs novos ou alterados num batch disparam `avaliar(batch)`, que avalia só os
+      problemas ainda sem resultado. Um CSV só é processado quando o stat se repete
+      em dois ciclos seguidos, para não ler um arquivo ainda sendo copiado.
+    - Arquivos de resultado alterados por outro processo (evaluate, workers,
+      backfill) fazem o batch ser relido, sem reavaliar nada.
+    Havendo mudança, o banco é mesclado em memória e o ranking geral é regravado.
+    """
+
+    def __init__(self, base: str, avaliar):
+        self.base = base
+        self.avaliar = avaliar
+        self.por_batch = {}     # batch -> resultados (como carregar_resultados_batch)
+        self.csvs = {}          # batch -> {csv: stat} já processados
+        self.resultados = {}    # batch -> {arquivo de resultado: stat} já lidos
+        self._vistos = {}       # batch -> {csv: stat} do ciclo anterior (debounce)
+
+    @staticmethod
+    def _stats(batch_path: str, nomes: list[str]) -> dict:
+        stats = {}
+        for nome in nomes:
+            try:
+                stats[nome] = _stat_resumido(os.path.join(batch_path, nome))
+            except FileNotFoundError:
+                pass
+        return stats
+
+    @staticmethod
+    def _csvs(batch_path: str) -> list[str]:
+        return sorted(os.path.basename(c) for c in glob_module.glob(os.path.join(batch_path, "*.csv")))
+
+    def carregar(self):
+        """Carga inicial: resultados de todos os batches; os pendentes entram na fila do 1º ciclo."""
+        for b in listar_batches(self.base):
+            nome, path = b["nome"], b["caminho"]
+            self.por_batch[nome] = self._carregar_batch(path, nome)
+            self.resultados[nome] = self._stats(path, _arquivos_resultado(path))
+            csvs = self._stats(path, self._csvs(path))
+            self._vistos[nome] = csvs
+            if b["n_avaliados"] + b["n_ignorados"] < b["n_problemas"]:
+                print(f"  Batch '{nome}': {b['n_problemas'] - b['n_avaliados'] - b['n_ignorados']} problemas pendentes")
+            else:
+                self.csvs[nome] = csvs
+
+    @staticmethod
+    def _carregar_batch(batch_path: str, nome: str) -> list[dict]:
+        resultados = carregar_resultados_batch(batch_path)
+        for r in resultados:
+            r.setdefault("batch", nome)
+        return resultados
+
+    def ciclo(self) -> bool:
+        """Uma varredura de batches/. Retorna True se o ranking foi regravado."""
+        bdir = _batches_dir(self.base)
+        existentes = set()
+        mudou = False
+        for entry in sorted(os.listdir(bdir)):
+            batch_path = os.path.join(bdir, entry)
+            if not os.path.isdir(batch_path):
+                continue
+            existentes.add(entry)
+            csvs = self._stats(batch_path, self._csvs(batch_path))
+            if csvs and csvs != self.csvs.get(entry):
+                estavel = self._vistos.get(entry) == csvs
+                self._vistos[entry] = csvs
+                # Ainda sendo copiado, ou workers avaliando: fica para o próximo ciclo
+                if estavel and not leases_ativos(batch_path):
+                    print(f"\n[{datetime.now():%H:%M:%S}] CSVs novos/alterados em '{entry}'")
+                    try:
+                        self.por_batch[entry] = self.avaliar(entry)
+                    except Exception as e:
+                        print(f"ERRO: avaliação do batch '{entry}' falhou: {e}")
+                        self.por_batch[entry] = self._carregar_batch(batch_path, entry)
+                    for r in self.por_batch[entry]:
+                        r.setdefault("batch", entry)
+                    self.csvs[entry] = csvs
+                    self.resultados[entry] = self._stats(batch_path, _arquivos_resultado(batch_path))
+                    mudou = True
+                    continue
+
+            arquivos = self._stats(batch_path, _arquivos_resultado(batch_path))
+            if arquivos != self.resultados.get(entry, {}):
+                print(f"\n[{datetime.now():%H:%M:%S}] Resultados de '{entry}' alterados por outro processo")
+                self.por_batch[entry] = self._carregar_batch(batch_path, entry)
+                self.resultados[entry] = arquivos
+                mudou = True
+
+        for entry in set(self.por_batch) - existentes:
+            print(f"\n[{datetime.now():%H:%M:%S}] Batch '{entry}' removido")
+            for estado in (self.por_batch, self.csvs, self.resultados, self._vistos):
+                estado.pop(entry, None)
+            mudou = True
+
+        if mudou:
+            self.publicar()
+        return mudou
+
+    def banco(self) -> list[dict]:
+        """Banco geral mesclado em memória, na mesma ordem e deduplicação de consolidar_banco_geral."""
+        vistos = {}
+        for entry in sorted(self.por_batch):
+            for r in self.por_batch[entry]:
+                vistos[r["problema"]] = r
+        return list(vistos.values())
+
+    def publicar(self):
+        """Regrava o ranking geral a partir da memória e depois persiste o banco consolidado."""
+        inicio = time.perf_counter()
+        todos = self.banco()
+        if todos:
+            gerar_ranking_geral(todos, self.base, resumo=False)
+        segundos = time.perf_counter() - inicio
+        self.persistir(todos)
+        print(f"[{datetime.now():%H:%M:%S}] Ranking atualizado: {len(todos)} problemas únicos "
+              f"({segundos:.2f}s) -> {BANCO_GERAL_CSV}")
+
+    def persistir(self, todos: list[dict]):
+        """
+        Grava banco geral e manifest como consolidar_banco_geral os deixaria, para
+        que rebuild/status/query vejam o banco em dia sem reconsolidar.
+        """
+        if usa_sqlite(self.base):
+            consolidar_banco_sqlite(self.base)
+            return
+        bdir = _batches_dir(self.base)
+        manifest = _carregar_manifest(self.base)
+        assinaturas = {}
+        for entry in sorted(self.por_batch):
+            batch_path = os.path.join(bdir, entry)
+            arquivos = _arquivos_resultado(batch_path)
+            if arquivos:
+                anterior = manifest["batches"].get(entry, {}).get("arquivos", {})
+                assinaturas[entry] = {"arquivos": _assinatura_arquivos(batch_path, arquivos, anterior),
+                                      "n": len(self.por_batch[entry])}
+        # "ranking" é atribuído ao gerar o CSV e não faz parte do banco
+        banco_path = os.path.join(self.base, BANCO_GERAL_JSON)
+        _gravar_json_atomico(banco_path, [{k: v for k, v in r.items() if k != "ranking"} for r in todos],
+                             indent=2)
+        manifest["batches"] = assinaturas
+        _salvar_manifest(self.base, manifest, None, banco_path)
+
+
+def observar_batches(base: str, avaliar, intervalo: float = INTERVALO_WATCH_PADRAO,
+                     orcamento: Optional["OrcamentoAPI"] = None) -> int:
+    """Laço do comando watch; termina com Ctrl+C ou quando o orçamento se esgota."""
+    observador = ObservadorBatches(base, avaliar)
+    observador.carregar()
+    observador.publicar()
+    print(f"\nObservando {_batches_dir(base)} a cada {intervalo:g}s (Ctrl+C para sair)")
+    try:
+        while True:
+            observador.ciclo()
+            if orcamento and orcamento.esgotado():
+                print(f"\nOrçamento esgotado ({orcamento.descricao()}); encerrando watch.")
+                return 0
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\nWatch encerrado.")
+        return 0
+
+
+# ============================================================================
+# SERVIDOR HTTP DO RANKING (SOMENTE LEITURA)
+# ============================================================================
+
+PORTA_SERVE_PADRAO = 8765
+LIMITE_PAGINA_PADRAO = 20
+LIMITE_PAGINA_MAXIMO = 500
+
+
+def id_problema(titulo: str) -> str:
+    """Identificador estável de um problema nas URLs do serve (prefixo do hash do título)."""
+    return _hash_problema(titulo)[:16]
+
+
+def versao_banco(base: str) -> str:
+    """
+    Versão do banco consolidado: muda quando o arquivo do banco (JSON ou SQLite)
+    é regravado ou o FRAMEWORK muda. Usada como ETag das respostas do serve.
+    """
+    if usa_sqlite(base):
+        nomes = [BANCO_SQLITE, f"{BANCO_SQLITE}-wal"]
+    else:
+        nomes = [BANCO_GERAL_JSON]
+    stats = [_stat_resumido(os.path.join(base, n)) if os.path.exists(os.path.join(base, n)) else None
+             for n in nomes]
+    chave = json.dumps([stats, fingerprint_framework()])
+    return hashlib.sha256(chave.encode("utf-8")).hexdigest()[:16]
+
+
+class InstantaneoRanking:
+    """
+    Banco geral de uma versão, com índices ordenados para as consultas do serve:
+
+    - ranking geral (total_geral decrescente, empate na ordem do banco, como o CSV);
+    - por categoria (pct da categoria decrescente), com as chaves para bisect de min_pct;
+    - por batch (na ordem de cada índice acima, montado no primeiro uso e guardado);
+    - por id do problema.
+
+    Imutável depois de montado (exceto o cache por batch, preenchido sob lock):
+    uma requisição que pegou o instantâneo nunca mistura dados de duas versões.
+    """
+
+    def __init__(self, versao: Optional[str], registros: list[dict]):
+        ordem_total = sorted(range(len(registros)), key=lambda i: -registros[i].get("total_geral", 0))
+        ranking = [0] * len(registros)
+        for posicao, i in enumerate(ordem_total, 1):
+            ranking[i] = posicao
+
+        self.versao = versao
+        self.registros = registros
+        self.ranking = ranking
+        self.por_id = {id_problema(r["problema"]): i for i, r in enumerate(registros)}
+        self.ordens = {None: ordem_total}
+        for cat_key in FRAMEWORK:
+            coluna = f"pct_{cat_key}"
+            self.ordens[cat_key] = sorted(range(len(registros)), key=lambda i: -registros[i].get(coluna, 0))
+        self.batches = {}
+        for r in registros:
+            self.batches[r.get("batch", "")] = self.batches.get(r.get("batch", ""), 0) + 1
+        self._filtrados = {}
+        self._lock = threading.Lock()
+
+    def _ordem(self, categoria: Optional[str], batch: Optional[str]) -> tuple:
+        """(posições em ordem, chaves -pct para bisect) de uma categoria, opcionalmente só de um batch."""
+        chave = (categoria, batch)
+        with self._lock:
+            if chave not in self._filtrados:
+                ordem = self.ordens[categoria]
+                if batch is not None:
+                    ordem = [i for i in ordem if self.registros[i].get("batch", "") == batch]
+                coluna = f"pct_{categoria}" if categoria else "pct_total"
+                self._filtrados[chave] = (ordem, [-self.registros[i].get(coluna, 0) for i in ordem])
+            return self._filtrados[chave]
+
+    def resumo(self, i: int) -> dict:
+        r = self.registros[i]
+        item = {"id": id_problema(r["problema"]), "ranking": self.ranking[i], "batch": r.get("batch", ""),
+                "problema": r["problema"], "total_geral": r.get("total_geral", 0),
+                "pct_total": r.get("pct_total", 0)}
+        for cat_key in FRAMEWORK:
+            item[f"pct_{cat_key}"] = r.get(f"pct_{cat_key}", 0)
+        return item
+
+    def consultar(self, categoria: Optional[str] = None, batch: Optional[str] = None,
+                  min_pct: Optional[float] = None, offset: int = 0,
+                  limite: int = LIMITE_PAGINA_PADRAO) -> dict:
+        """Página do ranking (geral ou de uma categoria), com filtros de batch e pct mínimo."""
+        ordem, chaves = self._ordem(categoria, batch)
+        total = len(ordem) if min_pct is None else bisect.bisect_right(chaves, -min_pct)
+        return {
+            "versao": self.versao,
+            "categoria": categoria or "total",
+            "batch": batch,
+            "total": total,
+            "offset": offset,
+            "limite": limite,
+            "itens": [self.resumo(i) for i in ordem[offset:min(offset + limite, total)]],
+        }
+
+    def problema(self, pid: str) -> Optional[dict]:
+        i = self.por_id.get(pid)
+        if i is None:
+            return None
+        return {"versao": self.versao, "id": pid, "ranking": self.ranking[i], **self.registros[i]}
+
+
+class IndicesRanking:
+    """
+    Banco geral carregado uma vez em memória, como um InstantaneoRanking.
+
+    `atualizar()` remonta o instantâneo só se a versão do banco mudou (ex.: um
+    watch ou rebuild rodando ao lado) e troca a referência de uma vez; cada
+    requisição usa o instantâneo que `atualizar()` devolveu do começo ao fim.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self.atual = InstantaneoRanking(None, [])
+        self._lock = threading.Lock()
+        self.atualizar()
+
+    def atualizar(self) -> InstantaneoRanking:
+        atual = self.atual
+        versao = versao_banco(self.base)
+        if versao == atual.versao:
+            return atual
+        with self._lock:
+            if versao != self.atual.versao:
+                self.atual = InstantaneoRanking(versao, carregar_banco_geral(self.base))
+            return self.atual
+
+
+def _categoria_por_nome(valor: Optional[str]) -> Optional[str]:
+    """Chave da categoria a partir da chave completa (3_timing) ou do número (3); None = total."""
+    if not valor or valor == "total":
+        return None
+    categoria = next((c for c in FRAMEWORK if c == valor or c.split("_", 1)[0] == valor), None)
+    if categoria is None:
+        raise ValueError(f"categoria desconhecida '{valor}'. Opções: total, {', '.join(FRAMEWORK)}")
+    return categoria
+
+
+def criar_servidor_ranking(base: str, host: str = "127.0.0.1", porta: int = PORTA_SERVE_PADRAO):
+    """
+    Servidor HTTP somente leitura sobre IndicesRanking. Rotas (GET e HEAD, respostas JSON):
+
+        /                       versão do banco, total de problemas e rotas
+        /ranking                ?categoria=&batch=&min_pct=&offset=&limite=
+        /problemas/<id>         registro completo de um problema
+        /batches                batches e quantidade de problemas no banco
+        /categorias             categorias do FRAMEWORK
+
+    Toda resposta 200 leva ETag com a versão do banco; If-None-Match igual devolve 304.
+    Erros (400/404) saem sem ETag e nunca viram 304.
+    """
+    # http.server só é importado por quem serve (fora do caminho de startup da CLI)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, unquote, urlsplit
+
+    indices = IndicesRanking(base)
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "BarsJudge/1.0"
+
+        def _responder(self, status: int, corpo: Optional[dict], etag: Optional[str] = None,
+                       com_corpo: bool = True):
+            """Envia status e cabeçalhos; o corpo só quando com_corpo (HEAD recebe só o Content-Length)."""
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8") if corpo is not None else b""
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if corpo is not None:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            if com_corpo and dados:
+                self.wfile.write(dados)
+
+        def _rota(self, indices: InstantaneoRanking, caminho: str, params: dict) -> tuple:
+            def param(nome, tipo=str, padrao=None):
+                valor = params.get(nome, [None])[0]
+                return padrao if valor in (None, "") else tipo(valor)
+
+            partes = [unquote(p) for p in caminho.strip("/").split("/") if p]
+            if not partes:
+                return 200, {"versao": indices.versao, "problemas": len(indices.registros),
+                             "rotas": ["/ranking", "/problemas/<id>", "/batches", "/categorias"]}
+            if partes == ["ranking"]:
+                batch = param("batch")
+                if batch is not None and batch not in indices.batches:
+                    return 404, {"erro": f"batch '{batch}' não encontrado"}
+                limite = min(param("limite", int, LIMITE_PAGINA_PADRAO), LIMITE_PAGINA_MAXIMO)
+                offset = param("offset", int, 0)
+                if limite < 1 or offset < 0:
+                    return 400, {"erro": "limite deve ser >= 1 e offset >= 0"}
+                return 200, indices.consultar(_categoria_por_nome(param("categoria")), batch,
+                                              param("min_pct", float), offset, limite)
+            if len(partes) == 2 and partes[0] == "problemas":
+                registro = indices.problema(partes[1])
+                if registro is None:
+                    return 404, {"erro": f"problema '{partes[1]}' não encontrado"}
+                return 200, registro
+            if partes == ["batches"]:
+                return 200, {"versao": indices.versao,
+                             "batches": [{"nome": b, "problemas": n} for b, n in sorted(indices.batches.items())]}
+            if partes == ["categorias"]:
+                return 200, {"versao": indices.versao,
+                             "categorias": [{"chave": c, "nome": d["nome"],
+                                             "criterios": [k["id"] for k in d["criterios"]]}
+                                            for c, d in FRAMEWORK.items()]}
+            return 404, {"erro": f"rota desconhecida: {caminho}"}
+
+        def _atender(self, com_corpo: bool):
+            url = urlsplit(self.path)
+            try:
+                # Um único instantâneo por requisição, mesmo que o banco seja recarregado no meio
+                instantaneo = indices.atualizar()
+                etag = f'"{instantaneo.versao}"'
+                status, corpo = self._rota(instantaneo, url.path, parse_qs(url.query))
+            except ValueError as e:
+                status, corpo, etag = 400, {"erro": str(e)}, None
+            if status != 200:
+                etag = None
+            # 304 só para uma rota válida: erros (404/400) nunca viram "não modificado"
+            elif etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                status, corpo = 304, None
+            self._responder(status, corpo, etag, com_corpo)
+
+        def do_GET(self):
+            self._atender(com_corpo=True)
+
+        def do_HEAD(self):
+            self._atender(com_corpo=False)
+
+    servidor = ThreadingHTTPServer((host, porta), Handler)
+    servidor.daemon_threads = True
+    servidor.indices = indices
+    return servidor
+
+
+# ============================================================================
+# BUSCA TEXTUAL (BM25) EM PROBLEMAS E ARTIGOS
+# ============================================================================
+
+# Muda quando tokenização ou stemming mudam: o índice é refeito do zero
+VERSAO_TOKENIZADOR = "1"
+BM25_K1 = 1.2
+BM25_B = 0.75
+FONTES_BUSCA = {"problemas": "problema", "artigos": "artigo"}
+
+# Palavras funcionais já sem acento (o texto é dobrado antes da comparação)
+STOPWORDS_PT = frozenset("""
+    a ao aos as ate com como da das de do dos e ela elas ele eles em entre era essa esse esta este
+    foi ha isso ja la mais mas me mesmo muito na nao nas nem no nos o os ou para pela pelas pelo
+    pelos por qual quando que se sem ser seu seus sua suas sao tambem te tem um uma umas uns
+""".split())
+
+# Plurais (sufixo, substituição), testados em ordem; no fim, "s" simples cai
+_PLURAIS_PT = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"),
+               ("ns", "m"), ("res", "r"), ("zes", "z"), ("les", "l"))
+
+
+def radical_pt(termo: str) -> str:
+    """
+    Stemming leve para português (no estilo do stemmer "light" de Savoy): remove
+    plural, o sufixo -mente e a vogal final de gênero/tema. Não tenta achar a raiz
+    morfológica; só junta variações comuns (regulação/regulações, rápido/rápida/rapidamente).
+    """
+    if len(termo) <= 3 or termo.isdigit():
+        return termo
+    if termo.endswith("s"):
+        for sufixo, troca in _PLURAIS_PT:
+            if termo.endswith(sufixo):
+                termo = termo[:-len(sufixo)] + troca
+                break
+        else:
+            termo = termo[:-1]
+    if len(termo) > 7 and termo.endswith("mente"):
+        termo = termo[:-5]
+    if len(termo) > 3 and termo[-1] in "aeo":
+        termo = termo[:-1]
+    return termo
+
+
+def tokens_busca(texto: str) -> list[str]:
+    """Minúsculas, sem acentos, sem stopwords e com stemming leve."""
+    sem_acento = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return [radical_pt(t) for t in re.findall(r"[a-z0-9]+", sem_acento)
+            if len(t) > 1 and t not in STOPWORDS_PT]
+
+
+def abrir_indice_busca(base: str) -> sqlite3.Connection:
+    """
+    Abre (criando o esquema, se preciso) o índice invertido da busca: um documento
+    por problema do banco ("p:<id>") e por artigo ("a:<arquivo>"), com as
+    frequências de cada termo em `postings`.
+    """
+    conn = sqlite3.connect(os.path.join(base, INDICE_BUSCA_FILE))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            chave TEXT NOT NULL UNIQUE,
+            fonte TEXT NOT NULL,
+            titulo TEXT NOT NULL,
+            ref TEXT,
+            assinatura TEXT NOT NULL,
+            comprimento INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            termo TEXT NOT NULL,
+            doc INTEGER NOT NULL REFERENCES docs(id) ON DELETE CASCADE,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (termo, doc)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc);
+        CREATE INDEX IF NOT EXISTS idx_docs_fonte ON docs(fonte);
+    """)
+    return conn
+
+
+def _meta_busca(conn: sqlite3.Connection, chave: str) -> Optional[str]:
+    linha = conn.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+    return linha[0] if linha else None
+
+
+def _titulo_artigo(texto: str, nome: str) -> str:
+    """Primeiro cabeçalho '# ' do markdown; sem ele, o nome do arquivo sem o prefixo numérico."""
+    for linha in texto.splitlines()[:20]:
+        if linha.startswith("# "):
+            return linha[2:].strip()
+    return re.sub(r"^\d+_", "", os.path.splitext(nome)[0])
+
+
+def _sincronizar_fonte(conn: sqlite3.Connection, fonte: str, atuais: dict, carregar) -> dict:
+    """
+    Alinha os documentos de uma fonte com `atuais` ({chave: assinatura}): remove
+    os que sumiram e retokeniza só os novos ou com assinatura diferente.
+    `carregar(chave)` devolve (título, ref, texto); o título conta em dobro.
+    """
+    existentes = {chave: assinatura for chave, assinatura in
+                  conn.execute("SELECT chave, assinatura FROM docs WHERE fonte = ?", (fonte,))}
+    removidos = [chave for chave in existentes if chave not in atuais]
+    conn.executemany("DELETE FROM docs WHERE chave = ?", ((chave,) for chave in removidos))
+
+    contagem = {"novos": 0, "alterados": 0, "removidos": len(removidos)}
+    for chave, assinatura in atuais.items():
+        anterior = existentes.get(chave)
+        if anterior == assinatura:
+            continue
+        contagem["alterados" if anterior is not None else "novos"] += 1
+        titulo, ref, texto = carregar(chave)
+        termos = tokens_busca(titulo) * 2 + tokens_busca(texto)
+        conn.execute("DELETE FROM docs WHERE chave = ?", (chave,))
+        doc = conn.execute(
+            "INSERT INTO docs (chave, fonte, titulo, ref, assinatura, comprimento) VALUES (?, ?, ?, ?, ?, ?)",
+            (chave, fonte, titulo, ref, assinatura, len(termos))).lastrowid
+        frequencias = {}
+        for termo in termos:
+            frequencias[termo] = frequencias.get(termo, 0) + 1
+        conn.executemany("INSERT INTO postings (termo, doc, tf) VALUES (?, ?, ?)",
+                         ((termo, doc, tf) for termo, tf in frequencias.items()))
+    return contagem
+
+
+def atualizar_indice_busca(base: str, completo: bool = False) -> dict:
+    """
+    Atualiza o índice de busca de forma incremental:
+    - artigos (artigos/*.md): tamanho/mtime de cada arquivo decide quem é relido;
+    - problemas: só quando a versão do banco consolidado mudou (versao_banco), e
+      então apenas os registros cujo texto ou batch mudou são retokenizados.
+    Retorna as contagens de documentos novos, alterados e removidos.
+    """
+    conn = abrir_indice_busca(base)
+    contagem = {"novos": 0, "alterados": 0, "removidos": 0}
+    try:
+        with conn:
+            if completo or _meta_busca(conn, "tokenizador") != VERSAO_TOKENIZADOR:
+                conn.execute("DELETE FROM docs")
+                conn.execute("DELETE FROM meta")
+                conn.execute("INSERT INTO meta VALUES ('tokenizador', ?)", (VERSAO_TOKENIZADOR,))
+
+            adir = os.path.join(base, ARTIGOS_DIR)
+            artigos = {}
+            for path in sorted(glob_module.glob(os.path.join(adir, "*.md"))):
+                tamanho, mtime = _stat_resumido(path)
+                artigos[f"a:{os.path.basename(path)}"] = f"{tamanho}:{mtime}"
+
+            def carregar_artigo(chave: str) -> tuple:
+                nome = chave[2:]
+                with open(os.path.join(adir, nome), "r", encoding="utf-8", errors="replace") as f:
+                    texto = f.read()
+                return _titulo_artigo(texto, nome), os.path.join(ARTIGOS_DIR, nome), texto
+
+            for k, v in _sincronizar_fonte(conn, FONTES_BUSCA["artigos"], artigos, carregar_artigo).items():
+                contagem[k] += v
+
+            versao = versao_banco(base)
+            if _meta_busca(conn, "banco") != versao:
+                registros = {}
+                for r in carregar_banco_geral(base):
+                    texto = json.dumps([r["problema"], r.get("descricao", ""), r.get("desenvolvimento", ""),
+                                        r.get("batch", "")], ensure_ascii=False)
+                    registros[f"p:{id_problema(r['problema'])}"] = (
+                        hashlib.sha1(texto.encode("utf-8")).hexdigest(), r)
+
+                def carregar_problema(chave: str) -> tuple:
+                    r = registros[chave][1]
+                    return r["problema"], r.get("batch", ""), f"{r.get('descricao', '')}\n{r.get('desenvolvimento', '')}"
+
+                atuais = {chave: assinatura for chave, (assinatura, _) in registros.items()}
+                for k, v in _sincronizar_fonte(conn, FONTES_BUSCA["problemas"], atuais, carregar_problema).items():
+                    contagem[k] += v
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('banco', ?)", (versao,))
+        contagem["total"] = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    finally:
+        conn.close()
+    return contagem
+
+
+def buscar(base: str, consulta: str, limite: int = 10, fonte: Optional[str] = None) -> list[dict]:
+    """
+    Documentos mais relevantes para a consulta por BM25 (k1=BM25_K1, b=BM25_B),
+    lendo do índice só as postings dos termos da consulta. `fonte` restringe a
+    "problema" ou "artigo".
+    """
+    termos = list(dict.fromkeys(tokens_busca(consulta)))
+    if not termos:
+        return []
+    conn = abrir_indice_busca(base)
+    try:
+        filtro, params = ("", ()) if fonte is None else (" AND d.fonte = ?", (fonte,))
+        n_docs, soma = conn.execute(f"SELECT COUNT(*), SUM(comprimento) FROM docs d WHERE 1 = 1{filtro}",
+                                    params).fetchone()
+        if not n_docs:
+            return []
+        media = soma / n_docs
+
+        pontuacoes = {}
+        for termo in termos:
+            postings = conn.execute(
+                f"SELECT p.doc, p.tf, d.comprimento FROM postings p JOIN docs d ON d.id = p.doc "
+                f"WHERE p.termo = ?{filtro}", (termo, *params)).fetchall()
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf, comprimento in postings:
+                pontuacoes[doc] = pontuacoes.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                    tf + BM25_K1 * (1 - BM25_B + BM25_B * comprimento / media))
+
+        melhores = heapq.nlargest(limite, pontuacoes.items(), key=lambda item: item[1])
+        resultados = []
+        for doc, pontuacao in melhores:
+            chave, fonte_doc, titulo, ref = conn.execute(
+                "SELECT chave, fonte, titulo, ref FROM docs WHERE id = ?", (doc,)).fetchone()
+            resultados.append({"chave": chave, "fonte": fonte_doc, "titulo": titulo, "ref": ref,
+                               "pontuacao": round(pontuacao, 4)})
+        return resultados
+    finally:
+        conn.close()
 
 
 # ============================================================================
@@ -1543,7 +5366,7 @@ def gerar_csv_final(resultados: list[dict], diretorio: str,
 
 def _setup_api_client(args) -> Optional[object]:
     """Configura cliente da API Anthropic se necessário."""
-    if args.mode != "api":
+    if args.mode not in ("api", "bulk", "cascade"):
         return None
     if not HAS_ANTHROPIC:
         print("ERRO: Pacote 'anthropic' não instalado. Execute: pip install anthropic")
@@ -1553,7 +5376,18 @@ def _setup_api_client(args) -> Optional[object]:
         print("ERRO: ANTHROPIC_API_KEY não configurada.")
         print("Use --mode heuristic para avaliação sem API.")
         sys.exit(1)
-    return anthropic.Anthropic(api_key=api_key)
+    # base_url permite apontar para um servidor local que simula a API (testes do modo bulk)
+    base_url = getattr(args, "base_url", None) or os.environ.get("ANTHROPIC_BASE_URL")
+    return anthropic.Anthropic(api_key=api_key, base_url=base_url)
+
+
+def _percentuais_cascata_validos(args) -> bool:
+    """--api-top e --calibration são porcentagens: fora de 0-100 a divisão em camadas não faz sentido."""
+    for opcao, valor in (("--api-top", args.api_top), ("--calibration", args.calibration)):
+        if not 0 <= valor <= 100:
+            print(f"ERRO: {opcao} deve estar entre 0 e 100 (recebido: {valor:g}).")
+            return False
+    return True
 
 
 def cmd_add_batch(args):
@@ -1563,7 +5397,7 @@ def cmd_add_batch(args):
     print("BARS JUDGE AGENT - Adicionar Batch")
     print("=" * 80)
 
-    batch_nome = adicionar_batch(base, args.fonte, args.name)
+    batch_nome = adicionar_batch(base, args.fonte, args.name, args.near_dup_threshold)
     return 0
 
 
@@ -1599,12 +5433,21 @@ def cmd_evaluate(args):
     print("=" * 80)
     print("BARS JUDGE AGENT - Avaliar Batches")
     print("=" * 80)
+    if not _percentuais_cascata_validos(args):
+        return 1
     print(f"Modo: {args.mode.upper()}")
-    if args.mode == "api":
-        print(f"Modelo: {args.model}")
+    if args.mode in ("api", "bulk", "cascade"):
+        print(f"Modelo: {args.model} | saída {'JSON em texto' if args.no_structured else 'estruturada (tool use)'}")
+    if args.mode == "cascade":
+        print(f"Cascata: top {args.api_top:g}% + {args.calibration:g}% de calibração via API")
     print()
 
     client = _setup_api_client(args)
+    definir_saida_estruturada(not args.no_structured)
+    orcamento = None
+    if args.max_cost is not None or args.max_tokens_total is not None:
+        orcamento = OrcamentoAPI(args.max_cost, args.max_tokens_total)
+        print(f"Orçamento: {orcamento.descricao()}")
     batches = listar_batches(base)
 
     if not batches:
@@ -1619,7 +5462,7 @@ def cmd_evaluate(args):
             return 1
     else:
         # Apenas batches não completamente avaliados
-        pendentes = [b for b in batches if b["n_avaliados"] < b["n_problemas"]]
+        pendentes = [b for b in batches if b["n_avaliados"] + b["n_ignorados"] < b["n_problemas"]]
         if not pendentes:
             print("Todos os batches já foram avaliados!")
             # Rebuild ranking mesmo assim
@@ -1629,12 +5472,37 @@ def cmd_evaluate(args):
             return 0
         batches = pendentes
 
+    if args.worker is not None and args.mode == "bulk":
+        print("ERRO: --worker não se aplica ao modo bulk (o job assíncrono já é único por batch).")
+        return 1
+    worker = None
+    if args.worker is not None:
+        worker = args.worker or id_worker_padrao()
+        print(f"Worker: {worker} (shards de {args.shard_size}, lease de {args.lease_ttl:.0f}s)")
+        if args.near_dup != "off":
+            print("  Aviso: --near-dup é ignorado no modo --worker.")
+
     for b in batches:
         print(f"\n{'─' * 60}")
         print(f"Batch: {b['nome']} ({b['n_problemas']} problemas, {b['n_avaliados']} avaliados)")
         print(f"{'─' * 60}")
-        avaliar_batch(base, b["nome"], args.mode,
-                      getattr(args, "model", "claude-sonnet-4-20250514"), client)
+        if worker:
+            avaliar_batch_worker(base, b["nome"], worker, args.mode,
+                                 getattr(args, "model", "claude-sonnet-4-20250514"), client,
+                                 concorrencia=args.concurrency, rpm=args.rpm, tpm=args.tpm, pack=args.pack,
+                                 api_top=args.api_top, calibracao=args.calibration, orcamento=orcamento,
+                                 ttl=args.lease_ttl, tamanho_shard=args.shard_size)
+        else:
+            avaliar_batch(base, b["nome"], args.mode,
+                          getattr(args, "model", "claude-sonnet-4-20250514"), client,
+                          concorrencia=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+                          bulk_intervalo=args.poll_interval, bulk_aguardar=not args.no_wait,
+                          pack=args.pack, quase_dup=args.near_dup,
+                          limiar_quase_dup=args.near_dup_threshold,
+                          api_top=args.api_top, calibracao=args.calibration, orcamento=orcamento)
+        if orcamento and orcamento.esgotado():
+            print(f"\nOrçamento esgotado ({orcamento.descricao()}); batches restantes ficam pendentes.")
+            break
 
     # Consolidar e gerar ranking
     print("\n" + "=" * 80)
@@ -1646,6 +5514,125 @@ def cmd_evaluate(args):
     return 0
 
 
+def cmd_watch(args):
+    """Subcomando: manter o ranking geral em dia conforme CSVs chegam em batches/."""
+    base = os.path.abspath(args.dir)
+    print("=" * 80)
+    print("BARS JUDGE AGENT - Watch")
+    print("=" * 80)
+    if not _percentuais_cascata_validos(args):
+        return 1
+    print(f"Modo: {args.mode.upper()}")
+    if args.mode in ("api", "cascade"):
+        print(f"Modelo: {args.model} | saída {'JSON em texto' if args.no_structured else 'estruturada (tool use)'}")
+    print()
+
+    if not os.path.isdir(_batches_dir(base)):
+        print("Nenhum batch encontrado. Use 'add-batch' ou 'import-legacy' primeiro.")
+        return 1
+
+    # Cliente, cache de prompt e regras heurísticas compiladas vivem o processo inteiro
+    client = _setup_api_client(args)
+    definir_saida_estruturada(not args.no_structured)
+    orcamento = None
+    if args.max_cost is not None or args.max_tokens_total is not None:
+        orcamento = OrcamentoAPI(args.max_cost, args.max_tokens_total)
+        print(f"Orçamento: {orcamento.descricao()}")
+
+    def avaliar(batch_nome: str) -> list[dict]:
+        return avaliar_batch(base, batch_nome, args.mode, args.model, client,
+                             concorrencia=args.concurrency, rpm=args.rpm, tpm=args.tpm, pack=args.pack,
+                             api_top=args.api_top, calibracao=args.calibration, orcamento=orcamento)
+
+    return observar_batches(base, avaliar, intervalo=args.interval, orcamento=orcamento)
+
+
+def cmd_serve(args):
+    """Subcomando: servir o ranking geral por HTTP (somente leitura)."""
+    base = os.path.abspath(args.dir)
+    print("=" * 80)
+    print("BARS JUDGE AGENT - Serve")
+    print("=" * 80)
+
+    inicio = time.perf_counter()
+    servidor = criar_servidor_ranking(base, args.host, args.port)
+    indices = servidor.indices.atual
+    if not indices.registros:
+        print("Nenhum dado encontrado. Avalie batches primeiro.")
+        servidor.server_close()
+        return 1
+    print(f"Banco carregado: {len(indices.registros)} problemas, {len(indices.batches)} batches "
+          f"(versão {indices.versao}, {time.perf_counter() - inicio:.2f}s)")
+    print(f"Servindo em http://{args.host}:{servidor.server_address[1]}/ (Ctrl+C para sair)")
+    print("  /ranking?categoria=3&batch=...&min_pct=60&offset=0&limite=20 | /problemas/<id> | /batches | /categorias")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
+    finally:
+        servidor.server_close()
+    return 0
+
+
+def cmd_search(args):
+    """Subcomando: busca textual (BM25) em problemas do banco e artigos."""
+    base = os.path.abspath(args.dir)
+    consulta = " ".join(args.consulta)
+
+    inicio = time.perf_counter()
+    contagem = atualizar_indice_busca(base, completo=args.rebuild)
+    if contagem["novos"] or contagem["alterados"] or contagem["removidos"]:
+        print(f"Índice de busca atualizado: {contagem['total']} documentos ({contagem['novos']} novos, "
+              f"{contagem['alterados']} alterados, {contagem['removidos']} removidos) "
+              f"em {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    resultados = buscar(base, consulta, args.limit, FONTES_BUSCA.get(args.source))
+    ms = (time.perf_counter() - inicio) * 1000
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"Busca: '{consulta}' — {len(resultados)} resultados ({ms:.1f} ms)")
+    print("─" * 80)
+    for i, r in enumerate(resultados, 1):
+        rotulo = "P" if r["fonte"] == FONTES_BUSCA["problemas"] else "A"
+        print(f"  {i:>3d}. {r['pontuacao']:>7.2f} [{rotulo}] {r['titulo'][:62]}")
+        print(f"       {r['ref'] or ''}" + (f" | id {r['chave'][2:]}" if rotulo == "P" else ""))
+    if not resultados:
+        print("  Nenhum documento encontrado.")
+    return 0
+
+
+def cmd_seed_cache(args):
+    """Subcomando: semear o cache de avaliações com o histórico existente."""
+    base = os.path.abspath(args.dir)
+    print("=" * 80)
+    print("BARS JUDGE AGENT - Semear Cache de Avaliações")
+    print("=" * 80)
+
+    semear_cache(base, args.model)
+    return 0
+
+
+def cmd_backfill(args):
+    """Subcomando: completar critérios ausentes nas notas já gravadas."""
+    base = os.path.abspath(args.dir)
+    print("=" * 80)
+    print("BARS JUDGE AGENT - Backfill de Critérios Faltantes")
+    print("=" * 80)
+
+    client = None if args.dry_run else _setup_api_client(args)
+    completados = backfill_criterios(base, args.mode, args.model, client, args.concurrency, args.rpm,
+                                     args.tpm, args.batch, simular=args.dry_run)
+    if completados:
+        print("\nConsolidando banco geral...")
+        todos = consolidar_banco_geral(base)
+        if todos:
+            gerar_ranking_geral(todos, base)
+    return 0
+
+
 def cmd_rebuild(args):
     """Subcomando: reconstruir ranking geral."""
     base = os.path.abspath(args.dir)
@@ -1662,6 +5649,52 @@ def cmd_rebuild(args):
     return 0
 
 
+def cmd_rerank(args):
+    """Subcomando: simular o ranking geral com pesos alternativos."""
+    base = os.path.abspath(args.dir)
+    print("=" * 80)
+    print("BARS JUDGE AGENT - Reranking com Pesos Alternativos")
+    print("=" * 80)
+
+    if not os.path.exists(args.weights):
+        print(f"ERRO: Arquivo de pesos não encontrado: {args.weights}")
+        return 1
+    pesos = carregar_pesos(args.weights)
+    if pesos is None:
+        return 1
+    return 0 if rerank_com_pesos(base, pesos, args.output, args.top) else 1
+
+
+def cmd_query(args):
+    """Subcomando: consultar o banco geral SQLite (top-N por categoria, filtro por batch)."""
+    base = os.path.abspath(args.dir)
+    if not os.path.exists(os.path.join(base, BANCO_SQLITE)):
+        print(f"ERRO: {BANCO_SQLITE} não encontrado. Execute 'rebuild' com --store sqlite primeiro.")
+        return 1
+
+    try:
+        categoria = _categoria_por_nome(args.category)
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        return 1
+
+    registros = consultar_banco_sqlite(base, categoria, args.batch, args.min_pct, args.top)
+    if args.json:
+        print(json.dumps(registros, ensure_ascii=False, indent=2))
+        return 0
+
+    coluna = f"pct_{categoria}" if categoria else "pct_total"
+    rotulo = FRAMEWORK[categoria]["nome"] if categoria else "Total"
+    print(f"Top {args.top} por % {rotulo}" + (f" | batch {args.batch}" if args.batch else ""))
+    print("─" * 80)
+    for i, r in enumerate(registros, 1):
+        print(f"  {i:>3d}. {r[coluna]:>5.1f}% | total {r['pct_total']:>5.1f}% | "
+              f"{r['batch'][:22]:<22s} | {r['problema'][:50]}")
+    if not registros:
+        print("  Nenhum problema encontrado.")
+    return 0
+
+
 def cmd_status(args):
     """Subcomando: status dos batches e ranking."""
     base = os.path.abspath(args.dir)
@@ -1677,18 +5710,67 @@ def cmd_status(args):
 
     total_problemas = 0
     total_avaliados = 0
-
-    print(f"\n{'Batch':<35s} {'CSVs':>5s} {'Problemas':>10s} {'Avaliados':>10s} {'Status':>10s}")
-    print("─" * 75)
+    total_ignorados = 0
+    total_tokens_api = 0
+    total_custo = 0.0
+    total_n_api = 0
+
+    print(f"\n{'Batch':<35s} {'CSVs':>5s} {'Problemas':>10s} {'Avaliados':>10s} "
+          f"{'Tokens':>12s} {'US$':>9s} {'Status':>10s}")
+    print("─" * 97)
     for b in batches:
-        status = "OK" if b["avaliado"] and b["n_avaliados"] >= b["n_problemas"] else "PENDENTE"
+        resolvidos = b["n_avaliados"] + b["n_ignorados"]
+        status = "OK" if b["avaliado"] and resolvidos >= b["n_problemas"] else "PENDENTE"
+        if b["falhas"]:
+            status = "FALHAS"
+        tokens_batch = total_tokens(b["uso"])
         print(f"  {b['nome']:<33s} {b['n_csvs']:>5d} {b['n_problemas']:>10d} "
-              f"{b['n_avaliados']:>10d} {status:>10s}")
+              f"{b['n_avaliados']:>10d} {tokens_batch:>12,d} {b['uso']['custo_usd']:>9.4f} {status:>10s}")
         total_problemas += b["n_problemas"]
         total_avaliados += b["n_avaliados"]
-
-    print("─" * 75)
-    print(f"  {'TOTAL':<33s} {'':<5s} {total_problemas:>10d} {total_avaliados:>10d}")
+        total_ignorados += b["n_ignorados"]
+        total_tokens_api += tokens_batch
+        total_custo += b["uso"]["custo_usd"]
+        total_n_api += b["uso"]["n_api"]
+
+    print("─" * 97)
+    print(f"  {'TOTAL':<33s} {'':<5s} {total_problemas:>10d} {total_avaliados:>10d} "
+          f"{total_tokens_api:>12,d} {total_custo:>9.4f}")
+    if total_ignorados:
+        print(f"  ({total_ignorados} problemas pulados como quase-duplicatas; ver {QUASE_DUP_FILE} nos batches)")
+    for b in batches:
+        ativos = leases_ativos(b["caminho"])
+        if ativos:
+            workers = sorted({l["worker"] for l in ativos})
+            print(f"  {b['nome']}: {len(ativos)} shards em avaliação por {len(workers)} workers ({', '.join(workers)})")
+    com_falha = [(b["nome"], titulo, info) for b in batches for titulo, info in b["falhas"].items()]
+    if com_falha:
+        print(f"\n  {len(com_falha)} problemas com avaliação falha na fila de retry "
+              f"(fora do ranking até 'evaluate' conseguir avaliá-los):")
+        for nome, titulo, info in com_falha[:10]:
+            print(f"    {nome[:22]:<22s} | {titulo[:45]:<45s} | {info['tentativas']}x | {info['ultimo_erro'][:40]}")
+        if len(com_falha) > 10:
+            print(f"    ... e mais {len(com_falha) - 10} (ver {FILA_RETRY_FILE} nos batches)")
+    n_faltando = total_problemas - total_avaliados - total_ignorados
+    if total_n_api and n_faltando > 0:
+        print(f"  Estimativa para os {n_faltando} pendentes via API: US$ "
+              f"{total_custo / total_n_api * n_faltando:.2f} (média de US$ {total_custo / total_n_api:.4f} "
+              f"por avaliação paga)")
+
+    parse = carregar_estatisticas_parse(base)
+    if parse:
+        print("\nFalhas de parse das respostas da API, por modelo:")
+        for chave, c in sorted(parse.items()):
+            modelo, formato = chave.rsplit("|", 1)
+            taxa = c["falhas_parse"] / c["respostas"] if c["respostas"] else 0
+            print(f"  {modelo:<35s} {formato:<6s} {c['falhas_parse']:>6d} de {c['respostas']:>7d} respostas ({taxa:.1%})")
+
+    if usa_sqlite(base):
+        resumo = resumo_banco_sqlite(base)
+        media = resumo["media_pct"] or 0
+        print(f"\nBanco SQLite: {os.path.join(base, BANCO_SQLITE)} ({resumo['problemas']} problemas únicos, "
+              f"{resumo['avaliacoes']} avaliações, {resumo['batches']} batches consolidados, "
+              f"média {media:.1f}%)")
 
     # Verificar banco geral
     banco_path = os.path.join(base, BANCO_GERAL_CSV)
@@ -1712,6 +5794,23 @@ def main():
         help="Diretório base do projeto (default: diretório atual)"
     )
 
+    parser.add_argument(
+        "--store", type=str, default="auto", choices=list(STORES),
+        help="Backend do banco geral: json, sqlite ou auto (sqlite se banco_geral.sqlite3 existir)"
+    )
+    parser.add_argument(
+        "--profile", type=str, default=None, metavar="OUT.json",
+        help="Gravar perfil da execução (tempo por etapa, latência da API, retries, memória) em JSON"
+    )
+    parser.add_argument(
+        "--cprofile", type=str, default=None, metavar="OUT.prof",
+        help="Rodar sob cProfile e gravar as estatísticas (pstats); o top entra no --profile"
+    )
+    parser.add_argument(
+        "--tracemalloc", action="store_true",
+        help="Com --profile: rastrear alocações (pico e maiores linhas); deixa a execução mais lenta"
+    )
+
     subparsers = parser.add_subparsers(dest="comando", help="Comandos disponíveis")
 
     # --- add-batch ---
@@ -1719,6 +5818,8 @@ def main():
     p_add.add_argument("fonte", help="Arquivo CSV ou diretório com CSVs")
     p_add.add_argument("--name", type=str, default=None,
                        help="Sufixo do nome do batch (default: 'novos')")
+    p_add.add_argument("--near-dup-threshold", type=float, default=LIMIAR_QUASE_DUPLICATA,
+                       help=f"Similaridade mínima para sinalizar quase-duplicatas (default: {LIMIAR_QUASE_DUPLICATA})")
 
     # --- import-legacy ---
     p_legacy = subparsers.add_parser("import-legacy",
@@ -1732,14 +5833,134 @@ def main():
     p_eval.add_argument("--batch", type=str, default=None,
                         help="Nome do batch específico (default: todos pendentes)")
     p_eval.add_argument("--mode", type=str, default="heuristic",
-                        choices=["api", "heuristic"],
-                        help="Modo de avaliação (default: heuristic)")
+                        choices=["api", "bulk", "heuristic", "cascade"],
+                        help="Modo de avaliação (default: heuristic; bulk = job assíncrono em lote; "
+                             "cascade = triagem heurística e API só para os mais promissores)")
     p_eval.add_argument("--model", type=str, default="claude-sonnet-4-20250514",
                         help="Modelo Claude para modo API")
+    p_eval.add_argument("--api-top", type=float, default=10.0,
+                        help="Modo cascade: %% do batch (melhores pela heurística) avaliado pela API (default: 10)")
+    p_eval.add_argument("--calibration", type=float, default=2.0,
+                        help="Modo cascade: %% do restante sorteado para a API como calibração (default: 2)")
+    p_eval.add_argument("--concurrency", type=int, default=1,
+                        help="Avaliações simultâneas no modo API (default: 1)")
+    p_eval.add_argument("--rpm", type=int, default=50,
+                        help="Limite de requisições por minuto no modo API (default: 50)")
+    p_eval.add_argument("--tpm", type=int, default=80000,
+                        help="Limite de tokens por minuto no modo API (default: 80000)")
+    p_eval.add_argument("--pack", type=int, default=1,
+                        help="Modo API: problemas por requisição (1 = desligado, 0 = automático pelo limite de saída do modelo)")
+    p_eval.add_argument("--poll-interval", type=float, default=60.0,
+                        help="Intervalo de polling do job no modo bulk, em segundos (default: 60)")
+    p_eval.add_argument("--no-wait", action="store_true",
+                        help="Modo bulk: apenas submeter/verificar o job, sem aguardar o término")
+    p_eval.add_argument("--near-dup", type=str, default="off", choices=list(MODOS_QUASE_DUP),
+                        help="Quase-duplicatas de problemas anteriores: off, flag (só listar), "
+                             "skip (não avaliar) ou reuse (copiar as notas do similar)")
+    p_eval.add_argument("--near-dup-threshold", type=float, default=LIMIAR_QUASE_DUPLICATA,
+                        help=f"Similaridade mínima (MinHash) para quase-duplicata (default: {LIMIAR_QUASE_DUPLICATA})")
+    p_eval.add_argument("--no-structured", action="store_true",
+                        help="Pedir as notas como JSON em texto livre em vez de tool use com schema (modo antigo)")
+    p_eval.add_argument("--max-cost", type=float, default=None, metavar="US$",
+                        help="Teto de custo da execução em US$; ao atingir, para e deixa o restante pendente")
+    p_eval.add_argument("--max-tokens-total", type=int, default=None,
+                        help="Teto de tokens (entrada + saída + cache) da execução; ao atingir, para e deixa o restante pendente")
+    p_eval.add_argument("--worker", type=str, nargs="?", const="", default=None, metavar="ID",
+                        help="Avaliar em conjunto com outros processos via leases de shards "
+                             "(ID default: <host>-<pid>); --rpm/--tpm valem por worker")
+    p_eval.add_argument("--lease-ttl", type=float, default=LEASE_TTL_PADRAO,
+                        help=f"Modo --worker: validade do lease em segundos, renovado a cada 1/3 (default: {LEASE_TTL_PADRAO:.0f})")
+    p_eval.add_argument("--shard-size", type=int, default=TAMANHO_SHARD_PADRAO,
+                        help=f"Modo --worker: problemas por shard (default: {TAMANHO_SHARD_PADRAO})")
+    p_eval.add_argument("--base-url", type=str, default=None,
+                        help="URL base alternativa da API (ex: servidor local de testes)")
+
+    # --- watch ---
+    p_watch = subparsers.add_parser("watch",
+                                    help="Processo contínuo: avaliar CSVs novos em batches/ e atualizar o ranking geral")
+    p_watch.add_argument("--interval", type=float, default=INTERVALO_WATCH_PADRAO,
+                         help=f"Intervalo de polling de batches/, em segundos (default: {INTERVALO_WATCH_PADRAO:g})")
+    p_watch.add_argument("--mode", type=str, default="heuristic", choices=["api", "heuristic", "cascade"],
+                         help="Modo de avaliação dos problemas novos (default: heuristic)")
+    p_watch.add_argument("--model", type=str, default="claude-sonnet-4-20250514",
+                         help="Modelo Claude para modo API")
+    p_watch.add_argument("--api-top", type=float, default=10.0,
+                         help="Modo cascade: %% do batch avaliado pela API (default: 10)")
+    p_watch.add_argument("--calibration", type=float, default=2.0,
+                         help="Modo cascade: %% do restante sorteado para a API como calibração (default: 2)")
+    p_watch.add_argument("--concurrency", type=int, default=1, help="Avaliações simultâneas no modo API (default: 1)")
+    p_watch.add_argument("--rpm", type=int, default=50, help="Limite de requisições por minuto (default: 50)")
+    p_watch.add_argument("--tpm", type=int, default=80000, help="Limite de tokens por minuto (default: 80000)")
+    p_watch.add_argument("--pack", type=int, default=1,
+                         help="Modo API: problemas por requisição (1 = desligado, 0 = automático)")
+    p_watch.add_argument("--no-structured", action="store_true",
+                         help="Pedir as notas como JSON em texto livre em vez de tool use com schema")
+    p_watch.add_argument("--max-cost", type=float, default=None, metavar="US$",
+                         help="Teto de custo em US$ do processo inteiro; ao atingir, o watch termina")
+    p_watch.add_argument("--max-tokens-total", type=int, default=None,
+                         help="Teto de tokens do processo inteiro; ao atingir, o watch termina")
+    p_watch.add_argument("--base-url", type=str, default=None,
+                         help="URL base alternativa da API (ex: servidor local de testes)")
 
     # --- rebuild ---
     subparsers.add_parser("rebuild", help="Reconstruir ranking geral a partir dos batches")
 
+    # --- seed-cache ---
+    p_seed = subparsers.add_parser("seed-cache",
+                                   help="Semear cache de avaliações a partir do checkpoint e do banco geral")
+    p_seed.add_argument("--model", type=str, default=MODELO_HEURISTICO,
+                        help="Avaliador que produziu as notas existentes (default: heuristic)")
+
+    # --- backfill ---
+    p_back = subparsers.add_parser("backfill",
+                                   help="Completar critérios ausentes nas notas do banco, sem reavaliar problemas inteiros")
+    p_back.add_argument("--batch", type=str, default=None, help="Restringir a um batch (default: todos)")
+    p_back.add_argument("--mode", type=str, default="heuristic", choices=["api", "heuristic"],
+                        help="Quem preenche as lacunas (default: heuristic)")
+    p_back.add_argument("--model", type=str, default="claude-sonnet-4-20250514",
+                        help="Modelo Claude para modo API")
+    p_back.add_argument("--concurrency", type=int, default=1, help="Requisições simultâneas no modo API (default: 1)")
+    p_back.add_argument("--rpm", type=int, default=50, help="Limite de requisições por minuto (default: 50)")
+    p_back.add_argument("--tpm", type=int, default=80000, help="Limite de tokens por minuto (default: 80000)")
+    p_back.add_argument("--dry-run", action="store_true", help="Apenas listar os registros com lacunas")
+    p_back.add_argument("--base-url", type=str, default=None,
+                        help="URL base alternativa da API (ex: servidor local de testes)")
+
+    # --- rerank ---
+    p_rerank = subparsers.add_parser("rerank",
+                                     help="Simular o ranking geral com pesos alternativos (what-if)")
+    p_rerank.add_argument("--weights", type=str, required=True,
+                          help="JSON {criterio_id: peso} com os pesos a sobrescrever")
+    p_rerank.add_argument("--output", type=str, default=RERANK_CSV,
+                          help=f"CSV de saída com os deltas de ranking (default: {RERANK_CSV})")
+    p_rerank.add_argument("--top", type=int, default=20,
+                          help="Quantidade de problemas exibidos no topo (default: 20)")
+
+    # --- query ---
+    p_query = subparsers.add_parser("query", help="Consultar o banco geral SQLite sem carregá-lo inteiro")
+    p_query.add_argument("--top", type=int, default=20, help="Quantidade de problemas (default: 20)")
+    p_query.add_argument("--category", type=str, default="total",
+                         help="Categoria para ordenar (chave ou número, ex: 3_timing ou 3; default: total)")
+    p_query.add_argument("--batch", type=str, default=None, help="Filtrar por batch")
+    p_query.add_argument("--min-pct", type=float, default=None,
+                         help="Percentual mínimo na categoria escolhida")
+    p_query.add_argument("--json", action="store_true", help="Saída em JSON com os registros completos")
+
+    # --- serve ---
+    p_serve = subparsers.add_parser("serve", help="Servir o ranking geral por HTTP (JSON, somente leitura, com ETag)")
+    p_serve.add_argument("--host", type=str, default="127.0.0.1", help="Endereço de escuta (default: 127.0.0.1)")
+    p_serve.add_argument("--port", type=int, default=PORTA_SERVE_PADRAO,
+                         help=f"Porta (default: {PORTA_SERVE_PADRAO}; 0 = qualquer porta livre)")
+
+    # --- search ---
+    p_search = subparsers.add_parser("search", help="Busca textual (BM25) em problemas do banco e artigos/")
+    p_search.add_argument("consulta", nargs="+", help="Termos da busca (acentos e plurais são normalizados)")
+    p_search.add_argument("--limit", type=int, default=10, help="Quantidade de resultados (default: 10)")
+    p_search.add_argument("--source", type=str, default="all", choices=["all", *FONTES_BUSCA],
+                          help="Restringir a problemas ou artigos (default: all)")
+    p_search.add_argument("--rebuild", action="store_true", help="Refazer o índice de busca do zero")
+    p_search.add_argument("--json", action="store_true", help="Saída em JSON")
+
     # --- status ---
     subparsers.add_parser("status", help="Mostrar status dos batches e ranking")
 
@@ -1755,15 +5976,44 @@ def main():
         print("  python bars_judge_agent.py rebuild           # Reconstruir ranking")
         return 0
 
+    definir_store(args.store)
+
     cmd_map = {
         "add-batch": cmd_add_batch,
         "import-legacy": cmd_import_legacy,
         "evaluate": cmd_evaluate,
+        "watch": cmd_watch,
         "rebuild": cmd_rebuild,
+        "seed-cache": cmd_seed_cache,
+        "backfill": cmd_backfill,
+        "rerank": cmd_rerank,
+        "query": cmd_query,
+        "serve": cmd_serve,
+        "search": cmd_search,
         "status": cmd_status,
     }
 
-    return cmd_map[args.comando](args)
+    if args.profile:
+        PERFIL.iniciar(rastrear_memoria=args.tracemalloc)
+    perfil_cpu = None
+    if args.cprofile:
+        import cProfile  # profilers só carregam quando pedidos (startup enxuto)
+        perfil_cpu = cProfile.Profile()
+    if perfil_cpu:
+        perfil_cpu.enable()
+    try:
+        return cmd_map[args.comando](args)
+    finally:
+        if perfil_cpu:
+            perfil_cpu.disable()
+        if args.profile:
+            relatorio = PERFIL.relatorio(args.comando)
+            if perfil_cpu:
+                relatorio["cprofile"] = {"arquivo": args.cprofile, "top": _resumo_cprofile(perfil_cpu)}
+            _gravar_json_atomico(args.profile, relatorio, indent=2)
+            print(f"\nPerfil gravado em: {args.profile}")
+        if perfil_cpu:
+            perfil_cpu.dump_stats(args.cprofile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escala das etapas do bars_judge_agent
+==================================================
+
+Gera árvores de batches sintéticas (1k, 10k, 100k, 1M problemas) com texto em
+português montado a partir do vocabulário de KEYWORD_RULES e DOMAIN_PROFILES, e
+mede cada etapa do pipeline:
+
+    gerar_arvore           escrita dos CSVs sintéticos (reaproveitada se já existir)
+    carregar_csvs          carregar_problemas_de_diretorio em todos os batches
+    heuristica             avaliar_problema_heuristico
+    pontuacoes             calcular_pontuacoes
+    gravar_resultados      avaliacao_batch.json de cada batch
+    consolidar             consolidar_banco_geral (primeira consolidação, completa)
+    consolidar_inalterado  consolidar_banco_geral de novo, sem mudanças (caminho incremental)
+    gerar_csv              gerar_csv_final do banco inteiro
+    ranking_indice         atualizar_ranking_geral sem índice (ordena tudo e cria o índice)
+    ranking_incremental    atualizar_ranking_geral com 1 problema a mais (bisect + linhas em cache)
+
+Para cada etapa: tempo de parede, problemas/s e pico de RSS do processo ao fim da
+etapa. Cada tamanho roda num subprocesso próprio, para que o pico de RSS de um não
+contamine o do outro.
+
+Uso:
+    python benchmarks/bench_bars_judge.py                           # 1k, 10k e 100k
+    python benchmarks/bench_bars_judge.py --sizes 1000000 --workdir /data/bench
+    python benchmarks/bench_bars_judge.py --sizes 10000 --store sqlite --output bench.json
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bars_judge_agent as bja  # noqa: E402
+
+TAMANHOS_PADRAO = "1000,10000,100000"
+PROBLEMAS_POR_CSV = 1_000
+PROBLEMAS_POR_BATCH = 10_000
+ARVORE_OK = ".arvore_completa"
+
+# Palavras de ligação para o texto sintético soar como os CSVs reais
+CONECTIVOS = [
+    "de", "da", "do", "em", "para", "com", "sem", "sobre", "entre", "pela", "pelo",
+    "que", "e", "a", "o", "os", "as", "no", "na", "por", "mais", "menos",
+]
+TEMAS = [
+    "pequenas empresas", "hospitais públicos", "cooperativas agrícolas", "prefeituras",
+    "idosos", "motoristas de aplicativo", "escolas", "varejo regional", "indústria",
+    "logística urbana", "bancos digitais", "clínicas", "condomínios", "startups",
+]
+
+
+def vocabulario() -> list[str]:
+    """Todas as keywords (positivas, negativas e de domínio) da heurística."""
+    palavras = set()
+    for regras in bja.KEYWORD_RULES.values():
+        palavras.update(regras["positivo"])
+        palavras.update(regras["negativo"])
+    for perfil in bja.DOMAIN_PROFILES.values():
+        palavras.update(perfil["keywords"])
+    return sorted(palavras)
+
+
+class GeradorProblemas:
+    """Gera problemas sintéticos determinísticos (semente fixa)."""
+
+    def __init__(self, semente: int = 42):
+        self.rng = random.Random(semente)
+        self.vocab = vocabulario()
+
+    def _frase(self, n_palavras: int) -> str:
+        rng = self.rng
+        palavras = []
+        for _ in range(n_palavras):
+            palavras.append(rng.choice(self.vocab) if rng.random() < 0.45 else rng.choice(CONECTIVOS))
+        return " ".join(palavras)
+
+    def problema(self, i: int) -> dict:
+        rng = self.rng
+        titulo = f"{self._frase(rng.randint(4, 9)).capitalize()} em {rng.choice(TEMAS)} #{i}"
+        descricao = f"{self._frase(rng.randint(25, 50)).capitalize()}."
+        desenvolvimento = f"{self._frase(rng.randint(30, 70)).capitalize()}."
+        if rng.random() < 0.6:
+            desenvolvimento += f" Oportunidade: {self._frase(rng.randint(10, 25))}."
+        return {"Problema": titulo, "Descrição Geral": descricao, "Desenvolvimento": desenvolvimento}
+
+
+def gerar_arvore(base: str, n: int) -> list[str]:
+    """Cria base/batches/<data>_sintetico_NNNN/*.csv com n problemas. Retorna os nomes dos batches."""
+    bdir = os.path.join(base, bja.BATCHES_DIR)
+    gerador = GeradorProblemas()
+    batches = []
+    for b, inicio in enumerate(range(0, n, PROBLEMAS_POR_BATCH)):
+        nome = f"2026-01-01_sintetico_{b:04d}"
+        batch_dir = os.path.join(bdir, nome)
+        os.makedirs(batch_dir, exist_ok=True)
+        fim_batch = min(inicio + PROBLEMAS_POR_BATCH, n)
+        for c, ini_csv in enumerate(range(inicio, fim_batch, PROBLEMAS_POR_CSV)):
+            with open(os.path.join(batch_dir, f"problemas_{c:03d}.csv"), "w",
+                      encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["Problema", "Descrição Geral", "Desenvolvimento"],
+                                        quoting=csv.QUOTE_ALL)
+                writer.writeheader()
+                for i in range(ini_csv, min(ini_csv + PROBLEMAS_POR_CSV, fim_batch)):
+                    writer.writerow(gerador.problema(i))
+        batches.append(nome)
+    return batches
+
+
+def rss_pico_mb() -> float:
+    """Pico de RSS do processo até agora (ru_maxrss é KB no Linux e bytes no macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Cronometro:
+    """Mede etapas (tempo de parede, throughput, pico de RSS), silenciando os prints do agente."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.etapas = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome: str, n_itens: int = None):
+        n_itens = self.n if n_itens is None else n_itens
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            inicio = time.perf_counter()
+            yield
+            segundos = time.perf_counter() - inicio
+        self.etapas[nome] = {
+            "segundos": round(segundos, 3),
+            "problemas_por_segundo": round(n_itens / segundos, 1) if segundos > 0 else None,
+            "rss_pico_mb": rss_pico_mb(),
+        }
+        print(f"    {nome:<24s} {segundos:>9.3f}s  {self.etapas[nome]['problemas_por_segundo'] or 0:>12,.0f}/s"
+              f"  RSS {self.etapas[nome]['rss_pico_mb']:>8.1f} MB", file=sys.stderr)
+
+
+def executar_tamanho(base: str, n: int, store: str) -> dict:
+    """Roda todas as etapas para uma árvore de n problemas."""
+    bja.definir_store(store)
+    cron = Cronometro(n)
+    bdir = os.path.join(base, bja.BATCHES_DIR)
+
+    if os.path.exists(os.path.join(base, ARVORE_OK)):
+        batches = sorted(os.listdir(bdir))
+        cron.etapas["gerar_arvore"] = {"reaproveitada": True}
+    else:
+        shutil.rmtree(base, ignore_errors=True)
+        with cron.etapa("gerar_arvore"):
+            batches = gerar_arvore(base, n)
+        open(os.path.join(base, ARVORE_OK), "w").close()
+
+    # Estado derivado de execuções anteriores não pode mascarar as etapas
+    for nome in (bja.BANCO_GERAL_JSON, bja.BANCO_GERAL_CSV, bja.BANCO_MANIFEST_FILE, bja.BANCO_SQLITE,
+                 bja.RANKING_INDICE_FILE):
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(os.path.join(base, nome + sufixo)):
+                os.remove(os.path.join(base, nome + sufixo))
+    for nome in batches:
+        for arquivo in (bja.BATCH_EVAL_FILE, bja.BATCH_LOG_FILE, bja.BATCH_META_FILE):
+            if os.path.exists(os.path.join(bdir, nome, arquivo)):
+                os.remove(os.path.join(bdir, nome, arquivo))
+
+    with cron.etapa("carregar_csvs"):
+        por_batch = {nome: bja.carregar_problemas_de_diretorio(os.path.join(bdir, nome), nome)
+                     for nome in batches}
+
+    with cron.etapa("heuristica"):
+        notas = {nome: [bja.avaliar_problema_heuristico(p) for p in problemas]
+                 for nome, problemas in por_batch.items()}
+
+    with cron.etapa("pontuacoes"):
+        for lista in notas.values():
+            for notas_problema in lista:
+                bja.calcular_pontuacoes(notas_problema)
+
+    with cron.etapa("gravar_resultados"):
+        for nome, problemas in por_batch.items():
+            resultados = [bja._montar_resultado(p, nome, notas_problema)
+                          for p, notas_problema in zip(problemas, notas[nome])]
+            bja._gravar_json_atomico(os.path.join(bdir, nome, bja.BATCH_EVAL_FILE), resultados, indent=2)
+    del por_batch, notas
+
+    with cron.etapa("consolidar"):
+        todos = bja.consolidar_banco_geral(base)
+    del todos
+
+    with cron.etapa("consolidar_inalterado"):
+        todos = bja.consolidar_banco_geral(base)
+
+    with cron.etapa("gerar_csv", len(todos)):
+        bja.gerar_csv_final(todos, base, nome_arquivo=bja.BANCO_GERAL_CSV)
+
+    with cron.etapa("ranking_indice", len(todos)):
+        bja.atualizar_ranking_geral(todos, base)
+
+    # Um problema novo num batch próprio, como um add-batch pequeno
+    novo = dict(todos[0], problema=f"{todos[0]['problema']} (novo)", batch="9999-12-31_novo")
+    with cron.etapa("ranking_incremental", 1):
+        bja.atualizar_ranking_geral(todos + [novo], base)
+
+    return {"n_problemas": n, "n_batches": len(batches), "store": store, "etapas": cron.etapas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escala do bars_judge_agent")
+    parser.add_argument("--sizes", default=TAMANHOS_PADRAO,
+                        help=f"Tamanhos separados por vírgula (default: {TAMANHOS_PADRAO}; use 1000000 para 1M)")
+    parser.add_argument("--workdir", default=None,
+                        help="Onde criar as árvores sintéticas (default: diretório temporário, removido ao fim)")
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json",
+                        help="Backend do banco geral durante a consolidação (default: json)")
+    parser.add_argument("--output", default="bench_bars_judge.json",
+                        help="Arquivo JSON de resultados (default: bench_bars_judge.json)")
+    parser.add_argument("--_tamanho", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--_saida", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Subprocesso de um único tamanho
+    if args._tamanho is not None:
+        resultado = executar_tamanho(args.workdir, args._tamanho, args.store)
+        with open(args._saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f)
+        return 0
+
+    tamanhos = [int(t) for t in args.sizes.split(",") if t.strip()]
+    temporario = args.workdir is None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_bars_judge_")
+
+    resultados = {
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "numpy": bja.HAS_NUMPY,
+            "store": args.store,
+        },
+        "tamanhos": {},
+    }
+    try:
+        for n in tamanhos:
+            print(f"  {n:,} problemas", file=sys.stderr)
+            saida = os.path.join(workdir, f"resultado_{n}.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--_tamanho", str(n),
+                            "--_saida", saida, "--workdir", os.path.join(workdir, f"arvore_{n}"),
+                            "--store", args.store], check=True)
+            with open(saida, "r", encoding="utf-8") as f:
+                resultados["tamanhos"][str(n)] = json.load(f)
+    finally:
+        if temporario:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"Resultados: {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
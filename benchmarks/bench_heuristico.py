@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark da avaliação heurística (bars_judge_agent.avaliar_problema_heuristico)
+================================================================================
+
+Compara o matcher compilado (autômato Aho-Corasick, uma passada por problema)
+com a implementação de referência (uma busca de substring por keyword) e
+verifica que as notas são idênticas.
+
+Uso:
+    python benchmarks/bench_heuristico.py                 # 100k problemas
+    python benchmarks/bench_heuristico.py --n 10000 --amostra-referencia 2000
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bars_judge_agent as bja  # noqa: E402
+
+
+def avaliar_referencia(problema: dict) -> dict:
+    """Implementação original (uma varredura por keyword), usada como gabarito."""
+    texto = f"{problema['problema']} {problema['descricao']} {problema['desenvolvimento']}"
+    notas = {}
+    for criterio_id, rules in bja.KEYWORD_RULES.items():
+        pos_matches = bja._count_keyword_matches(texto, rules["positivo"])
+        neg_matches = bja._count_keyword_matches(texto, rules["negativo"])
+        ajuste = (pos_matches * 0.5) - (neg_matches * 0.7)
+        if ajuste > 0:
+            ajuste = min(ajuste, 2 + math.log1p(ajuste))
+        elif ajuste < 0:
+            ajuste = max(ajuste, -(2 + math.log1p(abs(ajuste))))
+        notas[criterio_id] = max(1, min(10, round(rules["base"] + ajuste)))
+
+    text_lower = texto.lower()
+    for domain, profile in bja.DOMAIN_PROFILES.items():
+        matches = sum(1 for kw in profile["keywords"] if kw.lower() in text_lower)
+        if matches >= 2:
+            for criterio_id, adj in profile.get("adjustments", {}).items():
+                if criterio_id in notas:
+                    notas[criterio_id] = max(1, min(10, notas[criterio_id] + adj))
+
+    if len(texto) > 500:
+        notas["observabilidade"] = min(10, notas.get("observabilidade", 5) + 1)
+        notas["clareza_persona"] = min(10, notas.get("clareza_persona", 5) + 1)
+    if "oportunidade:" in text_lower:
+        notas["janela"] = min(10, notas.get("janela", 5) + 1)
+        notas["diferenciacao_10x"] = min(10, notas.get("diferenciacao_10x", 5) + 1)
+    return notas
+
+
+def carregar_base(diretorio: str, n: int) -> list[dict]:
+    """Replica os problemas reais dos batches até chegar a N (variando o título)."""
+    originais = []
+    for batch_dir in sorted(os.listdir(os.path.join(diretorio, bja.BATCHES_DIR))):
+        caminho = os.path.join(diretorio, bja.BATCHES_DIR, batch_dir)
+        if os.path.isdir(caminho):
+            for arquivo in sorted(os.listdir(caminho)):
+                if arquivo.endswith(".csv"):
+                    originais.extend(bja.carregar_problemas_de_csv(os.path.join(caminho, arquivo)))
+    if not originais:
+        print("ERRO: nenhum problema encontrado em batches/")
+        sys.exit(1)
+
+    problemas = []
+    for i in range(n):
+        p = dict(originais[i % len(originais)])
+        p["problema"] = f"{p['problema']} #{i}"
+        problemas.append(p)
+    return problemas
+
+
+def medir(funcao, problemas: list[dict]) -> tuple[float, list[dict]]:
+    inicio = time.perf_counter()
+    notas = [funcao(p) for p in problemas]
+    return time.perf_counter() - inicio, notas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da avaliação heurística")
+    parser.add_argument("--dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Diretório base do projeto (com batches/)")
+    parser.add_argument("--n", type=int, default=100_000, help="Número de problemas (default: 100000)")
+    parser.add_argument("--amostra-referencia", type=int, default=5_000,
+                        help="Problemas avaliados também pela implementação de referência (default: 5000)")
+    parser.add_argument("--output", default=None, help="Salvar resultados em JSON")
+    args = parser.parse_args()
+
+    problemas = carregar_base(args.dir, args.n)
+    amostra = problemas[:min(args.amostra_referencia, len(problemas))]
+
+    t_compilado, notas_compiladas = medir(bja.avaliar_problema_heuristico, problemas)
+    t_ref, notas_ref = medir(avaliar_referencia, amostra)
+
+    identicas = all(a == b for a, b in zip(notas_compiladas, notas_ref))
+
+    resultado = {
+        "n_problemas": len(problemas),
+        "compilado_segundos": round(t_compilado, 3),
+        "compilado_problemas_por_segundo": round(len(problemas) / t_compilado, 1),
+        "referencia_amostra": len(amostra),
+        "referencia_segundos": round(t_ref, 3),
+        "referencia_problemas_por_segundo": round(len(amostra) / t_ref, 1) if t_ref else 0,
+        "notas_identicas": identicas,
+    }
+    resultado["speedup"] = round(resultado["compilado_problemas_por_segundo"]
+                                 / max(resultado["referencia_problemas_por_segundo"], 1e-9), 2)
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    return 0 if identicas else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
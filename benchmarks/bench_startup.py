@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Orçamento de startup do bars_judge_agent
+========================================
+
+Verificação de regressão do tempo de import (`python -X importtime`) e do
+startup dos subcomandos interativos. Falha (código de saída 1) se:
+
+    - o import de bars_judge_agent passar de --budget-ms (cumulativo, menor de N rodadas);
+    - algum módulo que deve ser carregado só sob demanda (SDK da Anthropic, numpy,
+      profilers) aparecer no import;
+    - `status`/`add-batch --help` num diretório vazio passarem de --budget-cli-ms.
+
+O bytecode é gerado numa rodada de aquecimento, para medir o caso de uso
+normal e não a compilação do .py.
+
+Os mesmos limites rodam como teste em tests/test_startup.py (`python -m pytest -q tests/`).
+
+Uso:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget-ms 120 --rodadas 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULO = "bars_judge_agent"
+
+ORCAMENTO_IMPORT_MS = 150
+ORCAMENTO_CLI_MS = 600
+
+# Carregados só quando um comando precisa deles
+MODULOS_SOB_DEMANDA = ("anthropic", "httpx", "pydantic", "numpy", "cProfile", "pstats", "tracemalloc")
+
+COMANDOS_INTERATIVOS = [
+    ["status"],
+    ["add-batch", "--help"],
+    ["query", "--help"],
+]
+
+
+def _ambiente() -> dict:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def medir_import() -> tuple:
+    """Uma rodada de `-X importtime`: (cumulativo do módulo em ms, {módulo: próprio em ms})."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULO}"],
+                          cwd=RAIZ, env=_ambiente(), capture_output=True, text=True, check=True)
+    proprios, total = {}, None
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, nome = linha[len("import time:"):].split("|")
+        nome = nome.strip()
+        proprios[nome] = int(proprio) / 1000
+        if nome == MODULO:
+            total = int(cumulativo) / 1000
+    return total, proprios
+
+
+def medir_cli(argv: list[str], diretorio: str) -> float:
+    """Tempo de parede (ms) de `python bars_judge_agent.py --dir <vazio> <argv>`."""
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(RAIZ, f"{MODULO}.py"), "--dir", diretorio, *argv],
+                   env=_ambiente(), capture_output=True, check=True)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de startup do bars_judge_agent")
+    parser.add_argument("--budget-ms", type=float, default=ORCAMENTO_IMPORT_MS,
+                        help=f"Teto do import cumulativo em ms (default: {ORCAMENTO_IMPORT_MS})")
+    parser.add_argument("--budget-cli-ms", type=float, default=ORCAMENTO_CLI_MS,
+                        help=f"Teto de cada subcomando interativo em ms (default: {ORCAMENTO_CLI_MS})")
+    parser.add_argument("--rodadas", type=int, default=5, help="Rodadas por medição; vale a menor (default: 5)")
+    parser.add_argument("--output", default=None, help="Gravar as medições em JSON")
+    args = parser.parse_args()
+
+    medir_import()  # aquecimento: grava o .pyc
+    rodadas = [medir_import() for _ in range(args.rodadas)]
+    total_ms, proprios = min(rodadas, key=lambda r: r[0])
+    carregados = sorted(m for m in proprios if m.split(".")[0] in MODULOS_SOB_DEMANDA)
+
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as vazio:
+        cli = {" ".join(argv): round(min(medir_cli(argv, vazio) for _ in range(args.rodadas)), 1)
+               for argv in COMANDOS_INTERATIVOS}
+
+    print(f"  import {MODULO:<28s} {total_ms:>8.1f} ms  (orçamento {args.budget_ms:g} ms)")
+    for nome, proprio in sorted(proprios.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"    {nome:<34s} {proprio:>8.1f} ms")
+    for comando, ms in cli.items():
+        print(f"  {comando:<35s} {ms:>8.1f} ms  (orçamento {args.budget_cli_ms:g} ms)")
+
+    falhas = []
+    if total_ms > args.budget_ms:
+        falhas.append(f"import levou {total_ms:.1f} ms (> {args.budget_ms:g} ms)")
+    if carregados:
+        falhas.append(f"módulos sob demanda carregados no import: {', '.join(carregados)}")
+    falhas += [f"'{comando}' levou {ms:.1f} ms (> {args.budget_cli_ms:g} ms)"
+               for comando, ms in cli.items() if ms > args.budget_cli_ms]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"import_ms": total_ms, "cli_ms": cli, "sob_demanda_carregados": carregados,
+                       "falhas": falhas}, f, indent=2, ensure_ascii=False)
+
+    for falha in falhas:
+        print(f"FALHA: {falha}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# Os testes importam bars_judge_agent da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RelogioFalso:
+    """time.monotonic/time.sleep determinísticos: sleep só avança o relógio."""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.dormido = 0.0
+
+    def monotonic(self) -> float:
+        return self.agora
+
+    def sleep(self, segundos: float):
+        self.agora += segundos
+        self.dormido += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    import bars_judge_agent as agente
+
+    r = RelogioFalso()
+    monkeypatch.setattr(agente.time, "monotonic", r.monotonic)
+    monkeypatch.setattr(agente.time, "sleep", r.sleep)
+    return r
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Servidor local que simula a API da Anthropic
+============================================
+
+Implementa só o necessário para exercitar o bars_judge_agent sem rede nem chave:
+
+    POST /v1/messages                          resposta com as notas (tool_use ou texto)
+    POST /v1/messages/batches                  cria um job bulk
+    GET  /v1/messages/batches/<id>             status do job ("ended" após N consultas)
+    GET  /v1/messages/batches/<id>/results     resultados em JSONL
+
+As notas são determinísticas (derivadas do prompt). Os custom_ids listados em
+`falhar` voltam como "errored" no resultado do job.
+
+Uso manual:
+    python tests/servidor_api_local.py --port 8766
+    ANTHROPIC_API_KEY=x python bars_judge_agent.py evaluate --mode bulk \\
+        --base-url http://127.0.0.1:8766 --poll-interval 0.1
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bars_judge_agent as agente  # noqa: E402
+
+IDS_CRITERIOS = [c["id"] for cat in agente.FRAMEWORK.values() for c in cat["criterios"]]
+USO = {"input_tokens": 100, "output_tokens": 400,
+       "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+
+
+def notas_do_prompt(params: dict) -> dict:
+    """Notas 1-10 estáveis para o mesmo prompt."""
+    semente = hashlib.sha256(json.dumps(params["messages"], sort_keys=True).encode()).digest()
+    return {cid: semente[i % len(semente)] % 10 + 1 for i, cid in enumerate(IDS_CRITERIOS)}
+
+
+def mensagem(params: dict) -> dict:
+    if params.get("tools"):
+        conteudo = [{"type": "tool_use", "id": "toolu_local", "name": params["tools"][0]["name"],
+                     "input": notas_do_prompt(params)}]
+    else:
+        conteudo = [{"type": "text", "text": json.dumps(notas_do_prompt(params))}]
+    return {"id": "msg_local", "type": "message", "role": "assistant", "model": params["model"],
+            "content": conteudo, "stop_reason": "end_turn", "stop_sequence": None, "usage": USO}
+
+
+class ServidorAPILocal(ThreadingHTTPServer):
+    """ThreadingHTTPServer com o estado dos jobs; porta 0 escolhe uma porta livre."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", porta: int = 0, consultas_ate_fim: int = 2,
+                 falhar: tuple = ()):
+        super().__init__((host, porta), _Handler)
+        self.consultas_ate_fim = consultas_ate_fim
+        self.falhar = set(falhar)
+        self.jobs = {}
+        self._contador = itertools.count(1)
+
+    @property
+    def url(self) -> str:
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def em_segundo_plano(self) -> threading.Thread:
+        t = threading.Thread(target=self.serve_forever, daemon=True)
+        t.start()
+        return t
+
+    def _job(self, job: dict) -> dict:
+        fim = job["consultas"] >= self.consultas_ate_fim
+        n = len(job["requisicoes"])
+        erros = sum(1 for r in job["requisicoes"] if r["custom_id"] in self.falhar)
+        return {
+            "id": job["id"], "type": "message_batch",
+            "processing_status": "ended" if fim else "in_progress",
+            "request_counts": {"processing": 0 if fim else n, "succeeded": n - erros if fim else 0,
+                               "errored": erros if fim else 0, "canceled": 0, "expired": 0},
+            "created_at": "2026-01-01T00:00:00Z", "expires_at": "2026-01-02T00:00:00Z",
+            "ended_at": "2026-01-01T01:00:00Z" if fim else None,
+            "cancel_initiated_at": None, "archived_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{job['id']}/results" if fim else None,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _enviar(self, status: int, corpo, tipo: str = "application/json"):
+        dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        caminho = self.path.split("?")[0].rstrip("/")
+        if caminho == "/v1/messages/batches":
+            job_id = f"msgbatch_{next(self.server._contador):04d}"
+            job = {"id": job_id, "requisicoes": corpo["requests"], "consultas": 0}
+            self.server.jobs[job_id] = job
+            return self._enviar(200, self.server._job(job))
+        if caminho == "/v1/messages":
+            return self._enviar(200, mensagem(corpo))
+        self._enviar(404, {"type": "error", "error": {"type": "not_found_error", "message": caminho}})
+
+    def do_GET(self):
+        partes = self.path.split("?")[0].strip("/").split("/")
+        job = self.server.jobs.get(partes[3]) if len(partes) >= 4 else None
+        if job is None:
+            return self._enviar(404, {"type": "error", "error": {"type": "not_found_error",
+                                                                  "message": self.path}})
+        if len(partes) == 5 and partes[4] == "results":
+            linhas = []
+            for req in job["requisicoes"]:
+                if req["custom_id"] in self.server.falhar:
+                    resultado = {"type": "errored", "error": {"type": "error", "error": {
+                        "type": "api_error", "message": "falha simulada"}}}
+                else:
+                    resultado = {"type": "succeeded", "message": mensagem(req["params"])}
+                linhas.append(json.dumps({"custom_id": req["custom_id"], "result": resultado}))
+            return self._enviar(200, ("\n".join(linhas) + "\n").encode("utf-8"), "application/binary")
+        job["consultas"] += 1
+        self._enviar(200, self.server._job(job))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que simula a API da Anthropic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--polls", type=int, default=2,
+                        help="Consultas de status até o job terminar (default: 2)")
+    parser.add_argument("--fail", nargs="*", default=(), help="custom_ids que voltam com erro")
+    args = parser.parse_args()
+    servidor = ServidorAPILocal(args.host, args.port, args.polls, args.fail)
+    print(f"API local em {servidor.url} (Ctrl+C para sair)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
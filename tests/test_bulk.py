@@ -0,0 +1,75 @@
+"""Ciclo submeter -> consultar -> coletar do modo bulk contra o servidor local da API."""
+
+import os
+
+import pytest
+
+import bars_judge_agent as agente
+from servidor_api_local import IDS_CRITERIOS, ServidorAPILocal
+
+pytestmark = pytest.mark.skipif(not agente.HAS_ANTHROPIC, reason="SDK da Anthropic não instalado")
+
+
+def _problema(titulo: str) -> dict:
+    return {"problema": titulo, "descricao": f"Descrição de {titulo}",
+            "desenvolvimento": f"Desenvolvimento de {titulo}", "batch": "b"}
+
+
+@pytest.fixture
+def servidor():
+    s = ServidorAPILocal(falhar={"p00001"})
+    s.em_segundo_plano()
+    yield s
+    s.shutdown()
+    s.server_close()
+
+
+@pytest.fixture
+def cliente(servidor):
+    return agente.anthropic.Anthropic(api_key="teste", base_url=servidor.url, max_retries=0)
+
+
+def test_ciclo_completo(tmp_path, servidor, cliente):
+    pendentes = [_problema(t) for t in ("A", "B", "C")]
+
+    notas = agente.avaliar_pendentes_bulk(cliente, str(tmp_path), pendentes, "modelo", intervalo=0)
+
+    assert set(notas) == {"A", "B", "C"}
+    assert notas["B"][0] is None and notas["B"][1]["erro"] == "bulk: errored"
+    for titulo in ("A", "C"):
+        valores, uso = notas[titulo]
+        assert set(valores) == set(IDS_CRITERIOS)
+        assert all(1 <= v <= 10 for v in valores.values())
+        assert uso["input_tokens"] == 100
+    assert len(servidor.jobs) == 1
+    assert not os.listdir(tmp_path)  # bulk_job.json e bulk_requisicoes.jsonl removidos
+
+
+def test_sem_aguardar_retoma_na_execucao_seguinte(tmp_path, servidor, cliente):
+    pendentes = [_problema("A")]
+
+    assert agente.avaliar_pendentes_bulk(cliente, str(tmp_path), pendentes, "modelo",
+                                         intervalo=0, aguardar=False) is None
+    assert (tmp_path / agente.BULK_JOB_FILE).exists()
+
+    notas = agente.avaliar_pendentes_bulk(cliente, str(tmp_path), pendentes, "modelo",
+                                          intervalo=0, aguardar=False)
+    assert set(notas) == {"A"}
+    assert len(servidor.jobs) == 1
+    assert not (tmp_path / agente.BULK_JOB_FILE).exists()
+
+
+def test_retomada_compara_pendentes_com_o_job(tmp_path, servidor, cliente):
+    servidor.falhar = set()
+    agente.avaliar_pendentes_bulk(cliente, str(tmp_path), [_problema("A"), _problema("B")], "modelo",
+                                  intervalo=0, aguardar=False)
+
+    # "A" foi avaliado por outro caminho; "C" entrou no batch depois da submissão
+    notas = agente.avaliar_pendentes_bulk(cliente, str(tmp_path), [_problema("B"), _problema("C")],
+                                          "modelo", intervalo=0)
+
+    assert set(notas) == {"B", "C"}
+    assert len(servidor.jobs) == 2
+    segundo = servidor.jobs["msgbatch_0002"]["requisicoes"]
+    assert len(segundo) == 1 and "Descrição de C" in segundo[0]["params"]["messages"][0]["content"]
+    assert not (tmp_path / agente.BULK_JOB_FILE).exists()
@@ -0,0 +1,102 @@
+"""Busca textual BM25: normalização, pontuação e atualização incremental do índice."""
+
+import math
+import os
+
+import pytest
+
+import bars_judge_agent as agente
+
+PROBLEMAS = [
+    ("Escassez hídrica na agricultura", "Secas reduzem a produção agrícola", "Irrigação ineficiente"),
+    ("Regulação de inteligência artificial", "Leis de IA fragmentadas", "Empresas sem conformidade"),
+    ("Saúde mental de trabalhadores", "Burnout crescente", "Falta de apoio psicológico"),
+    ("Água potável em cidades", "Perdas na distribuição de água", "Redes antigas e vazamentos"),
+]
+ARTIGOS = {
+    "01_agua.md": "# Crise da água\n\nA escassez de água afeta cidades e a agricultura irrigada.",
+    "02_ia.md": "# Estado regulador\n\nRegulações de inteligência artificial avançam devagar.",
+}
+
+
+def _gravar_banco(base, problemas):
+    registros = [{"problema": t, "descricao": d, "desenvolvimento": v, "batch": "b1",
+                  "arquivo_fonte": "f.csv", "total_geral": 100} for t, d, v in problemas]
+    agente._gravar_json_atomico(os.path.join(base, agente.BANCO_GERAL_JSON), registros, indent=2)
+
+
+@pytest.fixture
+def base(tmp_path):
+    _gravar_banco(tmp_path, PROBLEMAS)
+    (tmp_path / agente.ARTIGOS_DIR).mkdir()
+    for nome, texto in ARTIGOS.items():
+        (tmp_path / agente.ARTIGOS_DIR / nome).write_text(texto, encoding="utf-8")
+    agente.atualizar_indice_busca(str(tmp_path))
+    return tmp_path
+
+
+def test_tokens_ignoram_acentos_plurais_e_stopwords():
+    assert agente.tokens_busca("As Regulações") == agente.tokens_busca("regulacao")
+    assert agente.tokens_busca("rápida") == agente.tokens_busca("rapidas")
+    assert agente.tokens_busca("de para com") == []
+
+
+def _bm25_referencia(documentos: dict, consulta: str) -> dict:
+    """BM25 direto sobre {chave: termos}, para comparar com o índice."""
+    media = sum(map(len, documentos.values())) / len(documentos)
+    pontuacoes = {}
+    for termo in dict.fromkeys(agente.tokens_busca(consulta)):
+        df = sum(1 for termos in documentos.values() if termo in termos)
+        idf = math.log(1 + (len(documentos) - df + 0.5) / (df + 0.5))
+        for chave, termos in documentos.items():
+            tf = termos.count(termo)
+            if tf:
+                pontuacoes[chave] = pontuacoes.get(chave, 0.0) + idf * tf * (agente.BM25_K1 + 1) / (
+                    tf + agente.BM25_K1 * (1 - agente.BM25_B + agente.BM25_B * len(termos) / media))
+    return pontuacoes
+
+
+def test_pontuacao_igual_ao_bm25_de_referencia(base):
+    documentos = {f"p:{agente.id_problema(t)}": agente.tokens_busca(t) * 2 + agente.tokens_busca(f"{d}\n{v}")
+                  for t, d, v in PROBLEMAS}
+    for nome, texto in ARTIGOS.items():
+        documentos[f"a:{nome}"] = (agente.tokens_busca(agente._titulo_artigo(texto, nome)) * 2
+                                   + agente.tokens_busca(texto))
+    consulta = "escassez de água na agricultura"
+
+    resultados = agente.buscar(str(base), consulta, limite=10)
+    esperado = _bm25_referencia(documentos, consulta)
+
+    assert {r["chave"]: r["pontuacao"] for r in resultados} == {
+        chave: round(p, 4) for chave, p in esperado.items()}
+    assert [r["pontuacao"] for r in resultados] == sorted((r["pontuacao"] for r in resultados), reverse=True)
+    assert resultados[0]["titulo"] in ("Escassez hídrica na agricultura", "Crise da água")
+
+
+def test_filtro_por_fonte(base):
+    artigos = agente.buscar(str(base), "inteligência artificial", fonte="artigo")
+    assert [r["ref"] for r in artigos] == [os.path.join(agente.ARTIGOS_DIR, "02_ia.md")]
+    problemas = agente.buscar(str(base), "inteligência artificial", fonte="problema")
+    assert [r["titulo"] for r in problemas] == ["Regulação de inteligência artificial"]
+
+
+def test_consulta_sem_termos_uteis(base):
+    assert agente.buscar(str(base), "de para com") == []
+    assert agente.buscar(str(base), "inexistenteabsoluto") == []
+
+
+def test_atualizacao_incremental(base):
+    assert agente.atualizar_indice_busca(str(base)) == {"novos": 0, "alterados": 0, "removidos": 0,
+                                                         "total": len(PROBLEMAS) + len(ARTIGOS)}
+
+    (base / agente.ARTIGOS_DIR / "01_agua.md").write_text("# Crise da água\n\nTexto revisado e maior.",
+                                                          encoding="utf-8")
+    (base / agente.ARTIGOS_DIR / "02_ia.md").unlink()
+    alterados = [PROBLEMAS[0], PROBLEMAS[1], PROBLEMAS[2], ("Energia solar", "Painéis caros", "Subsídios")]
+    _gravar_banco(base, alterados)
+
+    contagem = agente.atualizar_indice_busca(str(base))
+
+    assert contagem == {"novos": 1, "alterados": 1, "removidos": 2, "total": 5}
+    assert [r["titulo"] for r in agente.buscar(str(base), "painéis solares")] == ["Energia solar"]
+    assert agente.buscar(str(base), "regulações", fonte="artigo") == []
@@ -0,0 +1,37 @@
+"""Chave do cache de avaliações: a heurística invalida quando as tabelas mudam."""
+
+import copy
+
+import pytest
+
+import bars_judge_agent as agente
+
+PROBLEMA = {"problema": "Filas no SUS", "descricao": "Espera longa", "desenvolvimento": ""}
+
+
+@pytest.fixture
+def tabelas_isoladas(monkeypatch):
+    monkeypatch.setattr(agente, "KEYWORD_RULES", copy.deepcopy(agente.KEYWORD_RULES))
+    agente.fingerprint_heuristica.cache_clear()
+    yield agente.KEYWORD_RULES
+    agente.fingerprint_heuristica.cache_clear()
+
+
+def test_chave_heuristica_muda_com_keyword_rules(tabelas_isoladas):
+    antes = agente.chave_cache(PROBLEMA, agente.MODELO_HEURISTICO)
+    api_antes = agente.chave_cache(PROBLEMA, "claude-sonnet-4-5")
+
+    tabelas_isoladas["dor_financeira"]["positivo"].append("fila")
+    agente.fingerprint_heuristica.cache_clear()
+
+    assert agente.chave_cache(PROBLEMA, agente.MODELO_HEURISTICO) != antes
+    assert agente.chave_cache(PROBLEMA, "claude-sonnet-4-5") == api_antes
+
+
+def test_chave_heuristica_muda_com_versao(monkeypatch, tabelas_isoladas):
+    antes = agente.chave_cache(PROBLEMA, agente.MODELO_HEURISTICO)
+
+    monkeypatch.setattr(agente, "VERSAO_HEURISTICA", agente.VERSAO_HEURISTICA + "-nova")
+    agente.fingerprint_heuristica.cache_clear()
+
+    assert agente.chave_cache(PROBLEMA, agente.MODELO_HEURISTICO) != antes
@@ -0,0 +1,21 @@
+"""Opções da cascata: porcentagens fora de 0-100 são recusadas antes de avaliar qualquer batch."""
+
+import pytest
+
+import bars_judge_agent as agente
+
+
+@pytest.mark.parametrize("comando", ["evaluate", "watch"])
+@pytest.mark.parametrize("opcao,valor", [("--calibration", "150"), ("--api-top", "-5"),
+                                         ("--api-top", "nan")])
+def test_porcentagem_fora_da_faixa_e_recusada(tmp_path, monkeypatch, capsys, comando, opcao, valor):
+    monkeypatch.setattr("sys.argv", ["bars_judge_agent.py", "--dir", str(tmp_path), comando,
+                                     "--mode", "heuristic", f"{opcao}={valor}"])
+
+    assert agente.main() == 1
+    assert f"ERRO: {opcao} deve estar entre 0 e 100" in capsys.readouterr().out
+
+
+def test_limites_sao_aceitos(tmp_path, monkeypatch):
+    args = type("Args", (), {"api_top": 100.0, "calibration": 0.0})()
+    assert agente._percentuais_cascata_validos(args)
@@ -0,0 +1,73 @@
+"""Circuit breaker compartilhado e backoff com Retry-After."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import bars_judge_agent as agente
+
+
+def _erro(status=None, headers=None):
+    return SimpleNamespace(status_code=status, response=SimpleNamespace(headers=headers or {}))
+
+
+def test_abre_apos_o_limiar_e_pausa_todos(relogio):
+    disjuntor = agente.DisjuntorAPI(limiar=3, pausa=10.0)
+    for _ in range(2):
+        disjuntor.registrar_falha()
+    disjuntor.aguardar()
+    assert relogio.dormido == 0
+
+    disjuntor.registrar_falha()
+    disjuntor.aguardar()
+
+    assert disjuntor.aberturas == 1
+    assert relogio.dormido == pytest.approx(10.0)
+
+
+def test_reaberturas_dobram_a_pausa_ate_o_teto(relogio):
+    disjuntor = agente.DisjuntorAPI(limiar=1, pausa=10.0, pausa_maxima=25.0)
+    pausas = []
+    for _ in range(3):
+        antes = relogio.dormido
+        disjuntor.registrar_falha()
+        disjuntor.aguardar()
+        pausas.append(relogio.dormido - antes)
+    assert pausas == [10.0, 20.0, 25.0]
+
+
+def test_sucesso_zera_contagem_e_pausa(relogio):
+    disjuntor = agente.DisjuntorAPI(limiar=2, pausa=10.0)
+    disjuntor.registrar_falha()
+    disjuntor.registrar_sucesso()
+    disjuntor.registrar_falha()
+    disjuntor.aguardar()
+    assert disjuntor.aberturas == 0 and relogio.dormido == 0
+
+
+def test_retry_after_maior_que_a_pausa_prevalece(relogio):
+    disjuntor = agente.DisjuntorAPI(limiar=1, pausa=10.0)
+    disjuntor.registrar_falha(espera_sugerida=45.0)
+    disjuntor.aguardar()
+    assert relogio.dormido == pytest.approx(45.0)
+
+
+def test_espera_backoff_usa_retry_after():
+    assert 2.5 <= agente.espera_backoff(0, _erro(429, {"retry-after-ms": "2500"}), base=1.0) <= 3.5
+    assert 7.0 <= agente.espera_backoff(0, _erro(429, {"retry-after": "7"}), base=1.0) <= 8.0
+    teto = agente.BACKOFF_TETO
+    assert agente.espera_backoff(0, _erro(429, {"retry-after": "99999"}), base=1.0) <= teto + 1.0
+
+
+@pytest.mark.parametrize("tentativa", [0, 3, 20])
+def test_espera_backoff_exponencial_com_jitter(tentativa):
+    teto = min(agente.BACKOFF_TETO, 2.0 * 2 ** tentativa)
+    for _ in range(50):
+        assert teto / 2 <= agente.espera_backoff(tentativa, _erro(500), base=2.0) <= teto
+
+
+def test_erro_sobrecarga_por_status():
+    assert agente._erro_sobrecarga(_erro(529))
+    assert agente._erro_sobrecarga(_erro(500))
+    assert not agente._erro_sobrecarga(_erro(400))
+    assert not agente._erro_sobrecarga(_erro(None))
@@ -0,0 +1,90 @@
+"""Leases de shard do modo --worker: exclusão, expiração, retomada e renovação."""
+
+import json
+import time
+
+import bars_judge_agent as agente
+
+
+def _lease(tmp_path, worker, ttl=60.0):
+    return agente.LeaseShard(str(tmp_path), "shard_0000", worker, ttl)
+
+
+def _expirar(lease):
+    """Simula um worker travado: o prazo do lease passou sem renovação."""
+    with open(lease.path, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    with open(lease.path, "w", encoding="utf-8") as f:
+        json.dump({**dados, "expira_em": time.time() - 1}, f)
+
+
+def test_adquirir_e_exclusivo(tmp_path):
+    a, b = _lease(tmp_path, "a"), _lease(tmp_path, "b")
+    assert a.adquirir()
+    assert not b.adquirir()
+    assert agente.ler_lease(a.path)["worker"] == "a"
+
+
+def test_lease_expirado_e_retomado(tmp_path):
+    a, b = _lease(tmp_path, "a"), _lease(tmp_path, "b")
+    assert a.adquirir()
+    _expirar(a)
+    assert b.adquirir()
+    assert b.retomado
+    assert agente.ler_lease(b.path)["worker"] == "b"
+
+
+def test_lease_ilegivel_vale_um_ttl_pelo_mtime(tmp_path):
+    a, b = _lease(tmp_path, "a"), _lease(tmp_path, "b")
+    assert a.adquirir()
+    with open(a.path, "w", encoding="utf-8") as f:
+        f.write('{"worker": "a", "expi')  # escrita pela metade
+    assert not b.adquirir()
+
+
+def test_renovar_estende_o_prazo(tmp_path):
+    a = _lease(tmp_path, "a", ttl=60.0)
+    assert a.adquirir()
+    antes = agente.ler_lease(a.path)["expira_em"]
+    time.sleep(0.01)
+    assert a.renovar()
+    assert agente.ler_lease(a.path)["expira_em"] > antes
+    assert not a.perdido.is_set()
+
+
+def test_renovar_apos_retomada_nao_sobrescreve_o_novo_dono(tmp_path):
+    a, b = _lease(tmp_path, "a"), _lease(tmp_path, "b")
+    assert a.adquirir()
+    _expirar(a)
+    assert b.adquirir()
+
+    assert not a.renovar()
+    assert a.perdido.is_set()
+    assert agente.ler_lease(b.path)["worker"] == "b"
+    assert b.renovar()
+
+
+def test_mesmo_nome_de_worker_em_outro_processo_nao_e_dono(tmp_path):
+    a = _lease(tmp_path, "w1")
+    assert a.adquirir()
+    with open(a.path, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    with open(a.path, "w", encoding="utf-8") as f:
+        json.dump({**dados, "pid": dados["pid"] + 1}, f)
+
+    assert not a.renovar()
+    a.liberar()
+    assert (tmp_path / "shard_0000.lease").exists()
+
+
+def test_liberar_so_remove_o_proprio_lease(tmp_path):
+    a, b = _lease(tmp_path, "a"), _lease(tmp_path, "b")
+    assert a.adquirir()
+    _expirar(a)
+    assert b.adquirir()
+
+    a.liberar()
+    assert agente.ler_lease(b.path)["worker"] == "b"
+    b.concluir()
+    assert not (tmp_path / "shard_0000.lease").exists()
+    assert (tmp_path / "shard_0000.ok").read_text() == "b"
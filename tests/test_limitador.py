@@ -0,0 +1,47 @@
+"""Token bucket de requisições/minuto e tokens/minuto da avaliação concorrente."""
+
+import pytest
+
+import bars_judge_agent as agente
+
+
+def test_rajada_inicial_ate_o_rpm_nao_espera(relogio):
+    limitador = agente.LimitadorTokenBucket(rpm=10, tpm=100_000)
+    for _ in range(10):
+        limitador.adquirir(100)
+    assert relogio.dormido == 0
+
+
+def test_acima_do_rpm_espera_a_reposicao(relogio):
+    limitador = agente.LimitadorTokenBucket(rpm=10, tpm=100_000)
+    for _ in range(10):
+        limitador.adquirir(100)
+
+    limitador.adquirir(100)
+
+    assert relogio.dormido == pytest.approx(6.0, abs=0.05)  # 60 s / 10 rpm
+
+
+def test_tpm_limita_requisicoes_grandes(relogio):
+    limitador = agente.LimitadorTokenBucket(rpm=1000, tpm=6000)
+    limitador.adquirir(6000)
+
+    limitador.adquirir(3000)
+
+    assert relogio.dormido == pytest.approx(30.0, abs=0.05)  # metade do balde: meio minuto
+
+
+def test_requisicao_maior_que_o_balde_nao_trava(relogio):
+    limitador = agente.LimitadorTokenBucket(rpm=100, tpm=1000)
+    limitador.adquirir(50_000)
+    assert relogio.dormido == 0
+
+
+def test_ajustar_devolve_tokens_nao_usados(relogio):
+    limitador = agente.LimitadorTokenBucket(rpm=1000, tpm=6000)
+    limitador.adquirir(6000)
+    limitador.ajustar(estimado=6000, real=1000)
+
+    limitador.adquirir(5000)
+
+    assert relogio.dormido == 0
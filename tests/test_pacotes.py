@@ -0,0 +1,43 @@
+"""Avaliação empacotada: tamanho do pacote e rateio do uso de tokens entre os problemas."""
+
+from types import SimpleNamespace
+
+import bars_judge_agent as agente
+
+IDS = agente.schema_notas()["required"]
+USO = {"input_tokens": 1001, "output_tokens": 2999,
+       "cache_read_input_tokens": 7, "cache_creation_input_tokens": 0}
+
+
+class ClienteFalso:
+    def __init__(self, k: int):
+        resposta = SimpleNamespace(
+            content=[SimpleNamespace(type="tool_use", input={"avaliacoes": [{cid: 6 for cid in IDS}] * k})],
+            usage=SimpleNamespace(**USO))
+        self.messages = SimpleNamespace(create=lambda **params: resposta)
+
+
+def _grupo(k: int) -> list[dict]:
+    return [{"problema": f"P{i}", "descricao": "d", "desenvolvimento": ""} for i in range(k)]
+
+
+def test_rateio_preserva_o_total_e_o_resto_vai_para_o_primeiro():
+    rateio = agente._ratear_uso(USO, 3)
+
+    for campo in agente.CAMPOS_USO:
+        assert sum(u[campo] for u in rateio) == USO[campo]
+    assert rateio[0]["input_tokens"] == 335 and rateio[1]["input_tokens"] == rateio[2]["input_tokens"] == 333
+
+
+def test_grupo_api_rateia_sem_perder_tokens():
+    resultados = agente.avaliar_grupo_api(ClienteFalso(3), _grupo(3), "claude-sonnet-4-20250514")
+
+    assert all(notas == {cid: 6 for cid in IDS} for _, notas, _ in resultados)
+    for campo in agente.CAMPOS_USO:
+        assert sum(uso[campo] for _, _, uso in resultados) == USO[campo]
+
+
+def test_pacote_automatico_cabe_no_limite_de_saida():
+    for modelo in list(agente.LIMITE_SAIDA_MODELOS) + ["modelo-desconhecido"]:
+        k = agente.calcular_pack_automatico(modelo)
+        assert k * agente.TOKENS_SAIDA_ESTIMADOS <= agente._limite_saida_modelo(modelo)
@@ -0,0 +1,24 @@
+"""Relatório do --profile: o início registrado é o do começo da execução, não o da escrita."""
+
+from datetime import datetime
+
+import bars_judge_agent as agente
+
+
+class _DataFalsa(datetime):
+    instantes = []
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.instantes.pop(0)
+
+
+def test_inicio_e_marcado_em_iniciar(monkeypatch):
+    _DataFalsa.instantes = [datetime(2026, 1, 1, 9, 0, 0), datetime(2026, 1, 1, 9, 45, 0)]
+    monkeypatch.setattr(agente, "datetime", _DataFalsa)
+    perfil = agente.Perfilador()
+
+    perfil.iniciar()
+    relatorio = perfil.relatorio("evaluate")
+
+    assert relatorio["inicio"] == "2026-01-01T09:00:00"
@@ -0,0 +1,114 @@
+"""Detecção de quase-duplicatas por MinHash/LSH e o limiar de similaridade."""
+
+import random
+
+import bars_judge_agent as agente
+
+_PALAVRAS = [f"palavra{i}" for i in range(400)]
+
+
+def _problema(titulo: str, palavras: list[str]) -> dict:
+    # Títulos de 2 caracteres não geram tokens: só o texto conta na similaridade
+    return {"problema": titulo, "descricao": " ".join(palavras), "desenvolvimento": ""}
+
+
+def _texto(semente: int, n: int = 80) -> list[str]:
+    return random.Random(semente).sample(_PALAVRAS, n)
+
+
+def _indice(anteriores: list[dict], novos: list[dict]) -> agente.IndiceMinHash:
+    indice = agente.IndiceMinHash()
+    indice.indexar_batch("2026-01-01_a", anteriores)
+    indice.indexar_batch("2026-02-01_b", novos)
+    return indice
+
+
+def test_copia_exata_e_quase_copia_sao_detectadas():
+    base = _texto(1)
+    editado = base[:40] + ["trocada"] + base[41:]
+    anteriores = [_problema("O1", base), _problema("O2", _texto(2))]
+    novos = [_problema("C1", base), _problema("E1", editado), _problema("N1", _texto(3))]
+
+    encontrados = agente.detectar_quase_duplicatas(_indice(anteriores, novos), "2026-02-01_b", novos)
+
+    assert encontrados["C1"] == (1.0, "2026-01-01_a", "O1")
+    sim, batch, similar = encontrados["E1"]
+    assert agente.LIMIAR_QUASE_DUPLICATA <= sim < 1.0
+    assert (batch, similar) in {("2026-01-01_a", "O1"), ("2026-02-01_b", "C1")}
+    assert "N1" not in encontrados
+
+
+def test_limiar_mais_alto_so_aceita_copias_exatas():
+    base = _texto(4)
+    editado = base[:40] + ["trocada"] + base[41:]
+    anteriores = [_problema("O1", base)]
+    novos = [_problema("C1", base), _problema("E1", editado)]
+
+    encontrados = agente.detectar_quase_duplicatas(_indice(anteriores, novos), "2026-02-01_b", novos,
+                                                   limiar=1.0)
+
+    assert set(encontrados) == {"C1"}
+
+
+def test_so_compara_com_problemas_anteriores():
+    base = _texto(5)
+    anteriores = [_problema("O1", base)]
+    novos = [_problema("C1", base)]
+    indice = _indice(anteriores, novos)
+
+    # O mais antigo nunca aponta para o mais novo (evita A pular por B e B por A)
+    assert agente.detectar_quase_duplicatas(indice, "2026-01-01_a", anteriores) == {}
+    # No mesmo batch, vale a posição
+    mesmos = [_problema("P1", _texto(6)), _problema("P2", _texto(6))]
+    indice.indexar_batch("2026-03-01_c", mesmos)
+    assert set(agente.detectar_quase_duplicatas(indice, "2026-03-01_c", mesmos)) == {"P2"}
+
+
+def test_indice_sobrevive_a_serializacao():
+    base = _texto(7)
+    anteriores = [_problema("O1", base)]
+    novos = [_problema("C1", base)]
+    indice = agente.IndiceMinHash.de_json(_indice(anteriores, novos).para_json())
+
+    assert agente.detectar_quase_duplicatas(indice, "2026-02-01_b", novos) == {
+        "C1": (1.0, "2026-01-01_a", "O1")}
+
+
+def _gravar_csv(path, problemas: list[dict]):
+    linhas = ["Problema,Descrição Geral,Desenvolvimento"]
+    linhas += [f'"{p["problema"]}","{p["descricao"]}",""' for p in problemas]
+    path.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+
+
+def test_csv_novo_num_batch_ja_indexado_e_reindexado(tmp_path):
+    batch_dir = tmp_path / agente.BATCHES_DIR / "2026-01-01_a"
+    batch_dir.mkdir(parents=True)
+    base = _texto(8)
+    _gravar_csv(batch_dir / "a.csv", [_problema("O1", base)])
+    agente.carregar_indice_minhash(str(tmp_path))
+
+    novos = [_problema("C1", base)]
+    _gravar_csv(batch_dir / "b.csv", novos)
+    indice = agente.carregar_indice_minhash(str(tmp_path))
+
+    assert agente.detectar_quase_duplicatas(indice, "2026-01-01_a", novos) == {
+        "C1": (1.0, "2026-01-01_a", "O1")}
+    # Sem mudança nos CSVs, o índice salvo é reaproveitado como está
+    assert agente.carregar_indice_minhash(str(tmp_path)).batches == indice.batches
+
+
+def test_descricao_editada_gera_nova_assinatura(tmp_path):
+    batch_dir = tmp_path / agente.BATCHES_DIR / "2026-01-01_a"
+    batch_dir.mkdir(parents=True)
+    _gravar_csv(batch_dir / "a.csv", [_problema("O1", _texto(9)), _problema("C1", _texto(10))])
+    agente.carregar_indice_minhash(str(tmp_path))
+
+    _gravar_csv(batch_dir / "a.csv", [_problema("O1", _texto(9)), _problema("C1", _texto(9))])
+    indice = agente.carregar_indice_minhash(str(tmp_path))
+
+    assert set(agente.detectar_quase_duplicatas(indice, "2026-01-01_a", [_problema("C1", [])])) == {"C1"}
+
+
+def test_problema_fora_do_indice_nao_quebra():
+    indice = agente.IndiceMinHash()
+    assert indice.mais_similar("2026-01-01_a", "inexistente", 0.5) is None
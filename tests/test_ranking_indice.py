@@ -0,0 +1,109 @@
+"""O ranking incremental (índice persistente) grava o mesmo CSV que gerar_csv_final."""
+
+import copy
+import random
+
+import pytest
+
+import bars_judge_agent as agente
+
+IDS = [c["id"] for cat in agente.FRAMEWORK.values() for c in cat["criterios"]]
+
+
+def _resultados(n: int, semente: int, prefixo: str = "P", batch: str = "b1") -> list[dict]:
+    rng = random.Random(semente)
+    resultados = []
+    for i in range(n):
+        # Notas em faixa estreita geram empates de total (testa a ordem estável)
+        notas = {cid: rng.randint(4, 6) for cid in IDS}
+        problema = {"problema": f'{prefixo}{i:04d} "aspas", vírgula e acentuação',
+                    "descricao": f"Descrição {i}\ncom quebra de linha", "desenvolvimento": "Dev",
+                    "arquivo_fonte": "fonte.csv"}
+        resultados.append(agente._montar_resultado(problema, batch, notas))
+    return resultados
+
+
+def _referencia(resultados: list[dict], diretorio) -> bytes:
+    path = agente.gerar_csv_final(copy.deepcopy(resultados), str(diretorio), agente.BANCO_GERAL_CSV,
+                                  resumo=False)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _atualizar(resultados: list[dict], base) -> tuple:
+    ordenados, info = agente.atualizar_ranking_geral(copy.deepcopy(resultados), str(base))
+    return (base / agente.BANCO_GERAL_CSV).read_bytes(), ordenados, info
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    (tmp_path / "base").mkdir()
+    (tmp_path / "ref").mkdir()
+    return tmp_path / "base", tmp_path / "ref"
+
+
+def test_primeira_geracao_igual_a_gerar_csv_final(dirs):
+    base, ref = dirs
+    resultados = _resultados(200, 1)
+
+    csv, ordenados, info = _atualizar(resultados, base)
+
+    assert not info["incremental"]
+    assert csv == _referencia(resultados, ref)
+    assert [r["ranking"] for r in ordenados] == list(range(1, 201))
+
+
+@pytest.mark.parametrize("n_novos", [3, 80], ids=["bisect", "merge"])
+def test_insercao_incremental_identica(dirs, n_novos):
+    base, ref = dirs
+    resultados = _resultados(200, 1)
+    _atualizar(resultados, base)
+
+    resultados += _resultados(n_novos, 2, prefixo="N", batch="b2")
+    csv, _, info = _atualizar(resultados, base)
+
+    assert info["incremental"]
+    assert info["formatadas"] == n_novos and info["reaproveitadas"] == 200
+    assert info["faixa"] is not None
+    assert csv == _referencia(resultados, ref)
+
+
+def test_remocao_e_total_alterado(dirs):
+    base, ref = dirs
+    resultados = _resultados(150, 3)
+    _atualizar(resultados, base)
+
+    del resultados[10:15]
+    resultados[40] = {**resultados[40], **agente.calcular_pontuacoes({cid: 10 for cid in IDS})}
+    csv, ordenados, info = _atualizar(resultados, base)
+
+    assert info["incremental"]
+    assert info["removidas"] == 5 and info["formatadas"] == 1
+    assert ordenados[0]["problema"] == resultados[40]["problema"]
+    assert csv == _referencia(resultados, ref)
+
+
+def test_sem_mudancas_nao_regrava(dirs):
+    base, _ = dirs
+    resultados = _resultados(50, 4)
+    _atualizar(resultados, base)
+    mtime = (base / agente.BANCO_GERAL_CSV).stat().st_mtime_ns
+
+    _, _, info = _atualizar(resultados, base)
+
+    assert info["faixa"] is None and info["formatadas"] == 0
+    assert (base / agente.BANCO_GERAL_CSV).stat().st_mtime_ns == mtime
+
+
+def test_csv_alterado_fora_do_indice_gera_do_zero(dirs):
+    base, ref = dirs
+    resultados = _resultados(50, 5)
+    _atualizar(resultados, base)
+    with open(base / agente.BANCO_GERAL_CSV, "ab") as f:
+        f.write(b"lixo\n")
+
+    resultados += _resultados(2, 6, prefixo="N")
+    csv, _, info = _atualizar(resultados, base)
+
+    assert not info["incremental"]
+    assert csv == _referencia(resultados, ref)
@@ -0,0 +1,34 @@
+"""Matriz de notas do rerank: mesmos totais que calcular_pontuacoes e notas fora do padrão."""
+
+import random
+
+import bars_judge_agent as agente
+
+IDS = [c["id"] for cat in agente.FRAMEWORK.values() for c in cat["criterios"]]
+PESOS = {c["id"]: c["peso"] for cat in agente.FRAMEWORK.values() for c in cat["criterios"]}
+
+
+def _resultado(titulo: str, notas: dict) -> dict:
+    return {"problema": titulo, "batch": "b1", "notas": notas, **agente.calcular_pontuacoes(notas)}
+
+
+def test_pesos_atuais_reproduzem_calcular_pontuacoes():
+    rng = random.Random(1)
+    resultados = [_resultado(f"P{i}", {cid: rng.randint(1, 10) for cid in IDS if rng.random() > 0.1})
+                  for i in range(20)]
+
+    pontuado = agente.MatrizNotas(resultados).pontuar(PESOS)
+
+    assert pontuado["total_geral"] == [r["total_geral"] for r in resultados]
+    assert all(isinstance(t, int) for t in pontuado["total_geral"])
+    assert pontuado["pct_total"] == [r["pct_total"] for r in resultados]
+
+
+def test_nota_fracionaria_no_banco_nao_quebra_a_matriz():
+    notas = {cid: 6 for cid in IDS}
+    notas[IDS[0]] = 7.5
+
+    matriz = agente.MatrizNotas([_resultado("P0", notas)])
+
+    assert matriz.coluna(0)[0] == 8
+    assert matriz.pontuar(PESOS)["total_geral"][0] == agente.calcular_pontuacoes({**notas, IDS[0]: 8})["total_geral"]
@@ -0,0 +1,65 @@
+"""Validação das notas devolvidas pelo modelo (saída estruturada e texto) contra schema_notas()."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import bars_judge_agent as agente
+
+IDS = agente.schema_notas()["required"]
+
+
+def _tool(entrada) -> SimpleNamespace:
+    return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=entrada)])
+
+
+def _texto(texto: str) -> SimpleNamespace:
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=texto)])
+
+
+def test_notas_completas_viram_inteiros_de_1_a_10():
+    entrada = {cid: 5 for cid in IDS}
+    entrada.update({IDS[0]: 7.5, IDS[1]: 0, IDS[2]: 42, IDS[3]: "8"})
+
+    notas = agente._notas_da_resposta(_tool(entrada))
+
+    assert set(notas) == set(IDS)
+    assert all(type(v) is int for v in notas.values())
+    assert (notas[IDS[0]], notas[IDS[1]], notas[IDS[2]], notas[IDS[3]]) == (8, 1, 10, 8)
+
+
+def test_texto_com_cercas_de_markdown():
+    texto = "```json\n" + json.dumps({cid: 6 for cid in IDS}) + "\n```"
+    assert agente._notas_da_resposta(_texto(texto)) == {cid: 6 for cid in IDS}
+
+
+def test_chaves_extras_sao_descartadas():
+    notas = agente._notas_da_resposta(_tool({**{cid: 5 for cid in IDS}, "comentario": "ok"}))
+    assert set(notas) == set(IDS)
+
+
+@pytest.mark.parametrize("entrada", [
+    {"dor_real": 7.5},
+    {**{cid: 5 for cid in IDS[1:]}},
+    {**{cid: 5 for cid in IDS}, IDS[0]: "alto"},
+    {**{cid: 5 for cid in IDS}, IDS[0]: None},
+    {**{cid: 5 for cid in IDS}, IDS[0]: True},
+], ids=["parcial", "um_ausente", "texto", "nulo", "booleano"])
+def test_notas_incompletas_ou_invalidas_sao_falha_de_parse(entrada):
+    with pytest.raises(ValueError):
+        agente._notas_da_resposta(_tool(entrada))
+
+
+def test_backfill_valida_so_os_ids_pedidos():
+    ids = tuple(IDS[:2])
+    assert agente._notas_da_resposta(_tool({IDS[0]: 3, IDS[1]: 9.2}), ids) == {IDS[0]: 3, IDS[1]: 9}
+    with pytest.raises(ValueError):
+        agente._notas_da_resposta(_tool({IDS[0]: 3}), ids)
+
+
+def test_lote_com_um_item_incompleto_e_rejeitado():
+    completo = {cid: 5 for cid in IDS}
+    assert len(agente._extrair_notas_lote(_tool({"avaliacoes": [completo, completo]}), 2)) == 2
+    with pytest.raises(ValueError):
+        agente._extrair_notas_lote(_tool({"avaliacoes": [completo, {IDS[0]: 5}]}), 2)
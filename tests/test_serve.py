@@ -0,0 +1,151 @@
+"""Rotas, ETag/304 e HEAD do servidor HTTP do ranking (serve)."""
+
+import http.client
+import json
+import random
+import threading
+
+import pytest
+
+import bars_judge_agent as agente
+
+IDS = [c["id"] for cat in agente.FRAMEWORK.values() for c in cat["criterios"]]
+
+
+def _gravar_banco(base, n: int, semente: int):
+    rng = random.Random(semente)
+    registros = []
+    for i in range(n):
+        notas = {cid: rng.randint(1, 10) for cid in IDS}
+        problema = {"problema": f"Problema {semente}-{i}", "descricao": "d", "desenvolvimento": "e",
+                    "arquivo_fonte": "f.csv"}
+        registros.append(agente._montar_resultado(problema, f"b{i % 2}", notas))
+    agente._gravar_json_atomico(str(base / agente.BANCO_GERAL_JSON), registros, indent=2)
+    return registros
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    _gravar_banco(tmp_path, 30, 1)
+    s = agente.criar_servidor_ranking(str(tmp_path), porta=0)
+    threading.Thread(target=s.serve_forever, daemon=True).start()
+    yield s
+    s.shutdown()
+    s.server_close()
+
+
+def _pedir(servidor, caminho: str, metodo: str = "GET", etag=None):
+    conn = http.client.HTTPConnection(*servidor.server_address[:2], timeout=5)
+    conn.request(metodo, caminho, headers={"If-None-Match": etag} if etag else {})
+    resp = conn.getresponse()
+    corpo = resp.read()
+    conn.close()
+    return resp, corpo
+
+
+def test_ranking_ordenado_e_paginado(servidor):
+    resp, corpo = _pedir(servidor, "/ranking?limite=5&offset=5")
+    dados = json.loads(corpo)
+
+    assert resp.status == 200 and resp.getheader("ETag")
+    assert dados["total"] == 30
+    assert [i["ranking"] for i in dados["itens"]] == [6, 7, 8, 9, 10]
+    totais = [i["total_geral"] for i in dados["itens"]]
+    assert totais == sorted(totais, reverse=True)
+
+
+def test_filtros_de_batch_categoria_e_min_pct(servidor):
+    cat = next(iter(agente.FRAMEWORK))
+    registros = servidor.indices.atual.registros
+    esperados = [r for r in registros if r["batch"] == "b1" and r[f"pct_{cat}"] >= 50]
+
+    _, corpo = _pedir(servidor, f"/ranking?categoria={cat.split('_')[0]}&batch=b1&min_pct=50&limite=500")
+    dados = json.loads(corpo)
+
+    assert dados["total"] == len(esperados) == len(dados["itens"])
+    assert {i["problema"] for i in dados["itens"]} == {r["problema"] for r in esperados}
+
+
+def test_problema_por_id(servidor):
+    titulo = servidor.indices.atual.registros[3]["problema"]
+    resp, corpo = _pedir(servidor, f"/problemas/{agente.id_problema(titulo)}")
+    assert resp.status == 200 and json.loads(corpo)["problema"] == titulo
+
+
+def test_if_none_match_devolve_304_sem_corpo(servidor):
+    resp, _ = _pedir(servidor, "/ranking")
+    etag = resp.getheader("ETag")
+
+    resp, corpo = _pedir(servidor, "/ranking", etag=etag)
+
+    assert resp.status == 304 and corpo == b""
+    assert resp.getheader("ETag") == etag
+
+
+@pytest.mark.parametrize("caminho,status", [
+    ("/nao-existe", 404),
+    ("/problemas/0000000000000000", 404),
+    ("/ranking?batch=inexistente", 404),
+    ("/ranking?limite=abc", 400),
+    ("/ranking?categoria=zzz", 400),
+    ("/ranking?limite=0", 400),
+])
+def test_erros_nunca_viram_304(servidor, caminho, status):
+    etag = _pedir(servidor, "/ranking")[0].getheader("ETag")
+
+    resp, corpo = _pedir(servidor, caminho, etag=etag)
+
+    assert resp.status == status
+    assert resp.getheader("ETag") is None
+    assert "erro" in json.loads(corpo)
+
+
+def test_head_envia_so_cabecalhos(servidor):
+    get, corpo = _pedir(servidor, "/ranking")
+    head, vazio = _pedir(servidor, "/ranking", metodo="HEAD")
+
+    assert head.status == 200 and vazio == b""
+    assert head.getheader("ETag") == get.getheader("ETag")
+    assert int(head.getheader("Content-Length")) == len(corpo)
+    assert _pedir(servidor, "/nao-existe", metodo="HEAD")[0].status == 404
+
+
+def test_banco_regravado_muda_a_versao(servidor, tmp_path):
+    etag = _pedir(servidor, "/ranking")[0].getheader("ETag")
+    _gravar_banco(tmp_path, 12, 2)
+
+    resp, corpo = _pedir(servidor, "/ranking", etag=etag)
+
+    assert resp.status == 200
+    assert resp.getheader("ETag") != etag
+    assert json.loads(corpo)["total"] == 12
+
+
+def test_recarga_nao_mistura_versoes(tmp_path):
+    _gravar_banco(tmp_path, 40, 3)
+    indices = agente.IndicesRanking(str(tmp_path))
+    antigo = indices.atualizar()
+    erros = []
+
+    def consultar():
+        for _ in range(200):
+            instantaneo = indices.atualizar()
+            try:
+                pagina = instantaneo.consultar(batch="b1", limite=500)
+                assert pagina["total"] == instantaneo.batches["b1"] == len(pagina["itens"])
+            except Exception as e:  # noqa: BLE001 - qualquer erro aqui é o bug
+                erros.append(e)
+
+    threads = [threading.Thread(target=consultar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for n in (10, 40, 5, 25):
+        _gravar_banco(tmp_path, n, n)
+        indices.atualizar()
+    for t in threads:
+        t.join()
+
+    assert erros == []
+    # Quem ainda segura o instantâneo antigo continua vendo a versão antiga inteira
+    assert antigo.consultar(limite=500)["total"] == 40
+    assert indices.atual.consultar(limite=500)["total"] == 25
@@ -0,0 +1,46 @@
+"""
+Orçamento de startup como teste: os mesmos limites de benchmarks/bench_startup.py,
+verificados a cada `python -m pytest`. Para ver a quebra por módulo:
+
+    python benchmarks/bench_startup.py
+"""
+
+import importlib.util
+import os
+import tempfile
+
+import pytest
+
+_CAMINHO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "benchmarks", "bench_startup.py")
+_spec = importlib.util.spec_from_file_location("bench_startup", _CAMINHO)
+bench_startup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_startup)
+
+RODADAS = 3
+
+
+@pytest.fixture(scope="module")
+def medicao_import():
+    bench_startup.medir_import()  # aquecimento: grava o .pyc
+    return min((bench_startup.medir_import() for _ in range(RODADAS)), key=lambda r: r[0])
+
+
+def test_import_dentro_do_orcamento(medicao_import):
+    total_ms, _ = medicao_import
+    assert total_ms <= bench_startup.ORCAMENTO_IMPORT_MS, (
+        f"import levou {total_ms:.1f} ms (orçamento {bench_startup.ORCAMENTO_IMPORT_MS} ms)")
+
+
+def test_import_nao_carrega_modulos_sob_demanda(medicao_import):
+    _, proprios = medicao_import
+    carregados = sorted(m for m in proprios if m.split(".")[0] in bench_startup.MODULOS_SOB_DEMANDA)
+    assert carregados == []
+
+
+@pytest.mark.parametrize("argv", bench_startup.COMANDOS_INTERATIVOS, ids=" ".join)
+def test_comando_interativo_dentro_do_orcamento(argv):
+    with tempfile.TemporaryDirectory(prefix="test_startup_") as vazio:
+        ms = min(bench_startup.medir_cli(argv, vazio) for _ in range(RODADAS))
+    assert ms <= bench_startup.ORCAMENTO_CLI_MS, (
+        f"'{' '.join(argv)}' levou {ms:.1f} ms (orçamento {bench_startup.ORCAMENTO_CLI_MS} ms)")